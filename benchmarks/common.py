@@ -0,0 +1,108 @@
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def add_common_arguments(parser: argparse.ArgumentParser, sizes: str):
+    parser.add_argument("--sizes", default=sizes, help="comma separated problem sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each case")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass of each case")
+    parser.add_argument("--output", help="write results to this file rather than stdout")
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(float(s)) for s in value.split(",") if s.strip()]
+
+
+def measure(run: Callable[[Any], Any], setup: Callable[[], Any] = None, repeat: int = 3,
+            memory: bool = True, warmup: int = 1) -> dict:
+    """
+    Time `run(setup())` `repeat` times after `warmup` untimed runs, then run it once more under tracemalloc for the
+    peak allocation.  `setup` is not timed.  `run` may return its own elapsed seconds (a float) to exclude work it
+    does between the calls being measured; any other return value is ignored.
+    """
+    samples = list()
+
+    for _ in range(warmup):
+        run(setup() if setup is not None else None)
+
+    for _ in range(max(repeat, 1)):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        elapsed = run(state)
+        samples.append(elapsed if isinstance(elapsed, float) else time.perf_counter() - start)
+
+    result = {
+        "seconds": {
+            "mean": statistics.fmean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "min": min(samples),
+            "max": max(samples),
+            "samples": samples
+        }
+    }
+
+    if memory:
+        state = setup() if setup is not None else None
+        tracemalloc.start()
+        try:
+            run(state)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "commit": commit
+    }
+
+
+def write_results(benchmark: str, results: List[dict], output: Optional[str]):
+    document = {
+        "benchmark": benchmark,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": environment(),
+        "results": results
+    }
+
+    text = json.dumps(document, indent=2)
+
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def report(result: dict):
+    """One line summary of a case on stderr so that stdout stays machine-readable."""
+    case = " ".join(f"{k}={v}" for k, v in result.items() if k not in ("seconds", "peak_bytes") and
+                    not k.startswith("seconds") and not k.endswith("per_second"))
+    seconds = result["seconds"]
+    peak = result.get("peak_bytes")
+    memory = f" peak {peak / 2 ** 20:.1f} MiB" if peak is not None else ""
+
+    print(f"{case}: {seconds['mean'] * 1000:.2f} ms ± {seconds['stdev'] * 1000:.2f}{memory}", file=sys.stderr)
@@ -0,0 +1,209 @@
+"""
+Compare benchmark results against the stored baselines in `benchmarks/baselines` and exit non-zero on a significant
+regression.
+
+    python -m benchmarks.compare skeleton.json segment_info.json end_to_end.json
+    python -m benchmarks.compare --update skeleton.json
+
+A timing regression must exceed both `--threshold` (relative) and `--sigma` combined standard deviations of the two
+runs, be larger than `--min-seconds`, and show in the fastest run as well as the mean, so that noise in small or
+unstable cases does not fail the gate.  Peak memory uses `--memory-threshold` and `--min-bytes`.  Throughput-only
+results (the end-to-end benchmark) use `--threshold`, and any failed neuron is a regression.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+baseline_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Result fields that identify a case rather than measure it.
+_case_fields = ("operation", "nodes", "segments", "page_size", "pages", "neurons", "options")
+
+# Benchmarks whose `nodes` and `neurons` are outcomes (e.g., fewer when some fail) rather than inputs; their cases are
+# identified by the configured inputs in `options` alone.
+_benchmark_case_fields = {"end_to_end": ("options",)}
+
+_CaseKey = Tuple[Tuple[str, str], ...]
+
+
+def case_key(result: dict, benchmark: Optional[str] = None) -> _CaseKey:
+    fields = _benchmark_case_fields.get(benchmark, _case_fields)
+
+    return tuple((k, json.dumps(result[k], sort_keys=True)) for k in fields if k in result)
+
+
+def case_name(key: _CaseKey) -> str:
+    # The options are only named for cases identified by nothing else.
+    return " ".join(f"{k}={v}" for k, v in key if k != "options" or len(key) == 1)
+
+
+def summarize(result: dict) -> dict:
+    """The measurements kept in a baseline: time, peak memory, throughput, and failures."""
+    summary = {k: result[k] for k in _case_fields if k in result}
+
+    if result.get("failed") is not None:
+        summary["failed"] = result["failed"]
+
+    seconds = result.get("seconds")
+
+    if isinstance(seconds, dict):
+        summary["seconds"] = seconds["mean"]
+        summary["stdev"] = seconds["stdev"]
+        summary["min_seconds"] = seconds["min"]
+    elif seconds is not None:
+        summary["seconds"] = seconds
+
+    if result.get("peak_bytes") is not None:
+        summary["peak_bytes"] = result["peak_bytes"]
+
+    for throughput in ("neurons_per_minute", "nodes_per_second", "bytes_per_second"):
+        if result.get(throughput) is not None:
+            summary["throughput"] = {"unit": throughput, "value": result[throughput]}
+            break
+
+    return summary
+
+
+def load_results(path: str) -> Tuple[str, Dict[_CaseKey, dict], dict]:
+    with open(path) as f:
+        document = json.load(f)
+
+    # Baselines are stored already summarized.
+    summarized = document.get("summarized", False)
+
+    cases = {case_key(r, document["benchmark"]): r if summarized else summarize(r) for r in document["results"]}
+
+    return document["benchmark"], cases, document.get("environment", {})
+
+
+def baseline_path(benchmark: str) -> str:
+    return os.path.join(baseline_directory, f"{benchmark}.json")
+
+
+def write_baseline(path: str, benchmark: str, cases: Dict[_CaseKey, dict], environment: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump({"benchmark": benchmark, "summarized": True, "environment": environment,
+                   "results": list(cases.values())}, f, indent=2)
+        f.write("\n")
+
+
+def compare_case(baseline: dict, current: dict, threshold: float, sigma: float, min_seconds: float,
+                 memory_threshold: float, min_bytes: int) -> List[Tuple[str, str, bool]]:
+    """(metric, description, regressed) for each measurement present in both."""
+    findings = list()
+
+    throughput_only = baseline.get("stdev") is None and "throughput" in baseline
+
+    if throughput_only:
+        before, after = baseline["throughput"]["value"], current.get("throughput", {}).get("value")
+        if after is not None and before > 0:
+            change = after / before - 1
+            findings.append((baseline["throughput"]["unit"], f"{before:.4g} -> {after:.4g} ({change:+.1%})",
+                             change < -threshold))
+    elif "seconds" in baseline and "seconds" in current:
+        before, after = baseline["seconds"], current["seconds"]
+        noise = sigma * math.sqrt(baseline.get("stdev", 0) ** 2 + current.get("stdev", 0) ** 2)
+        difference = after - before
+        change = difference / before if before > 0 else 0.0
+        regressed = difference > max(threshold * before, noise, min_seconds)
+        # Timing noise only adds, so the fastest run must have slowed down as well.
+        if "min_seconds" in baseline and "min_seconds" in current:
+            fastest = baseline["min_seconds"]
+            regressed = regressed and current["min_seconds"] - fastest > threshold * fastest
+        findings.append(("seconds", f"{before * 1000:.3f} ms -> {after * 1000:.3f} ms ({change:+.1%})", regressed))
+
+    if "peak_bytes" in baseline and "peak_bytes" in current:
+        before, after = baseline["peak_bytes"], current["peak_bytes"]
+        difference = after - before
+        change = difference / before if before > 0 else 0.0
+        regressed = difference > max(memory_threshold * before, min_bytes)
+        findings.append(("peak_bytes", f"{before / 2 ** 20:.2f} MiB -> {after / 2 ** 20:.2f} MiB ({change:+.1%})",
+                         regressed))
+
+    return findings
+
+
+def compare(path: str, arguments: argparse.Namespace, baseline: Optional[str] = None) -> Optional[bool]:
+    """Print the comparison of one results file.  Returns True if anything regressed, None if there is no baseline."""
+    benchmark, current, _ = load_results(path)
+
+    # Failures are never expected, with or without a baseline.
+    failed = False
+
+    for key, result in current.items():
+        if result.get("failed"):
+            print(f"{benchmark}: {case_name(key)} failed: {result['failed']} neurons REGRESSION")
+            failed = True
+
+    baseline = baseline or baseline_path(benchmark)
+
+    if not os.path.exists(baseline):
+        print(f"{benchmark}: no baseline at {baseline}")
+        return True if failed else None
+
+    _, stored, _ = load_results(baseline)
+
+    regressed = failed
+
+    print(f"{benchmark}: {path} against {baseline}")
+
+    for key, result in current.items():
+        if key not in stored:
+            print(f"  {case_name(key)}: not in baseline")
+            continue
+
+        for metric, description, worse in compare_case(stored[key], result, arguments.threshold, arguments.sigma,
+                                                       arguments.min_seconds, arguments.memory_threshold,
+                                                       arguments.min_bytes):
+            marker = "REGRESSION" if worse else "ok"
+            print(f"  {case_name(key)} {metric}: {description} {marker}")
+            regressed = regressed or worse
+
+    return regressed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument("results", nargs="+", help="results written by a benchmark's --output")
+    parser.add_argument("--baseline", help="baseline file to use instead of baselines/<benchmark>.json (one result)")
+    parser.add_argument("--update", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown treated as a regression")
+    parser.add_argument("--sigma", type=float, default=3.0, help="standard deviations a slowdown must also exceed")
+    parser.add_argument("--min-seconds", type=float, default=0.002, help="smallest slowdown treated as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=0.10,
+                        help="relative peak memory growth treated as a regression")
+    parser.add_argument("--min-bytes", type=int, default=1 << 20, help="smallest memory growth treated as a regression")
+
+    arguments = parser.parse_args(argv)
+
+    if arguments.baseline is not None and len(arguments.results) > 1:
+        parser.error("--baseline applies to a single results file")
+
+    if arguments.update:
+        for path in arguments.results:
+            benchmark, cases, environment = load_results(path)
+            destination = arguments.baseline or baseline_path(benchmark)
+            write_baseline(destination, benchmark, cases, environment)
+            print(f"{benchmark}: stored {len(cases)} cases in {destination}")
+        return 0
+
+    outcomes = [compare(path, arguments, arguments.baseline) for path in arguments.results]
+
+    if any(outcomes):
+        print("performance regression detected")
+        return 1
+
+    if any(o is None for o in outcomes):
+        return 2
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
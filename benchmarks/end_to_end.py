@@ -0,0 +1,140 @@
+"""
+Run the precomputed worker against a local fake of the NMCP GraphQL service and report throughput and per-neuron
+latency.  The service runs in its own process so that it does not compete with the worker for the interpreter.
+
+    python -m benchmarks.end_to_end --neurons 20 --nodes 50000 --latency 0.02 --jitter 0.02 --page-limit 10000
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+from nmcp.testing import FakeNmcpService, FakeServiceOptions, stub_structure_tree
+
+from .common import write_results
+
+
+def _serve(options: FakeServiceOptions, neurons: int, nodes: int, fixtures: List[str], connection):
+    service = FakeNmcpService(options)
+
+    next_id = 1
+    for path in fixtures:
+        next_id += len(service.add_json_file(path, next_id))
+
+    service.add_synthetic(neurons, nodes, options.seed, next_id)
+
+    with service:
+        connection.send(service.url)
+        # Serve until asked to stop, then report what was served.
+        connection.recv()
+        served = service.statistics
+        connection.send({"requests": served.requests, "errors": served.errors, "nodes_served": served.nodes_served,
+                         "operations": served.operations, "pending": service.pending_count()})
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if len(values) == 0:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+def run(options: FakeServiceOptions, neurons: int, nodes: int, fixtures: List[str], output: str = None,
+        max_rounds: int = 10) -> dict:
+    # Imported here so that the worker's logging setup applies only when the benchmark runs.
+    from nmcp import precomputed_worker
+
+    logging.getLogger("nmcp").setLevel(logging.WARNING)
+    logging.getLogger(precomputed_worker.__name__).setLevel(logging.WARNING)
+
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=(options, neurons, nodes, fixtures, child), daemon=True)
+    server.start()
+
+    temp_dir = tempfile.mkdtemp()
+
+    try:
+        url = parent.recv()
+
+        job_log = os.path.join(temp_dir, "jobs.jsonl")
+        location = output or f"file://{os.path.join(temp_dir, 'output')}"
+
+        context = precomputed_worker.create_worker_context(url, "", location, job_log=job_log)
+
+        start = time.perf_counter()
+
+        # Entries whose acknowledgement failed are offered again on the next round, as with the polling worker.
+        with stub_structure_tree():
+            for _ in range(max_rounds):
+                if precomputed_worker.process_available(context) == 0:
+                    break
+
+        elapsed = time.perf_counter() - start
+
+        with open(job_log) as f:
+            records = [json.loads(line) for line in f]
+
+        parent.send("stop")
+        service = parent.recv()
+    finally:
+        server.join(timeout=10)
+        shutil.rmtree(temp_dir)
+
+    generated = [r for r in records if r["result"] == "generated"]
+    latencies = [r["wall_seconds"] for r in generated]
+
+    return {
+        "neurons": len(records),
+        "generated": len(generated),
+        "failed": len(records) - len(generated),
+        "nodes": sum(r["axon_nodes"] + r["dendrite_nodes"] for r in generated),
+        "seconds": elapsed,
+        "neurons_per_minute": len(generated) / elapsed * 60 if elapsed > 0 else None,
+        "latency_seconds": {
+            "p50": _percentile(latencies, 50),
+            "p99": _percentile(latencies, 99),
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "max": max(latencies, default=None)
+        },
+        "service": service,
+        # The configured inputs, which identify the case; `neurons` and `nodes` above are what was generated.
+        "options": {"neurons": neurons, "nodes_per_neuron": nodes, "fixtures": [os.path.basename(f) for f in fixtures],
+                    "latency": options.latency, "jitter": options.jitter, "error_rate": options.error_rate,
+                    "page_limit": options.page_limit, "seed": options.seed}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument("--neurons", type=int, default=10, help="synthetic neurons to serve")
+    parser.add_argument("--nodes", type=int, default=50000, help="nodes per synthetic neuron")
+    parser.add_argument("--fixture", action="append", default=[], help="JSON export file to serve as well")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every service request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of service requests that fail")
+    parser.add_argument("--page-limit", type=int, help="maximum nodes the service returns per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--destination", help="cloud location to write to instead of a temporary file:// directory")
+    parser.add_argument("--output", help="write results to this file rather than stdout")
+
+    args = parser.parse_args(argv)
+
+    options = FakeServiceOptions(args.latency, args.jitter, args.error_rate, page_limit=args.page_limit,
+                                 seed=args.seed)
+
+    result = run(options, args.neurons, args.nodes, args.fixture, args.destination)
+
+    write_results("end_to_end", [result], args.output)
+
+
+if __name__ == "__main__":
+    main()
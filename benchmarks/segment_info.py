@@ -0,0 +1,137 @@
+"""
+Per-operation latency of segment properties at increasing segment counts.  Soma structures are resolved with a stub so
+that no network access is needed.
+
+    python -m benchmarks.segment_info --sizes 1000,10000,100000 --output segment_info.json
+"""
+import argparse
+import itertools
+import os
+import pickle
+import random
+import shutil
+import tempfile
+from typing import List
+
+from cloudfiles.lib import jsonify
+
+from nmcp.precomputed import SegmentInfo, NmcpPropertyValues, SegmentInfoStore, list_skeletons, has_skeleton
+from nmcp.precomputed.segment_info_store import clear_segment_info_cache
+from nmcp.testing import stub_structure_tree
+
+from .common import add_common_arguments, parse_sizes, measure, write_results, report
+
+_soma_ids = [315, 313, 549, 1097, 512, 698, 477, 803, 672, 961]
+
+
+def _values(segment_id: int) -> NmcpPropertyValues:
+    return NmcpPropertyValues(f"N{segment_id:06d}-SY", f"strain-{segment_id % 7}",
+                              _soma_ids[segment_id % len(_soma_ids)])
+
+
+def _populate(size: int) -> SegmentInfo:
+    segment_info = SegmentInfo()
+    for segment_id in range(size):
+        segment_info.append(segment_id, _values(segment_id))
+    return segment_info
+
+
+def run(sizes: List[int], operations: int, repeat: int, memory: bool) -> List[dict]:
+    results = list()
+
+    def record(operation: str, segments: int, result: dict, count: int = 1):
+        result = {"operation": operation, "segments": segments, "operations": count, **result}
+        result["seconds_per_operation"] = result["seconds"]["mean"] / count
+        report(result)
+        results.append(result)
+
+    rng = random.Random(0)
+
+    for size in sizes:
+        # Built once through the public API; the build itself is a data point for the cost of growing the state.
+        populate = measure(lambda _: _populate(size), repeat=1, memory=False, warmup=0)
+        record("populate", size, populate, size)
+
+        state = pickle.dumps(_populate(size))
+
+        def populated():
+            return pickle.loads(state)
+
+        new_ids = list(range(size, size + operations))
+        existing_ids = rng.sample(range(size), min(operations, size))
+
+        def append(segment_info: SegmentInfo):
+            for segment_id in new_ids:
+                segment_info.append(segment_id, _values(segment_id))
+
+        def update(segment_info: SegmentInfo):
+            for segment_id in existing_ids:
+                segment_info.append(segment_id, _values(segment_id + 1))
+
+        def remove(segment_info: SegmentInfo):
+            for segment_id in existing_ids:
+                segment_info.remove(segment_id)
+
+        record("append", size, measure(append, setup=populated, repeat=repeat, memory=memory), len(new_ids))
+        record("update", size, measure(update, setup=populated, repeat=repeat, memory=memory), len(existing_ids))
+        record("remove", size, measure(remove, setup=populated, repeat=repeat, memory=memory), len(existing_ids))
+
+        record("as_dict", size, measure(lambda s: s.as_dict(), setup=populated, repeat=repeat, memory=memory))
+        record("tags_as_dict", size, measure(lambda s: s.tags.as_dict(), setup=populated, repeat=repeat,
+                                             memory=memory))
+        record("info_json", size, measure(lambda s: jsonify(s.as_dict()), setup=populated, repeat=repeat,
+                                          memory=memory))
+
+        record("state_store", size, measure(lambda s: pickle.dumps(s), setup=populated, repeat=repeat,
+                                            memory=memory))
+        record("state_load", size, measure(lambda _: pickle.loads(state), repeat=repeat, memory=memory))
+
+        location = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(location, "segment_properties"))
+            with open(os.path.join(location, "segment_properties", "info.pickle"), "wb") as f:
+                f.write(state)
+
+            cloud_location = f"file://{location}"
+            store = SegmentInfoStore(cloud_location)
+
+            segment_id = itertools.count(size)
+
+            record("store_update", size,
+                   measure(lambda _: store.update(lambda s: s.append(next(segment_id), _values(size))),
+                           setup=clear_segment_info_cache, repeat=repeat, memory=memory))
+
+            record("list_skeletons", size,
+                   measure(lambda _: list_skeletons(cloud_location), setup=clear_segment_info_cache, repeat=repeat,
+                           memory=memory))
+            record("list_skeletons_cached", size,
+                   measure(lambda _: list_skeletons(cloud_location), repeat=repeat, memory=memory))
+            record("list_skeletons_page", size,
+                   measure(lambda _: list_skeletons(cloud_location, start=size // 2, limit=1000), repeat=repeat,
+                           memory=memory))
+            record("has_skeleton", size,
+                   measure(lambda _: has_skeleton(cloud_location, size // 2), repeat=repeat, memory=memory))
+        finally:
+            clear_segment_info_cache()
+            shutil.rmtree(location)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    add_common_arguments(parser, "1000,10000,100000")
+    parser.add_argument("--operations", type=int, default=200,
+                        help="appends, updates, and removes timed per run of those cases")
+
+    args = parser.parse_args(argv)
+
+    with stub_structure_tree():
+        results = run(parse_sizes(args.sizes), args.operations, args.repeat, not args.no_memory)
+
+    write_results("segment_info", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
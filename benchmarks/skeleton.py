@@ -0,0 +1,143 @@
+"""
+Timing and allocation benchmarks for building and uploading skeletons from synthetic reconstructions.
+
+    python -m benchmarks.skeleton --sizes 10000,100000,1000000,5000000 --output skeleton.json
+"""
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from typing import List
+
+from nmcp.precomputed.nmcp_precomputed import _create_dataset_info, upload_skeletons
+from nmcp.precomputed.nmcp_skeleton import (SkeletonComponents, create_skeleton, encoded_skeleton_size,
+                                            merge_components, encode_skeleton)
+from nmcp.testing import SyntheticTree, synthetic_neuron
+
+from .common import add_common_arguments, parse_sizes, measure, write_results, report
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def _build(tree: SyntheticTree, page_size: int) -> SkeletonComponents:
+    pages = tree.pages(page_size)
+    components = SkeletonComponents.create(next(pages))
+    for page in pages:
+        components.append(page)
+    return components
+
+
+def _append_pages(tree: SyntheticTree, page_size: int) -> float:
+    """Seconds spent in `create` and `append`, excluding the conversion of each page to node dictionaries."""
+    elapsed = 0.0
+    components = None
+
+    for page in tree.pages(page_size):
+        start = time.perf_counter()
+        if components is None:
+            components = SkeletonComponents.create(page)
+        else:
+            components.append(page)
+        elapsed += time.perf_counter() - start
+
+    return elapsed
+
+
+def run(sizes: List[int], page_sizes: List[int], max_list_nodes: int, repeat: int, memory: bool) -> List[dict]:
+    results = list()
+
+    def record(operation: str, nodes: int, result: dict, **extra):
+        result = {"operation": operation, "nodes": nodes, **extra, **result}
+        result["nodes_per_second"] = nodes / result["seconds"]["mean"] if result["seconds"]["mean"] > 0 else None
+        report(result)
+        results.append(result)
+
+    for size in sizes:
+        neuron = synthetic_neuron(size, seed=size)
+        axon = neuron.axon
+
+        # A whole part at once, as when loading from a JSON file.
+        if len(axon) <= max_list_nodes:
+            nodes = axon.nodes()
+            record("create", len(axon), measure(lambda _: SkeletonComponents.create(nodes), repeat=repeat,
+                                                memory=memory))
+            del nodes
+
+        # Page by page, as when fetching from the service.
+        for page_size in page_sizes:
+            pages = (len(axon) + page_size - 1) // page_size
+            record("append", len(axon),
+                   measure(lambda _: _append_pages(axon, page_size), repeat=repeat, memory=memory),
+                   page_size=page_size, pages=pages)
+
+        axon_components = _build(axon, page_sizes[-1])
+        dendrite_components = _build(neuron.dendrite, page_sizes[-1])
+
+        record("concat", neuron.node_count,
+               measure(lambda _: axon_components.concat(dendrite_components), repeat=repeat, memory=memory))
+
+        record("create_skeleton", neuron.node_count,
+               measure(lambda _: create_skeleton(1, axon_components, dendrite_components), repeat=repeat,
+                       memory=memory))
+
+        skeleton = create_skeleton(1, axon_components, dendrite_components)
+        encoded = encoded_skeleton_size(skeleton)
+
+        merged = merge_components(axon_components, dendrite_components)
+
+        # CloudVolume's serializer against encoding directly from the components.
+        record("to_precomputed", neuron.node_count,
+               measure(lambda _: skeleton.to_precomputed(), repeat=repeat, memory=memory))
+        record("encode_skeleton", neuron.node_count,
+               measure(lambda _: encode_skeleton(merged), repeat=repeat, memory=memory))
+
+        def dataset():
+            location = tempfile.mkdtemp()
+            return location, _create_dataset_info(f"file://{location}")
+
+        def upload(state):
+            location, cv = state
+            try:
+                start = time.perf_counter()
+                cv.skeleton.upload(skeleton)
+                return time.perf_counter() - start
+            finally:
+                shutil.rmtree(location)
+
+        def upload_native(state):
+            location, _ = state
+            try:
+                start = time.perf_counter()
+                upload_skeletons(f"file://{location}", [(1, merged)])
+                return time.perf_counter() - start
+            finally:
+                shutil.rmtree(location)
+
+        for name, run in (("upload", upload), ("upload_skeletons", upload_native)):
+            result = measure(run, setup=dataset, repeat=repeat, memory=memory)
+            result["bytes"] = encoded
+            result["bytes_per_second"] = encoded / result["seconds"]["mean"] if result["seconds"]["mean"] > 0 else None
+            record(name, neuron.node_count, result)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    add_common_arguments(parser, "10000,100000,1000000,5000000")
+    parser.add_argument("--page-sizes", default="5000,25000,100000", help="comma separated nodes per page")
+    parser.add_argument("--max-list-nodes", type=int, default=1000000,
+                        help="largest part to convert to node dictionaries at once for the create case")
+
+    args = parser.parse_args(argv)
+
+    results = run(parse_sizes(args.sizes), sorted(parse_sizes(args.page_sizes)), args.max_list_nodes, args.repeat,
+                  not args.no_memory)
+
+    write_results("skeleton", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
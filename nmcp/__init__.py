@@ -1,4 +1,56 @@
-from .precomputed import SegmentInfo, SegmentProperty, SegmentTagProperty, SomaSegmentTagProperty, NmcpPropertyValues
-from .precomputed import (create_from_json_files, create_from_dict, create_from_data, remove_skeleton, list_skeletons,
-                          extract_neuron_properties, SkeletonComponents)
-from .data import RemoteDataClient, PrecomputedEntry
+"""
+Names are imported from their submodules on first use (PEP 562) so that a command line entry point only pays for the
+dependencies (CloudVolume, gql, allensdk, ...) of what it uses.
+"""
+from typing import TYPE_CHECKING
+
+from ._lazy import lazy_exports
+
+_exports = {
+    "SegmentInfo": ".precomputed",
+    "SegmentProperty": ".precomputed",
+    "SegmentTagProperty": ".precomputed",
+    "SomaSegmentTagProperty": ".precomputed",
+    "NmcpPropertyValues": ".precomputed",
+    "SegmentInfoStore": ".precomputed",
+    "SegmentInfoConflictError": ".precomputed",
+    "DeferredSegmentInfoWriter": ".precomputed",
+    "create_from_json_files": ".precomputed",
+    "create_from_dict": ".precomputed",
+    "create_from_data": ".precomputed",
+    "create_from_streamed_neuron": ".precomputed",
+    "read_neurons": ".precomputed",
+    "StreamedNeuron": ".precomputed",
+    "ingest_json_files": ".precomputed",
+    "upload_skeletons": ".precomputed",
+    "remove_skeleton": ".precomputed",
+    "remove_skeletons": ".precomputed",
+    "list_skeletons": ".precomputed",
+    "has_skeleton": ".precomputed",
+    "extract_neuron_properties": ".precomputed",
+    "skeleton_id_from_neuron": ".precomputed",
+    "SkeletonComponents": ".precomputed",
+    "RemoteDataClient": ".data",
+    "PrecomputedEntry": ".data",
+    "latest_entries": ".data",
+    "PrecomputedStatusQueue": ".data",
+    "ShardAssignment": ".data",
+    "WorkSchedule": ".data",
+    "ReconstructionPageCache": ".data"
+}
+
+__all__ = list(_exports)
+
+if TYPE_CHECKING:
+    from .precomputed import (SegmentInfo, SegmentProperty, SegmentTagProperty, SomaSegmentTagProperty,
+                              NmcpPropertyValues)
+    from .precomputed import SegmentInfoStore, SegmentInfoConflictError, DeferredSegmentInfoWriter
+    from .precomputed import ingest_json_files, read_neurons, StreamedNeuron
+    from .precomputed import (create_from_json_files, create_from_dict, create_from_data, remove_skeleton,
+                              create_from_streamed_neuron, remove_skeletons, list_skeletons, has_skeleton,
+                              extract_neuron_properties, skeleton_id_from_neuron, SkeletonComponents,
+                              upload_skeletons)
+    from .data import (RemoteDataClient, PrecomputedEntry, PrecomputedStatusQueue, ShardAssignment,
+                       ReconstructionPageCache, latest_entries, WorkSchedule)
+
+__getattr__, __dir__ = lazy_exports(__name__, _exports)
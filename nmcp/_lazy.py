@@ -0,0 +1,28 @@
+import importlib
+import sys
+from typing import Callable, Dict, List, Tuple
+
+
+def lazy_exports(module_name: str, exports: Dict[str, str]) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """
+    Module `__getattr__` and `__dir__` (PEP 562) that import each exported name from its submodule on first use.
+    `exports` maps a name to the relative module that defines it.  The value is cached in the package namespace, so
+    later lookups are ordinary attribute access.
+    """
+
+    def __getattr__(name: str):
+        module = exports.get(name)
+
+        if module is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(module, module_name), name)
+
+        setattr(sys.modules[module_name], name, value)
+
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[module_name])) | set(exports))
+
+    return __getattr__, __dir__
@@ -1,2 +1,26 @@
-from .remote_data_client import RemoteDataClient
-from .precomputed_entry import PrecomputedEntry
+from typing import TYPE_CHECKING
+
+from nmcp._lazy import lazy_exports
+
+# Imported on first use; see `nmcp/__init__.py`.
+_exports = {
+    "RemoteDataClient": ".remote_data_client",
+    "PrecomputedEntry": ".precomputed_entry",
+    "latest_entries": ".precomputed_entry",
+    "PrecomputedStatusQueue": ".status_queue",
+    "ShardAssignment": ".work_partition",
+    "WorkSchedule": ".work_schedule",
+    "ReconstructionPageCache": ".page_cache"
+}
+
+__all__ = list(_exports)
+
+if TYPE_CHECKING:
+    from .remote_data_client import RemoteDataClient
+    from .precomputed_entry import PrecomputedEntry, latest_entries
+    from .status_queue import PrecomputedStatusQueue
+    from .work_partition import ShardAssignment
+    from .work_schedule import WorkSchedule
+    from .page_cache import ReconstructionPageCache
+
+__getattr__, __dir__ = lazy_exports(__name__, _exports)
@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from nmcp.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# The node fields requested by `reconstruction_data_query`, stored as one little-endian column each.
+_fields = (
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("z", "<f8"),
+    ("radius", "<f8"),
+    ("sampleNumber", "<i8"),
+    ("parentNumber", "<i8"),
+    ("allenId", "<i8"),
+    ("structureIdentifier", "<i8")
+)
+
+_field_names = frozenset(name for name, _ in _fields)
+
+# Magic, whether the service reported more nodes after the page, and the node count.
+_header = struct.Struct("<8sBI")
+_magic = b"NMCPPG01"
+
+_suffix = ".page"
+
+
+class ReconstructionPageCache:
+    """
+    Local cache of reconstruction node pages keyed by reconstruction id, source version, part, offset, and limit, so
+    that a retried or republished reconstruction is read from disk rather than fetched from the service again.  Each
+    page is stored as fixed-width binary columns with a null mask.
+
+    The least recently used pages are removed once the cache holds more than `max_bytes`.  Pages are taken to be
+    unchanged for a reconstruction id and version; `discard` removes those of a reconstruction whose data has changed
+    without a new version.  Pages of an unknown version (None) are neither read nor stored, since they could not be
+    told apart from those of an earlier source.  Several clients (and threads) may share one cache.
+
+    Processes may also share a cache directory.  Each process keeps its own index of the pages it has found on opening
+    the cache, written, or read, and only those are counted against its `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 4 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # Page path to size, least recently used first.
+        self._pages: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._load_index()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def get(self, reconstruction_id: str, part: str, offset: int, limit: int,
+            version: Optional[int] = None) -> Optional[Tuple[List[dict], bool]]:
+        """The nodes of a cached page and whether the service had more after it, or None if it is not cached."""
+        if version is None:
+            return None
+
+        path = self._page_path(reconstruction_id, part, offset, limit, version)
+
+        with self._lock:
+            if path not in self._pages and not self._adopt(path):
+                metrics.page_cache_total.inc(result="miss")
+                return None
+
+            try:
+                with open(path, "rb") as f:
+                    page = _decode_page(f.read())
+                # The modification time orders pages by use for the next process that opens the cache.
+                os.utime(path)
+            except (OSError, ValueError) as ex:
+                logger.warning(f"discarding unreadable cached page {path}: {ex}")
+                self._remove(path)
+                page = None
+
+            if page is None:
+                metrics.page_cache_total.inc(result="miss")
+                return None
+
+            self._pages.move_to_end(path)
+
+            self._evict()
+
+        metrics.page_cache_total.inc(result="hit")
+
+        return page
+
+    def put(self, reconstruction_id: str, part: str, offset: int, limit: int, nodes: List[dict], has_more: bool,
+            version: Optional[int] = None) -> bool:
+        """
+        Store a fetched page.  Returns False for a page that is not cached because its version is unknown or its nodes
+        have other fields.
+        """
+        if version is None:
+            return False
+
+        data = _encode_page(nodes, has_more)
+
+        if data is None:
+            return False
+
+        path = self._page_path(reconstruction_id, part, offset, limit, version)
+
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # A page is never seen partially written, by this or another process.
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+            self._size += len(data) - self._pages.pop(path, 0)
+            self._pages[path] = len(data)
+
+            self._evict()
+
+        return True
+
+    def discard(self, reconstruction_id: str):
+        """Remove every cached page of a reconstruction, of any version."""
+        directory = self._reconstruction_directory(reconstruction_id)
+
+        with self._lock:
+            # Including pages written by another process sharing the directory.
+            paths = set(p for p in self._pages if os.path.dirname(p) == directory)
+            if os.path.isdir(directory):
+                paths.update(entry.path for entry in os.scandir(directory) if entry.name.endswith(_suffix))
+
+            for path in paths:
+                self._remove(path)
+
+    def _adopt(self, path: str) -> bool:
+        """Index a page written by another process after this cache was opened."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+
+        self._pages[path] = size
+        self._size += size
+
+        return True
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._pages) > 0:
+            self._remove(next(iter(self._pages)))
+
+    def _remove(self, path: str):
+        self._size -= self._pages.pop(path, 0)
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # Other pages of the reconstruction remain.
+            pass
+
+    def _load_index(self):
+        pages = list()
+
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for page in os.scandir(entry.path):
+                if page.name.endswith(_suffix):
+                    stat = page.stat()
+                    pages.append((stat.st_mtime, page.path, stat.st_size))
+
+        for _, path, size in sorted(pages):
+            self._pages[path] = size
+            self._size += size
+
+        self._evict()
+
+    def _reconstruction_directory(self, reconstruction_id: str) -> str:
+        # Reconstruction ids are not necessarily safe file names.
+        return os.path.join(self.directory, hashlib.sha1(reconstruction_id.encode("utf-8")).hexdigest())
+
+    def _page_path(self, reconstruction_id: str, part: str, offset: int, limit: int, version: int) -> str:
+        return os.path.join(self._reconstruction_directory(reconstruction_id),
+                            f"{part}-{offset}-{limit}-v{version}{_suffix}")
+
+
+def _encode_page(nodes: List[dict], has_more: bool) -> Optional[bytes]:
+    if any(node.keys() != _field_names for node in nodes):
+        return None
+
+    count = len(nodes)
+
+    nulls = np.zeros(count, dtype="<u1")
+    columns = list()
+
+    for bit, (name, dtype) in enumerate(_fields):
+        values = [node[name] for node in nodes]
+
+        missing = np.fromiter((value is None for value in values), dtype=bool, count=count)
+
+        if missing.any():
+            nulls[missing] |= 1 << bit
+            values = [0 if value is None else value for value in values]
+
+        columns.append(np.asarray(values, dtype=dtype).tobytes())
+
+    return _header.pack(_magic, int(bool(has_more)), count) + b"".join(columns) + nulls.tobytes()
+
+
+def _decode_page(data: bytes) -> Tuple[List[dict], bool]:
+    magic, has_more, count = _header.unpack_from(data)
+
+    if magic != _magic:
+        raise ValueError("not a cached page")
+
+    offset = _header.size
+    columns = list()
+
+    for _, dtype in _fields:
+        column = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        columns.append(column.tolist())
+        offset += column.nbytes
+
+    nulls = np.frombuffer(data, dtype="<u1", count=count, offset=offset)
+
+    for bit, column in enumerate(columns):
+        for index in np.flatnonzero(nulls & (1 << bit)):
+            column[index] = None
+
+    names = [name for name, _ in _fields]
+
+    return [dict(zip(names, values)) for values in zip(*columns)], bool(has_more)
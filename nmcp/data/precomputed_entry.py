@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
 
 
 @dataclass
@@ -8,3 +9,36 @@ class PrecomputedEntry:
     version: int | None
     reconstructionId: str
     generatedAt: float | None
+
+    @property
+    def generated_version(self) -> int:
+        """The version reported when the entry is generated.  Entries without a source version are reported as 1."""
+        return self.version if self.version is not None else 1
+
+
+def latest_entries(entries: Iterable[PrecomputedEntry]) -> Tuple[List[PrecomputedEntry],
+                                                                 Dict[str, List[PrecomputedEntry]]]:
+    """
+    The latest entry of each reconstruction, in queue order, and the older entries each of them supersedes by entry
+    id.  An entry without a version is older than any versioned one, and of two entries with the same version the one
+    queued last is the latest.
+    """
+    entries = list(entries)
+
+    latest: Dict[str, Tuple[tuple, PrecomputedEntry]] = dict()
+
+    for index, entry in enumerate(entries):
+        key = (entry.version is not None, entry.version or 0, index)
+        current = latest.get(entry.reconstructionId)
+        if current is None or key > current[0]:
+            latest[entry.reconstructionId] = (key, entry)
+
+    winners = {entry.id for _, entry in latest.values()}
+
+    superseded: Dict[str, List[PrecomputedEntry]] = dict()
+
+    for entry in entries:
+        if entry.id not in winners:
+            superseded.setdefault(latest[entry.reconstructionId][1].id, list()).append(entry)
+
+    return [entry for entry in entries if entry.id in winners], superseded
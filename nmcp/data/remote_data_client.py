@@ -1,13 +1,18 @@
 import json
 import logging
 from datetime import datetime
-from typing import List
+from typing import List, Iterable, Optional, Tuple, TYPE_CHECKING
 
 from gql import Client, gql
 from gql.transport.requests import RequestsHTTPTransport
 
+from nmcp.instrumentation import metrics, job_records, tracing
+
 from .precomputed_entry import PrecomputedEntry
 
+if TYPE_CHECKING:
+    from .page_cache import ReconstructionPageCache
+
 logger = logging.getLogger(__name__)
 
 pending_query = gql(
@@ -94,9 +99,42 @@ reconstruction_data_query = gql(
 )
 
 
+# Only the node counts of each part, to estimate the cost of a reconstruction before fetching it.
+reconstruction_size_query = gql(
+    """
+    query ReconstructionSize($id: String!, $input: ReconstructionDataChunkedInput) {
+        reconstructionDataChunked(id: $id, input: $input) {
+            axonChunkInfo {
+                totalCount
+            }
+            dendriteChunkInfo {
+                totalCount
+            }
+        }
+    }
+    """
+)
+
+
+class _MeteredTransport(RequestsHTTPTransport):
+    """Counts response bytes received from the service."""
+
+    def connect(self):
+        super().connect()
+        self.session.hooks["response"].append(_count_response_bytes)
+
+
+def _count_response_bytes(response, *args, **kwargs):
+    metrics.bytes_fetched_total.inc(len(response.content))
+    job_records.add_bytes_fetched(len(response.content))
+
+
 class RemoteDataClient:
-    def __init__(self, url: str, auth_key: str):
-        transport = RequestsHTTPTransport(
+    def __init__(self, url: str, auth_key: str, page_cache: Optional["ReconstructionPageCache"] = None):
+        self._url = url
+        self._auth_key = auth_key
+
+        transport = _MeteredTransport(
             url=url,
             verify=True,
             retries=3,
@@ -105,23 +143,68 @@ class RemoteDataClient:
 
         self._client = Client(transport=transport, fetch_schema_from_transport=False)
 
+        # Pages of reconstruction nodes fetched before, e.g., by an attempt that failed after downloading them.
+        self._page_cache = page_cache
+
+    def clone(self) -> "RemoteDataClient":
+        """
+        A client for the same service and page cache.  A client executes one request at a time, so each thread that
+        makes requests concurrently needs its own.
+        """
+        return RemoteDataClient(self._url, self._auth_key, self._page_cache)
+
     def find_pending(self) -> List[PrecomputedEntry]:
         pending = list()
 
-        result = self._client.execute(pending_query)
+        with tracing.span("graphql.pendingPrecomputed") as span:
+            result = self._client.execute(pending_query)
+            span.set_attribute("pending", len(result["pendingPrecomputed"]))
 
         for precomputed in result["pendingPrecomputed"]:
             pending.append(PrecomputedEntry(**precomputed))
 
         return pending
 
-    def mark_generated(self, entry_id: str) -> None:
-        params = {"id": entry_id, "version": 1, "generatedAt": datetime.now().timestamp() * 1000}
-        result = self._client.execute(update_mutation, variable_values=params)
+    def mark_generated(self, entry_id: str, version: int = 1) -> None:
+        params = {"id": entry_id, "version": version, "generatedAt": datetime.now().timestamp() * 1000}
+        with tracing.span("graphql.updatePrecomputed", updates=1):
+            result = self._client.execute(update_mutation, variable_values=params)
 
     def mark_failed(self, entry_id: str) -> None:
         params = {"id": entry_id, "version": -1, "generatedAt": datetime.now().timestamp() * 1000}
-        result = self._client.execute(update_mutation, variable_values=params)
+        with tracing.span("graphql.updatePrecomputed", updates=1):
+            result = self._client.execute(update_mutation, variable_values=params)
+
+    def mark_many(self, updates: Iterable[Tuple[str, int, float]]) -> List[str]:
+        """Send several `updatePrecomputed` mutations in a single request.
+
+        Each update is aliased within one mutation document so the service receives a single round trip regardless of
+        the number of entries.
+
+        Args:
+            updates: (entry id, version, generatedAt) tuples.  Use a version of -1 to mark an entry as failed.
+
+        Returns:
+            The ids of the entries acknowledged by the service.
+        """
+        updates = list(updates)
+
+        if len(updates) == 0:
+            return []
+
+        document, params = _create_batch_update(updates)
+
+        with tracing.span("graphql.updatePrecomputed", updates=len(updates)):
+            result = self._client.execute(gql(document), variable_values=params)
+
+        acknowledged = list()
+
+        for index in range(len(updates)):
+            updated = result.get(f"u{index}") if result else None
+            if updated is not None:
+                acknowledged.append(updated["id"])
+
+        return acknowledged
 
     def get_reconstruction_header(self, reconstruction_id: str):
         """Get header information for a reconstruction."""
@@ -130,7 +213,8 @@ class RemoteDataClient:
                 "parts": ["header"]
             }
             params = {"id": reconstruction_id, "input": header_input}
-            result = self._client.execute(reconstruction_data_query, variable_values=params)
+            with tracing.span("graphql.reconstructionDataChunked", reconstruction_id=reconstruction_id, part="header"):
+                result = self._client.execute(reconstruction_data_query, variable_values=params)
             
             if not result or "reconstructionDataChunked" not in result:
                 return None
@@ -144,7 +228,34 @@ class RemoteDataClient:
 
         return None
 
-    def get_axon_chunks(self, reconstruction_id: str, chunk_size: int = 25000, offset: int = 0, limit: int = None):
+    def get_reconstruction_size(self, reconstruction_id: str) -> Optional[int]:
+        """The total number of axon and dendrite nodes of a reconstruction, without fetching any nodes."""
+        try:
+            # The smallest pages, in case a service treats a missing limit as unlimited.
+            size_input = {
+                "parts": ["axon", "dendrite"],
+                "axonLimit": 1,
+                "dendriteLimit": 1
+            }
+            params = {"id": reconstruction_id, "input": size_input}
+            with tracing.span("graphql.reconstructionDataChunked", reconstruction_id=reconstruction_id, part="size"):
+                result = self._client.execute(reconstruction_size_query, variable_values=params)
+
+            data = result.get("reconstructionDataChunked") if result else None
+
+            if data is None:
+                return None
+
+            return sum(info["totalCount"] or 0 for info in (data["axonChunkInfo"], data["dendriteChunkInfo"])
+                       if info is not None)
+
+        except Exception as ex:
+            logger.error(f"Error getting reconstruction size for {reconstruction_id}: {ex}")
+
+        return None
+
+    def get_axon_chunks(self, reconstruction_id: str, chunk_size: int = 25000, offset: int = 0, limit: int = None,
+                        version: Optional[int] = None):
         """Get axon data in chunks for a reconstruction.
         
         Args:
@@ -152,6 +263,8 @@ class RemoteDataClient:
             chunk_size: Number of points to retrieve per request
             offset: Starting offset for retrieval
             limit: Maximum total number of points to retrieve (None for all)
+            version: Source version of the reconstruction, which distinguishes its pages in the page cache; pages of
+                an unknown version are not cached
         
         Returns:
             Dict with "data" (list of axon points) and "chunk_info" (pagination info)
@@ -169,17 +282,10 @@ class RemoteDataClient:
                     if request_limit <= 0:
                         break
                 
-                axon_input = {
-                    "parts": ["axon"],
-                    "axonOffset": current_offset,
-                    "axonLimit": request_limit
-                }
-                params = {"id": reconstruction_id, "input": axon_input}
-                result = self._client.execute(reconstruction_data_query, variable_values=params)
+                page = self._fetch_page(reconstruction_id, "axon", current_offset, request_limit, version)
                 
-                if result and "reconstructionDataChunked" in result:
-                    chunk_data = result["reconstructionDataChunked"]
-                    chunk_points = chunk_data["axon"] or []
+                if page is not None:
+                    chunk_points, has_more = page
                     axon_data.extend(chunk_points)
                     
                     # Update tracking variables
@@ -187,13 +293,9 @@ class RemoteDataClient:
                         remaining_limit -= len(chunk_points)
                     current_offset += len(chunk_points)
                     
-                    # Check if we have more data and should continue
-                    chunk_info = chunk_data["axonChunkInfo"]
-                    if not chunk_info or not chunk_info["hasMore"] or len(chunk_points) == 0:
-                        break
-                        
-                    # If we got fewer points than requested, we"re done
-                    if len(chunk_points) < request_limit:
+                    # Check if we have more data and should continue.  The service may return fewer points than
+                    # requested when its page size is smaller, so a short chunk alone does not mean the end.
+                    if not has_more or len(chunk_points) == 0:
                         break
                 else:
                     break
@@ -212,7 +314,8 @@ class RemoteDataClient:
 
         return None
 
-    def get_dendrite_chunks(self, reconstruction_id: str, chunk_size: int = 25000, offset: int = 0, limit: int = None):
+    def get_dendrite_chunks(self, reconstruction_id: str, chunk_size: int = 25000, offset: int = 0, limit: int = None,
+                            version: Optional[int] = None):
         """Get dendrite data in chunks for a reconstruction.
         
         Args:
@@ -220,6 +323,8 @@ class RemoteDataClient:
             chunk_size: Number of points to retrieve per request
             offset: Starting offset for retrieval
             limit: Maximum total number of points to retrieve (None for all)
+            version: Source version of the reconstruction, which distinguishes its pages in the page cache; pages of
+                an unknown version are not cached
         
         Returns:
             Dict with "data" (list of dendrite points) and "chunk_info" (pagination info)
@@ -237,17 +342,10 @@ class RemoteDataClient:
                     if request_limit <= 0:
                         break
                 
-                dendrite_input = {
-                    "parts": ["dendrite"],
-                    "dendriteOffset": current_offset,
-                    "dendriteLimit": request_limit
-                }
-                params = {"id": reconstruction_id, "input": dendrite_input}
-                result = self._client.execute(reconstruction_data_query, variable_values=params)
+                page = self._fetch_page(reconstruction_id, "dendrite", current_offset, request_limit, version)
                 
-                if result and "reconstructionDataChunked" in result:
-                    chunk_data = result["reconstructionDataChunked"]
-                    chunk_points = chunk_data["dendrite"] or []
+                if page is not None:
+                    chunk_points, has_more = page
                     dendrite_data.extend(chunk_points)
                     
                     # Update tracking variables
@@ -255,13 +353,9 @@ class RemoteDataClient:
                         remaining_limit -= len(chunk_points)
                     current_offset += len(chunk_points)
                     
-                    # Check if we have more data and should continue
-                    chunk_info = chunk_data["dendriteChunkInfo"]
-                    if not chunk_info or not chunk_info["hasMore"] or len(chunk_points) == 0:
-                        break
-                        
-                    # If we got fewer points than requested, we"re done
-                    if len(chunk_points) < request_limit:
+                    # Check if we have more data and should continue.  The service may return fewer points than
+                    # requested when its page size is smaller, so a short chunk alone does not mean the end.
+                    if not has_more or len(chunk_points) == 0:
                         break
                 else:
                     break
@@ -280,6 +374,42 @@ class RemoteDataClient:
 
         return None
 
+    def _fetch_page(self, reconstruction_id: str, part: str, offset: int, limit: int,
+                    version: Optional[int] = None) -> Optional[Tuple[list, bool]]:
+        """The nodes of one page of a part and whether the service has more, from the page cache when present."""
+        if self._page_cache is not None:
+            page = self._page_cache.get(reconstruction_id, part, offset, limit, version)
+            if page is not None:
+                return page
+
+        part_input = {
+            "parts": [part],
+            f"{part}Offset": offset,
+            f"{part}Limit": limit
+        }
+        params = {"id": reconstruction_id, "input": part_input}
+        with tracing.span("graphql.reconstructionDataChunked", reconstruction_id=reconstruction_id,
+                          part=part, offset=offset, limit=limit) as span:
+            result = self._client.execute(reconstruction_data_query, variable_values=params)
+            if result and "reconstructionDataChunked" in result:
+                span.set_attribute("nodes", len(result["reconstructionDataChunked"][part] or []))
+
+        if not result or "reconstructionDataChunked" not in result:
+            return None
+
+        chunk_data = result["reconstructionDataChunked"]
+        chunk_info = chunk_data[f"{part}ChunkInfo"]
+
+        page = chunk_data[part] or [], bool(chunk_info and chunk_info["hasMore"])
+
+        if self._page_cache is not None:
+            try:
+                self._page_cache.put(reconstruction_id, part, offset, limit, *page, version=version)
+            except OSError as ex:
+                logger.warning(f"could not cache {part} page at {offset} for {reconstruction_id}: {ex}")
+
+        return page
+
     def get_reconstruction_data(self, reconstruction_id: str):
         """Get complete reconstruction data using the individual chunk methods.
         
@@ -296,7 +426,7 @@ class RemoteDataClient:
                 "id": header["id"],
                 "idString": header["idString"],
                 "DOI": header["DOI"],
-                "allenInformation": header["allenInformation"],
+                "allenInformation": header.get("allenInformation"),
                 "axon": [],
                 "dendrite": []
             }
@@ -321,3 +451,22 @@ class RemoteDataClient:
             logger.error(f"Error getting reconstruction data for {reconstruction_id}: {ex}")
 
         return None
+
+
+def _create_batch_update(updates: List[Tuple[str, int, float]]) -> Tuple[str, dict]:
+    """Build an aliased mutation document and its variables for a list of precomputed entry updates."""
+    arguments = list()
+    selections = list()
+    params = dict()
+
+    for index, (entry_id, version, generated_at) in enumerate(updates):
+        arguments.append(f"$id{index}: String!, $version{index}: Int!, $generatedAt{index}: Date!")
+        selections.append(f"u{index}: updatePrecomputed(id: $id{index}, version: $version{index}, "
+                          f"generatedAt: $generatedAt{index}) {{ id version }}")
+        params[f"id{index}"] = entry_id
+        params[f"version{index}"] = version
+        params[f"generatedAt{index}"] = generated_at
+
+    document = f"mutation BatchUpdatePrecomputed({', '.join(arguments)}) {{\n" + "\n".join(selections) + "\n}"
+
+    return document, params
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .remote_data_client import RemoteDataClient
+
+logger = logging.getLogger(__name__)
+
+_failed_version = -1
+
+
+class PrecomputedStatusQueue:
+    """
+    Write-behind queue for precomputed entry status updates.  Updates are sent to the service in batches using
+    `RemoteDataClient.mark_many`, either when `max_batch` updates are waiting or when the oldest waiting update is older
+    than `max_delay` seconds.
+
+    When a journal path is provided, every update is appended to the journal before it is queued and the journal is
+    only trimmed after the service acknowledges the update.  Updates left over from a previous process (e.g., after a
+    crash) are replayed when the queue is created.
+    """
+
+    def __init__(self, client: "RemoteDataClient", journal_path: Optional[str] = None, max_batch: int = 50,
+                 max_delay: float = 5.0):
+        self._client = client
+        self._journal_path = journal_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, int, float]] = list()
+        self._oldest: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+
+        self._replay_journal()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def mark_generated(self, entry_id: str, version: int = 1) -> None:
+        self._enqueue(entry_id, version)
+
+    def mark_failed(self, entry_id: str) -> None:
+        self._enqueue(entry_id, _failed_version)
+
+    def maybe_flush(self) -> bool:
+        """Flush if either the size or the age limit has been reached."""
+        with self._lock:
+            if len(self._pending) == 0:
+                return True
+
+            if len(self._pending) >= self.max_batch or time.monotonic() - self._oldest >= self.max_delay:
+                return self.flush()
+
+        return False
+
+    def flush(self) -> bool:
+        """
+        Send all waiting updates.  Returns True if the queue is empty afterward.  Updates that could not be sent remain
+        queued (and journaled) for the next attempt.
+        """
+        with self._lock:
+            self._cancel_timer()
+
+            while len(self._pending) > 0:
+                batch = self._pending[:self.max_batch]
+
+                try:
+                    acknowledged = set(self._client.mark_many(batch))
+                except Exception as ex:
+                    logger.warning(f"could not send {len(batch)} precomputed status updates: {ex}")
+                    self._schedule_timer()
+                    return False
+
+                remaining = [u for u in batch if u[0] not in acknowledged]
+
+                self._pending = remaining + self._pending[len(batch):]
+                self._write_journal()
+
+                if len(remaining) > 0:
+                    logger.warning(f"{len(remaining)} precomputed status updates were not acknowledged")
+                    self._schedule_timer()
+                    return False
+
+            self._oldest = None
+
+        return True
+
+    def close(self) -> bool:
+        return self.flush()
+
+    def _enqueue(self, entry_id: str, version: int):
+        update = (entry_id, version, datetime.now().timestamp() * 1000)
+
+        with self._lock:
+            self._append_journal(update)
+
+            self._pending.append(update)
+
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+            if not self.maybe_flush():
+                self._schedule_timer()
+
+    def _schedule_timer(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if not self.maybe_flush():
+                self._schedule_timer()
+
+    def _replay_journal(self):
+        if self._journal_path is None or not os.path.exists(self._journal_path):
+            return
+
+        with open(self._journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._pending.append((entry["id"], entry["version"], entry["generatedAt"]))
+                except (ValueError, KeyError):
+                    # A partially written final line from an interrupted append.
+                    continue
+
+        if len(self._pending) > 0:
+            logger.info(f"replaying {len(self._pending)} journaled precomputed status updates")
+            self._oldest = time.monotonic()
+            self._write_journal()
+
+    def _append_journal(self, update: Tuple[str, int, float]):
+        if self._journal_path is None:
+            return
+
+        with open(self._journal_path, "a") as f:
+            f.write(_journal_line(update))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_journal(self):
+        if self._journal_path is None:
+            return
+
+        temp_path = f"{self._journal_path}.tmp"
+
+        with open(temp_path, "w") as f:
+            f.writelines(_journal_line(u) for u in self._pending)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, self._journal_path)
+
+
+def _journal_line(update: Tuple[str, int, float]) -> str:
+    return json.dumps({"id": update[0], "version": update[1], "generatedAt": update[2]}) + "\n"
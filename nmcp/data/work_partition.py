@@ -0,0 +1,38 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Iterable, List
+
+from .precomputed_entry import PrecomputedEntry
+
+
+@dataclass(frozen=True)
+class ShardAssignment:
+    """
+    Deterministic partition of pending precomputed entries across `count` worker replicas.  An entry is owned by
+    exactly one replica, chosen by a stable hash of its skeleton segment id, so every version of a reconstruction is
+    always handled by the same replica.
+    """
+    index: int = 0
+    count: int = 1
+
+    def __post_init__(self):
+        if self.count < 1:
+            raise ValueError("shard count must be at least 1")
+        if not 0 <= self.index < self.count:
+            raise ValueError(f"shard index must be in [0, {self.count})")
+
+    def owns(self, entry: PrecomputedEntry) -> bool:
+        if self.count == 1:
+            return True
+
+        return shard_for(entry.skeletonSegmentId, self.count) == self.index
+
+    def filter(self, entries: Iterable[PrecomputedEntry]) -> List[PrecomputedEntry]:
+        return [e for e in entries if self.owns(e)]
+
+
+def shard_for(skeleton_id: int, count: int) -> int:
+    # Python's built-in hash is salted per process for some types; a digest is stable across replicas and restarts.
+    digest = hashlib.blake2b(str(skeleton_id).encode(), digest_size=8).digest()
+
+    return int.from_bytes(digest, "big") % count
@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .precomputed_entry import PrecomputedEntry
+
+
+@dataclass
+class WorkSchedule:
+    """
+    Shortest-job-first scheduling of pending entries by their estimated size in nodes.  Entries estimated at
+    `large_nodes` or more, and those whose size is not known, go to a large lane with its own `large_concurrency`, so
+    that a few very large reconstructions do not hold up many small ones in the fast lane.  Each lane takes its entries
+    smallest first.  Every scheduled entry is still processed, so large entries are delayed but never starved.
+
+    With a `large_concurrency` of 0 there is a single lane.
+    """
+    large_nodes: int = 250000
+    fast_concurrency: int = 1
+    large_concurrency: int = 1
+
+    def lanes(self, entries: List[PrecomputedEntry],
+              sizes: Dict[str, Optional[int]]) -> Tuple[List[PrecomputedEntry], List[PrecomputedEntry]]:
+        """The entries of the fast and the large lane, each in the order they should be processed."""
+        fast = list()
+        large = list()
+
+        for entry in entries:
+            size = sizes.get(entry.id)
+            if self.large_concurrency > 0 and (size is None or size >= self.large_nodes):
+                large.append(entry)
+            else:
+                fast.append(entry)
+
+        def key(entry: PrecomputedEntry):
+            size = sizes.get(entry.id)
+            return size is None, size or 0
+
+        # Sorting is stable, so entries of the same size stay in queue order.
+        return sorted(fast, key=key), sorted(large, key=key)
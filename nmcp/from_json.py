@@ -4,16 +4,36 @@ import logging
 import os.path
 import sys
 
-from nmcp import create_from_json_files
+from nmcp import create_from_json_files, create_from_streamed_neuron, ingest_json_files, read_neurons
+from nmcp.instrumentation import JobProfiler, add_profiling_arguments, profiling_options_from_arguments
 
 logging.basicConfig(level=logging.WARNING)
 
 
+def create_profiled(input_files, output: str, profiler: JobProfiler):
+    for json_file in input_files:
+        with profiler.profile(os.path.basename(json_file)) as job:
+            job.node_count = 0
+
+            for neuron in read_neurons(json_file):
+                job.job_id = neuron.header.get("idString") or job.job_id
+                job.node_count += neuron.node_count
+
+                create_from_streamed_neuron(neuron, output)
+
+
 def main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("input", help="the input json file")
     parser.add_argument("output", help="the output cloud volume location")
+    parser.add_argument("--parallel", action="store_true",
+                        help="build skeletons in a process pool and write segment properties once at the end")
+    parser.add_argument("--processes", type=int, help="build processes for --parallel (default: one per CPU)")
+    parser.add_argument("--upload-concurrency", type=int, default=8, help="concurrent uploads for --parallel")
+    parser.add_argument("--variants", action="store_true",
+                        help="with --parallel, write full, axon, and dendrite datasets under the output location")
+    add_profiling_arguments(parser)
 
     args = parser.parse_args()
 
@@ -22,7 +42,21 @@ def main():
     else:
         input_files = [args.input]
 
-    create_from_json_files(input_files, args.output)
+    profiling = profiling_options_from_arguments(args)
+
+    if args.variants and not args.parallel:
+        parser.error("--variants requires --parallel")
+
+    if args.parallel:
+        if profiling.enabled:
+            parser.error("profiling applies to serial ingestion only")
+        ingested = ingest_json_files(input_files, args.output, args.variants, args.processes, args.upload_concurrency)
+        for location, ids in ingested.items():
+            print(f"{len(ids)} skeletons from {len(input_files)} files written to {location}")
+    elif profiling.enabled:
+        create_profiled(input_files, args.output, JobProfiler(profiling))
+    else:
+        create_from_json_files(input_files, args.output)
 
     return True
 
@@ -1,9 +1,278 @@
 import argparse
+import json
 import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from nmcp import RemoteDataClient, create_from_dict
+from nmcp import (RemoteDataClient, PrecomputedEntry, PrecomputedStatusQueue, ReconstructionPageCache,
+                  DeferredSegmentInfoWriter, create_from_data, skeleton_id_from_neuron, latest_entries)
+from nmcp.instrumentation import metrics, tracing
+from nmcp.precomputed_worker import (load_reconstruction, save_reconstruction, create_segment_info_writers,
+                                     is_published)
 
 logging.basicConfig(level=logging.WARNING)
+logging.getLogger("nmcp").setLevel(logging.INFO)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass
+class BackfillItem:
+    reconstruction_id: str
+    # Taken from the reconstruction's `idString` when not known.
+    skeleton_id: Optional[int] = None
+    # The precomputed entry to report, for items taken from the pending queue.
+    entry_id: Optional[str] = None
+    # Source version of the reconstruction, when known.
+    version: Optional[int] = None
+    # Older entries of the same reconstruction, reported along with `entry_id`.
+    superseded: List[str] = field(default_factory=list)
+
+    @property
+    def entry(self) -> PrecomputedEntry:
+        return PrecomputedEntry(self.entry_id, self.skeleton_id, self.version, self.reconstruction_id, None)
+
+    @property
+    def entry_ids(self) -> List[str]:
+        return [self.entry_id] + self.superseded if self.entry_id is not None else []
+
+
+def items_from_pending(pending: List[PrecomputedEntry]) -> List[BackfillItem]:
+    """An item for the latest entry of each reconstruction, which also reports the older entries it supersedes."""
+    latest, superseded = latest_entries(pending)
+
+    return [BackfillItem(p.reconstructionId, p.skeletonSegmentId, p.id, p.version,
+                         [e.id for e in superseded.get(p.id, [])]) for p in latest]
+
+
+class BackfillCheckpoint:
+    """
+    Append-only JSON lines of finished reconstructions.  A reconstruction is recorded as generated only after the
+    segment properties that include it have been written, so a resumed backfill never skips one whose properties were
+    lost.  Failed reconstructions are recorded but attempted again on resume.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results: Dict[str, str] = dict()
+
+        terminated = True
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    terminated = line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interruption.
+                        continue
+                    self.results[record["reconstruction_id"]] = record["result"]
+
+        self._file = open(path, "a")
+
+        if not terminated:
+            self._file.write("\n")
+
+    def is_generated(self, reconstruction_id: str) -> bool:
+        return self.results.get(reconstruction_id) == "generated"
+
+    def record(self, results: Iterable[Tuple[str, str]]):
+        lines = list()
+
+        for reconstruction_id, result in results:
+            self.results[reconstruction_id] = result
+            lines.append(json.dumps({"reconstruction_id": reconstruction_id, "result": result}) + "\n")
+
+        if len(lines) > 0:
+            self._file.writelines(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def backfill(url: str, auth_key: str, output: str, items: List[BackfillItem],
+             checkpoint: Optional[BackfillCheckpoint] = None, status: Optional[PrecomputedStatusQueue] = None,
+             concurrency: int = 4, properties_batch: int = 100, properties_delay: float = 300.0,
+             page_cache: Optional[ReconstructionPageCache] = None, variants: bool = False) -> Dict[str, int]:
+    """
+    Generate the skeletons of many reconstructions.  With `variants`, the full, axon, and dendrite skeletons are written
+    to `full`, `axon`, and `dendrite` datasets under `output`, as the precomputed worker does; otherwise the full
+    skeleton is written to a single dataset at `output`.  Up to `concurrency` reconstructions are
+    fetched at once while completed ones are written, with at most twice that many fetched reconstructions held in
+    memory.  Segment properties are written in batches of `properties_batch`.  Pages found in `page_cache` are not
+    fetched again; only those of reconstructions with a known source version are cached.
+
+    Reconstructions already generated according to `checkpoint`, or whose source version is already published, are
+    skipped.  When `status` is provided, entries from the pending queue are reported as they would be by the
+    precomputed worker.  Returns the number of reconstructions generated, failed, and skipped.
+    """
+    todo = [item for item in items if checkpoint is None or not checkpoint.is_generated(item.reconstruction_id)]
+
+    counts = {"generated": 0, "failed": 0, "skipped": len(items) - len(todo)}
+
+    if counts["skipped"] > 0:
+        logger.info(f"skipping {counts['skipped']} reconstructions already generated")
+
+    if variants:
+        writers = create_segment_info_writers(output, properties_batch, properties_delay)
+    else:
+        writers = {"full": DeferredSegmentInfoWriter(output, properties_batch, properties_delay)}
+
+    # Written to the output but not yet included in stored segment properties.
+    completed: List[BackfillItem] = list()
+
+    # A gql client cannot execute requests from several threads at once.
+    clients = threading.local()
+
+    def fetch(item: BackfillItem):
+        client = getattr(clients, "client", None)
+
+        if client is None:
+            client = clients.client = RemoteDataClient(url, auth_key, page_cache)
+
+        skeleton_id = item.skeleton_id
+
+        if skeleton_id is None:
+            header = client.get_reconstruction_header(item.reconstruction_id)
+            skeleton_id = skeleton_id_from_neuron(header) if header is not None else None
+
+        if skeleton_id is None:
+            return None, None
+
+        entry = PrecomputedEntry(item.entry_id, skeleton_id, item.version, item.reconstruction_id, None)
+
+        return skeleton_id, load_reconstruction(client, entry)
+
+    def commit(force: bool):
+        for writer in writers.values():
+            if force:
+                writer.flush()
+            else:
+                writer.maybe_flush()
+
+        if any(writer.dirty for writer in writers.values()):
+            return
+
+        if checkpoint is not None:
+            checkpoint.record((item.reconstruction_id, "generated") for item in completed)
+
+        if status is not None:
+            for item in completed:
+                for entry_id in item.entry_ids:
+                    status.mark_generated(entry_id, item.entry.generated_version)
+
+        completed.clear()
+
+    def fail(item: BackfillItem):
+        counts["failed"] += 1
+        metrics.jobs_total.inc(result="failed")
+
+        if checkpoint is not None:
+            checkpoint.record([(item.reconstruction_id, "failed")])
+
+        if status is not None:
+            for entry_id in item.entry_ids:
+                status.mark_failed(entry_id)
+
+    remaining = iter(todo)
+    fetching: Dict[Future, BackfillItem] = dict()
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def fetch_next():
+        for item in remaining:
+            if item.skeleton_id is not None and is_published(writers, item.entry):
+                logger.info(f"{item.reconstruction_id} version {item.version} is already generated")
+                counts["skipped"] += 1
+                completed.append(item)
+                continue
+
+            fetching[executor.submit(fetch, item)] = item
+            return
+
+    try:
+        for _ in range(2 * concurrency):
+            fetch_next()
+
+        while len(fetching) > 0:
+            done, _ = wait(fetching, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                item = fetching.pop(future)
+                fetch_next()
+
+                try:
+                    skeleton_id, reconstruction = future.result()
+                except Exception as ex:
+                    logger.error(f"could not fetch {item.reconstruction_id}: {ex}")
+                    skeleton_id, reconstruction = None, None
+
+                if reconstruction is None:
+                    fail(item)
+                    continue
+
+                axon_components, dendrite_components, properties = reconstruction
+
+                try:
+                    with tracing.span("reconstruction", reconstruction_id=item.reconstruction_id,
+                                      skeleton_id=skeleton_id):
+                        if variants:
+                            saved = save_reconstruction(output, skeleton_id, properties, axon_components,
+                                                        dendrite_components, writers, item.version)
+                        else:
+                            saved = create_from_data(axon_components, dendrite_components, properties, output,
+                                                     skeleton_id, writers["full"], item.version)
+                except Exception as ex:
+                    logger.error(f"could not save {item.reconstruction_id}: {ex}")
+                    saved = False
+
+                if not saved:
+                    # Recorded as failed so that a resumed backfill attempts it again.
+                    fail(item)
+                    continue
+
+                counts["generated"] += 1
+                metrics.jobs_total.inc(result="generated")
+
+                completed.append(item)
+                commit(False)
+
+                finished = counts["generated"] + counts["failed"]
+                if finished % 100 == 0:
+                    logger.info(f"{finished} of {len(todo)} reconstructions processed")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        # Whatever was written before an interruption is kept.
+        commit(True)
+
+        if status is not None:
+            status.flush()
+
+    return counts
+
+
+def read_backfill_items(path: str) -> List[BackfillItem]:
+    """One reconstruction id per line, optionally followed by its skeleton id.  Lines starting with `#` are ignored."""
+    items = list()
+
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+
+            if len(fields) == 0 or fields[0].startswith("#"):
+                continue
+
+            items.append(BackfillItem(fields[0], int(fields[1]) if len(fields) > 1 else None))
+
+    return items
 
 
 def main():
@@ -12,19 +281,53 @@ def main():
     parser.add_argument("-o", "--output", help="the output cloud volume location")
     parser.add_argument("-u", "--url", help="URL of the GraphQL service")
     parser.add_argument("-a", "--authkey", help="authorization header for GraphQL service")
+    parser.add_argument("--variants", action="store_true",
+                        help="write full, axon, and dendrite datasets under the output location, as the precomputed "
+                             "worker does, rather than a single full dataset at the output location")
+    parser.add_argument("--ids", help="file of reconstruction ids to generate instead of the pending entries")
+    parser.add_argument("--checkpoint", help="file recording finished reconstructions, used to resume a backfill")
+    parser.add_argument("--concurrency", type=int, default=4, help="reconstructions fetched at once")
+    parser.add_argument("--properties-batch", type=int, default=100,
+                        help="reconstructions written between segment properties writes")
+    parser.add_argument("--properties-delay", type=float, default=300.0,
+                        help="maximum seconds segment properties changes are held")
+    parser.add_argument("--mark-status", action="store_true",
+                        help="report pending entries as generated or failed, as the precomputed worker does; "
+                             "requires --variants")
+    parser.add_argument("--status-journal", help="local file used to persist status updates until acknowledged")
+    parser.add_argument("--page-cache", help="directory of fetched reconstruction pages, reused when retrying; reconstructions "
+                        "without a known source version, such as those given by --ids, are not cached")
+    parser.add_argument("--page-cache-size", type=int, default=4096, help="maximum size of the page cache in MiB")
 
     args = parser.parse_args()
 
-    client = RemoteDataClient(args.url, args.authkey)
+    # Entries are only generated once every dataset the precomputed worker writes has them.
+    if args.mark_status and not args.variants:
+        parser.error("--mark-status requires --variants")
+
+    status_client = RemoteDataClient(args.url, args.authkey)
+
+    if args.ids is not None:
+        items = read_backfill_items(args.ids)
+    else:
+        items = items_from_pending(status_client.find_pending())
+
+    logger.info(f"{len(items)} reconstructions to backfill")
+
+    checkpoint = BackfillCheckpoint(args.checkpoint) if args.checkpoint else None
+
+    status = PrecomputedStatusQueue(status_client, args.status_journal) if args.mark_status else None
 
-    pending = client.find_pending()
+    page_cache = ReconstructionPageCache(args.page_cache, args.page_cache_size << 20) if args.page_cache else None
 
-    print(pending)
+    try:
+        counts = backfill(args.url, args.authkey, args.output, items, checkpoint, status, args.concurrency,
+                          args.properties_batch, args.properties_delay, page_cache, args.variants)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
 
-    for pend in pending:
-        data = client.get_reconstruction_data(pend.reconstructionId)
-        data["skeleton_id"] = pend.skeletonSegmentId
-        create_from_dict(data, args.output)
+    print(f"{counts['generated']} generated, {counts['failed']} failed, {counts['skipped']} skipped")
 
 
 if __name__ == "__main__":
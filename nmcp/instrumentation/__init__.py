@@ -0,0 +1,5 @@
+from .metrics import (MetricsRegistry, Counter, Gauge, Histogram, registry, time_stage, start_metrics_server,
+                      start_metrics_file_writer)
+from .profiling import ProfilingOptions, JobProfiler, add_profiling_arguments, profiling_options_from_arguments
+from .job_records import JobRecord, JobRecordWriter, track_job
+from .tracing import configure_tracing, configure_tracing_from_environment, span
@@ -0,0 +1,120 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_current: ContextVar[Optional["JobRecord"]] = ContextVar("nmcp_job_record", default=None)
+
+
+@dataclass
+class JobRecord:
+    """Performance summary of processing one reconstruction, written as a single JSON line."""
+    reconstruction_id: str
+    skeleton_id: Optional[int] = None
+    entry_id: Optional[str] = None
+    result: str = "failed"
+    started_at: float = field(default_factory=time.time)
+    wall_seconds: float = 0.0
+    axon_nodes: int = 0
+    dendrite_nodes: int = 0
+    # Node count of each page received, by part.
+    pages: Dict[str, List[int]] = field(default_factory=lambda: {"axon": [], "dendrite": []})
+    bytes_fetched: int = 0
+    bytes_uploaded: int = 0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    # Peak resident set size of the whole process when the job finished, not of the job alone: it includes earlier and
+    # concurrent jobs.
+    process_peak_rss_bytes: int = 0
+
+    @property
+    def page_count(self) -> int:
+        return sum(len(p) for p in self.pages.values())
+
+    def as_dict(self) -> dict:
+        record = asdict(self)
+        record["page_count"] = self.page_count
+        return record
+
+
+class JobRecordWriter:
+    """Appends job records to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record: JobRecord):
+        line = json.dumps(record.as_dict()) + "\n"
+
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+@contextmanager
+def track_job(record: JobRecord, writer: Optional[JobRecordWriter] = None):
+    """
+    Make `record` the current record for the enclosed block so that stage timings and byte counts are attributed to it.
+    The record is completed and written to `writer` (if any) on exit.
+    """
+    token = _current.set(record)
+    start = time.perf_counter()
+
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+
+        record.wall_seconds = time.perf_counter() - start
+        record.process_peak_rss_bytes = peak_rss_bytes()
+
+        if writer is not None:
+            writer.write(record)
+
+
+def current_job() -> Optional[JobRecord]:
+    return _current.get()
+
+
+def add_stage_seconds(stage: str, seconds: float):
+    record = _current.get()
+    if record is not None:
+        record.stage_seconds[stage] = record.stage_seconds.get(stage, 0.0) + seconds
+
+
+def add_page(part: str, node_count: int):
+    record = _current.get()
+    if record is not None:
+        record.pages.setdefault(part, []).append(node_count)
+
+
+def add_bytes_fetched(count: int):
+    record = _current.get()
+    if record is not None:
+        record.bytes_fetched += count
+
+
+def add_bytes_uploaded(count: int):
+    record = _current.get()
+    if record is not None:
+        record.bytes_uploaded += count
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the process so far, or 0 where it is not available (e.g., Windows)."""
+    if resource is None:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,253 @@
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
+
+from . import job_records
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+_default_buckets = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[_LabelKey, float] = dict()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(v)}" for key, v in self._values.items()]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = _default_buckets):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: cumulative bucket counts, sum, and count.
+        self._values: Dict[_LabelKey, Tuple[List[int], float, int]] = dict()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            values = self._values.get(_label_key(labels))
+            return values[2] if values is not None else 0
+
+    def _render_samples(self) -> List[str]:
+        lines = list()
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le=_format_value(bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, le='+Inf')} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = dict()
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = _default_buckets) -> Histogram:
+        return self._register(Histogram, name, description, buckets)
+
+    def render(self) -> str:
+        """Text exposition format understood by Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = list()
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+    def _register(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} is already registered as a {metric.type_name}")
+            return metric
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram("nmcp_stage_seconds", "time spent in each processing stage")
+nodes_total = registry.counter("nmcp_nodes_total", "reconstruction nodes processed")
+bytes_fetched_total = registry.counter("nmcp_bytes_fetched_total", "bytes received from the data service")
+bytes_uploaded_total = registry.counter("nmcp_bytes_uploaded_total", "encoded skeleton bytes uploaded")
+skeletons_unchanged_total = registry.counter("nmcp_skeletons_unchanged_total",
+                                             "skeletons not uploaded because they are already published as is")
+skeletons_spilled_total = registry.counter("nmcp_skeletons_spilled_total",
+                                           "reconstruction parts spilled to disk for exceeding the job memory budget")
+page_cache_total = registry.counter("nmcp_page_cache_total", "reconstruction page cache lookups by result")
+jobs_total = registry.counter("nmcp_jobs_total", "precomputed entries processed by result")
+job_seconds = registry.histogram("nmcp_job_seconds", "time to process a precomputed entry")
+pending_entries = registry.gauge("nmcp_pending_entries", "precomputed entries waiting to be processed")
+# The pending query has no time an entry was queued, so ages are from when this worker first saw each entry.
+oldest_pending_seen_seconds = registry.gauge("nmcp_oldest_pending_seen_seconds",
+                                             "time since this worker first saw the oldest waiting entry")
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Record the duration of the enclosed block in the `nmcp_stage_seconds` histogram and in the current job record, if
+    there is one.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        job_records.add_stage_seconds(stage, elapsed)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0",
+                         metrics: MetricsRegistry = registry) -> "ThreadingHTTPServer":
+    """Serve the registry at `/metrics` from a background thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+
+            body = metrics.render().encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    logger.info(f"serving metrics at http://{host}:{server.server_address[1]}/metrics")
+
+    return server
+
+
+def start_metrics_file_writer(path: str, interval: float = 15.0,
+                              metrics: MetricsRegistry = registry) -> threading.Event:
+    """
+    Periodically write the registry to `path` (e.g., for the node exporter textfile collector).  Set the returned event
+    to stop writing.
+    """
+    stopped = threading.Event()
+
+    def write():
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(metrics.render())
+        os.replace(temp_path, path)
+
+    def run():
+        while not stopped.wait(interval):
+            try:
+                write()
+            except Exception as ex:
+                logger.warning(f"could not write metrics to {path}: {ex}")
+
+    write()
+
+    threading.Thread(target=run, daemon=True).start()
+
+    return stopped
+
+
+def _label_key(labels: dict) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: _LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+
+    if len(pairs) == 0:
+        return ""
+
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
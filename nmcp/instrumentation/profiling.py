@@ -0,0 +1,162 @@
+import argparse
+import cProfile
+import logging
+import os
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProfilingOptions:
+    """
+    Opt-in per-reconstruction profiling.  Nothing is profiled unless `output_dir` is set.  Every `every`-th job is
+    profiled, and reports are only kept for reconstructions with at least `min_nodes` nodes.
+    """
+    output_dir: Optional[str] = None
+    cpu: bool = True
+    memory: bool = False
+    every: int = 1
+    min_nodes: int = 0
+    top: int = 25
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None and (self.cpu or self.memory)
+
+    @classmethod
+    def from_environment(cls) -> "ProfilingOptions":
+        """
+        `NMCP_PROFILE_DIR`, `NMCP_PROFILE_MODE` (comma separated `cpu` and/or `memory`), `NMCP_PROFILE_EVERY`, and
+        `NMCP_PROFILE_MIN_NODES`.
+        """
+        modes = os.environ.get("NMCP_PROFILE_MODE", "cpu").split(",")
+
+        return cls(output_dir=os.environ.get("NMCP_PROFILE_DIR"),
+                   cpu="cpu" in modes,
+                   memory="memory" in modes,
+                   every=int(os.environ.get("NMCP_PROFILE_EVERY", 1)),
+                   min_nodes=int(os.environ.get("NMCP_PROFILE_MIN_NODES", 0)))
+
+
+def add_profiling_arguments(parser: argparse.ArgumentParser):
+    """Command line switches for `ProfilingOptions`, defaulting to the `NMCP_PROFILE_*` environment variables."""
+    defaults = ProfilingOptions.from_environment()
+
+    modes = [m for m, enabled in (("cpu", defaults.cpu), ("memory", defaults.memory)) if enabled]
+
+    parser.add_argument("--profile-dir", help="write per-reconstruction profiles to this directory",
+                        default=defaults.output_dir)
+    parser.add_argument("--profile-mode", default=",".join(modes),
+                        help="comma separated profilers to use: cpu, memory; when profiling, reconstructions are "
+                             "processed one at a time in a single lane, since profilers observe the whole process")
+    parser.add_argument("--profile-every", help="profile every Nth reconstruction", type=int, default=defaults.every)
+    parser.add_argument("--profile-min-nodes", type=int, default=defaults.min_nodes,
+                        help="only keep profiles of reconstructions with at least this many nodes")
+
+
+def profiling_options_from_arguments(args: argparse.Namespace) -> ProfilingOptions:
+    modes = args.profile_mode.split(",")
+
+    return ProfilingOptions(output_dir=args.profile_dir, cpu="cpu" in modes, memory="memory" in modes,
+                            every=args.profile_every, min_nodes=args.profile_min_nodes)
+
+
+class ProfiledJob:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.node_count: Optional[int] = None
+
+
+class JobProfiler:
+    """
+    Samples jobs for `ProfilingOptions`.  Allocations are traced, and on Python 3.12+ CPU profiles collected, for the
+    whole process, so reports are only those of a single job when jobs run one at a time.
+    """
+
+    def __init__(self, options: ProfilingOptions):
+        self.options = options
+        self._job_count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, job_id: str):
+        """
+        Profile the enclosed block if this job is sampled.  Set `node_count` on the yielded job so that reports can be
+        named by and filtered on reconstruction size.
+        """
+        job = ProfiledJob(job_id)
+
+        with self._lock:
+            sampled = self.options.enabled and self._job_count % max(self.options.every, 1) == 0
+            self._job_count += 1
+
+        if not sampled:
+            yield job
+            return
+
+        profiler = cProfile.Profile() if self.options.cpu else None
+        # Another owner (e.g., PYTHONTRACEMALLOC) may already be tracing allocations; leave it running in that case.
+        started_tracing = self.options.memory and not tracemalloc.is_tracing()
+
+        if started_tracing:
+            tracemalloc.start(10)
+        elif self.options.memory:
+            tracemalloc.reset_peak()
+
+        try:
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError as ex:
+                    # Python 3.12+ allows one active profiler per process (e.g., a job profiled beside this one).
+                    logger.warning(f"not CPU profiling {job_id}: {ex}")
+                    profiler = None
+
+            yield job
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+            # Concurrent jobs share the tracer; one that started it may already have stopped it.
+            tracing_memory = self.options.memory and tracemalloc.is_tracing()
+
+            snapshot = tracemalloc.take_snapshot() if tracing_memory else None
+            peak = tracemalloc.get_traced_memory()[1] if tracing_memory else None
+
+            if started_tracing:
+                tracemalloc.stop()
+
+            if job.node_count is None or job.node_count >= self.options.min_nodes:
+                try:
+                    self._write_reports(job, profiler, snapshot, peak)
+                except Exception as ex:
+                    logger.warning(f"could not write profile for {job_id}: {ex}")
+
+    def _write_reports(self, job: ProfiledJob, profiler: Optional[cProfile.Profile],
+                       snapshot: Optional[tracemalloc.Snapshot], peak: Optional[int]):
+        os.makedirs(self.options.output_dir, exist_ok=True)
+
+        name = re.sub(r"[^\w.-]", "_", job.job_id)
+        if job.node_count is not None:
+            name = f"{name}-{job.node_count}-nodes"
+
+        base = os.path.join(self.options.output_dir, name)
+
+        if profiler is not None:
+            profiler.dump_stats(f"{base}.prof")
+
+        if snapshot is not None:
+            with open(f"{base}-allocations.txt", "w") as f:
+                f.write(f"reconstruction: {job.job_id}\n")
+                f.write(f"nodes: {job.node_count}\n")
+                f.write(f"peak traced memory: {peak} bytes\n\n")
+                for stat in snapshot.statistics("lineno")[:self.options.top]:
+                    f.write(f"{stat}\n")
+
+        logger.info(f"wrote profile for {job.job_id} to {base}")
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed operation.  Identifiers and timestamps follow the OpenTelemetry data model."""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.status = "OK"
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": (self.end_time_unix_nano - self.start_time_unix_nano) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value):
+        pass
+
+
+class ConsoleSpanExporter:
+    def export(self, span: Span):
+        logger.info(f"span {span.name} {span.as_dict()['duration_ms']:.1f} ms {span.attributes}")
+
+    def shutdown(self):
+        pass
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def export(self, span: Span):
+        line = json.dumps(span.as_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class _LocalTracer:
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self._current: ContextVar[Optional[Span]] = ContextVar("nmcp_span", default=None)
+
+    @contextmanager
+    def span(self, name: str, attributes: dict):
+        parent = self._current.get()
+
+        span = Span(name, parent.trace_id if parent is not None else secrets.token_hex(16),
+                    parent.span_id if parent is not None else None, attributes)
+
+        token = self._current.set(span)
+
+        try:
+            yield span
+        except BaseException as ex:
+            span.status = "ERROR"
+            span.set_attribute("exception", repr(ex))
+            raise
+        finally:
+            self._current.reset(token)
+            span.end_time_unix_nano = time.time_ns()
+            try:
+                self.exporter.export(span)
+            except Exception as ex:
+                logger.debug(f"could not export span {name}: {ex}")
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class _OpenTelemetryTracer:
+    """Forwards spans to the OpenTelemetry API, using whatever SDK and exporters the process has configured."""
+
+    def __init__(self):
+        from opentelemetry import trace
+
+        self._tracer = trace.get_tracer("nmcp")
+
+    @contextmanager
+    def span(self, name: str, attributes: dict):
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+    def shutdown(self):
+        pass
+
+
+_tracer = None
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def configure_tracing(target: Optional[str]):
+    """
+    Enable tracing.  `target` is `console` (log finished spans), `file:<path>` (JSON lines), `otel` (the
+    OpenTelemetry API), or None to disable tracing.
+    """
+    global _tracer
+
+    if _tracer is not None:
+        _tracer.shutdown()
+        _tracer = None
+
+    if not target:
+        return
+
+    if target == "console":
+        _tracer = _LocalTracer(ConsoleSpanExporter())
+    elif target.startswith("file:"):
+        _tracer = _LocalTracer(FileSpanExporter(target[len("file:"):]))
+    elif target == "otel":
+        _tracer = _OpenTelemetryTracer()
+    else:
+        raise ValueError(f"unknown tracing target {target}")
+
+
+def configure_tracing_from_environment():
+    """Uses `NMCP_TRACE`, which takes the same values as `configure_tracing`."""
+    configure_tracing(os.environ.get("NMCP_TRACE"))
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a span around the enclosed block.  Does nothing unless tracing has been configured."""
+    tracer = _tracer
+
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    with tracer.span(name, attributes) as current:
+        yield current
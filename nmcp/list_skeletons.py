@@ -1,7 +1,7 @@
 import argparse
 import logging
 
-from nmcp import list_skeletons
+from nmcp import list_skeletons, has_skeleton
 
 logging.basicConfig(level=logging.WARNING)
 
@@ -10,10 +10,20 @@ def main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("-o", "--output", help="the output cloud volume location")
+    parser.add_argument("--start", type=int, help="smallest skeleton id to list")
+    parser.add_argument("--stop", type=int, help="list skeleton ids below this one")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many skeleton ids in the range")
+    parser.add_argument("--limit", type=int, help="list at most this many skeleton ids")
+    parser.add_argument("--contains", type=int, help="only report whether this skeleton id is present")
 
     args = parser.parse_args()
 
-    ids = list_skeletons(args.output)
+    if args.contains is not None:
+        found = has_skeleton(args.output, args.contains)
+        print(f"skeleton {args.contains} {'is' if found else 'is not'} in {args.output}")
+        return
+
+    ids = list_skeletons(args.output, args.start, args.stop, args.offset, args.limit)
 
     print(f"{len(ids)} skeletons in {args.output}")
 
@@ -1,5 +1,47 @@
-from .segment_property import SegmentProperty
-from .segment_tag_property import SegmentTagProperty, SomaSegmentTagProperty
-from .segment_info import SegmentInfo, NmcpPropertyValues
-from .nmcp_precomputed import (create_from_json_files, create_from_dict, create_from_data, remove_skeleton,
-                               list_skeletons, extract_neuron_properties, SkeletonComponents)
+from typing import TYPE_CHECKING
+
+from nmcp._lazy import lazy_exports
+
+# Imported on first use; see `nmcp/__init__.py`.
+_exports = {
+    "SegmentProperty": ".segment_property",
+    "SegmentTagProperty": ".segment_tag_property",
+    "SomaSegmentTagProperty": ".segment_tag_property",
+    "SegmentInfo": ".segment_info",
+    "NmcpPropertyValues": ".segment_info",
+    "SegmentInfoStore": ".segment_info_store",
+    "SegmentInfoConflictError": ".segment_info_store",
+    "DeferredSegmentInfoWriter": ".segment_info_writer",
+    "create_from_json_files": ".nmcp_precomputed",
+    "create_from_dict": ".nmcp_precomputed",
+    "create_from_data": ".nmcp_precomputed",
+    "create_from_streamed_neuron": ".nmcp_precomputed",
+    "read_neurons": ".json_reader",
+    "StreamedNeuron": ".json_reader",
+    "ingest_json_files": ".bulk_ingest",
+    "upload_skeletons": ".nmcp_precomputed",
+    "remove_skeleton": ".nmcp_precomputed",
+    "remove_skeletons": ".nmcp_precomputed",
+    "list_skeletons": ".nmcp_precomputed",
+    "has_skeleton": ".nmcp_precomputed",
+    "extract_neuron_properties": ".nmcp_precomputed",
+    "skeleton_id_from_neuron": ".nmcp_precomputed",
+    "SkeletonComponents": ".nmcp_precomputed"
+}
+
+__all__ = list(_exports)
+
+if TYPE_CHECKING:
+    from .segment_property import SegmentProperty
+    from .segment_tag_property import SegmentTagProperty, SomaSegmentTagProperty
+    from .segment_info import SegmentInfo, NmcpPropertyValues
+    from .segment_info_store import SegmentInfoStore, SegmentInfoConflictError
+    from .segment_info_writer import DeferredSegmentInfoWriter
+    from .bulk_ingest import ingest_json_files
+    from .json_reader import read_neurons, StreamedNeuron
+    from .nmcp_precomputed import (create_from_json_files, create_from_dict, create_from_data, remove_skeleton,
+                                   create_from_streamed_neuron, remove_skeletons, list_skeletons, has_skeleton,
+                                   extract_neuron_properties, skeleton_id_from_neuron, SkeletonComponents,
+                                   upload_skeletons)
+
+__getattr__, __dir__ = lazy_exports(__name__, _exports)
@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from nmcp.instrumentation import metrics, tracing
+
+from .nmcp_precomputed import _create_dataset_info, _skeleton_cache_control, extract_neuron_properties, \
+    skeleton_id_from_neuron
+from .json_reader import read_neurons
+from .nmcp_skeleton import merge_components, skeleton_content_hash, encode_skeleton
+from .segment_info import SegmentInfo, NmcpPropertyValues
+from .segment_info_store import SegmentInfoStore
+
+logger = logging.getLogger(__name__)
+
+# Whether the axon and the dendrite are part of each dataset the precomputed worker writes.
+_variant_parts = {"full": (True, True), "axon": (True, False), "dendrite": (False, True)}
+
+
+class _BuiltNeuron(NamedTuple):
+    path: str
+    skeleton_id: int
+    properties: NmcpPropertyValues
+    # Encoded skeleton per variant.
+    encoded: Dict[str, bytes]
+    # Content hash per variant.
+    hashes: Dict[str, str]
+
+
+def ingest_json_files(json_files: Iterable[str], cloud_location: str, variants: bool = False,
+                      processes: Optional[int] = None, upload_concurrency: int = 8) -> Dict[str, List[int]]:
+    """
+    Bulk alternative to `create_from_json_files`.  Files are parsed and their skeletons built and encoded in a pool of
+    `processes` worker processes, the encoded skeletons are uploaded by `upload_concurrency` threads, and the segment
+    properties of each dataset are updated once at the end rather than once per neuron.
+
+    With `variants`, the full, axon, and dendrite skeletons are written to `full`, `axon`, and `dendrite` datasets
+    under `cloud_location`, as the precomputed worker does.  Files that cannot be read or built, and skeletons that
+    cannot be uploaded, are logged and skipped.  Skeletons whose content hash matches the one recorded in a dataset
+    are already published as is and are not uploaded again.  Returns the ingested skeleton ids of each dataset,
+    including those that were unchanged.
+    """
+    processes = processes or os.cpu_count() or 1
+
+    if variants:
+        locations = {variant: f"{cloud_location}/{variant}" for variant in _variant_parts}
+    else:
+        locations = {"full": cloud_location}
+
+    from cloudfiles import CloudFiles
+
+    for location in locations.values():
+        _create_dataset_info(location)
+
+    storage = {variant: CloudFiles(location) for variant, location in locations.items()}
+
+    recorded = {variant: _recorded_hashes(location) for variant, location in locations.items()}
+    unchanged: Dict[str, List[int]] = {variant: list() for variant in locations}
+
+    uploaded: Dict[str, List[Tuple[int, NmcpPropertyValues, str]]] = {variant: list() for variant in locations}
+    uploaded_lock = threading.Lock()
+
+    # Built skeletons wait here for an upload thread; bounding them bounds memory when uploads are the bottleneck.
+    upload_slots = threading.BoundedSemaphore(2 * upload_concurrency)
+
+    def upload(neuron: _BuiltNeuron, variant: str):
+        try:
+            data = neuron.encoded[variant]
+            with metrics.time_stage("upload"):
+                storage[variant].put(f"skeleton/{neuron.skeleton_id}", data, content_type="application/octet-stream",
+                                     cache_control=_skeleton_cache_control)
+            metrics.bytes_uploaded_total.inc(len(data))
+            with uploaded_lock:
+                uploaded[variant].append((neuron.skeleton_id, neuron.properties, neuron.hashes[variant]))
+        except Exception as ex:
+            logger.error(f"could not upload {variant} skeleton {neuron.skeleton_id} from {neuron.path}: {ex}")
+        finally:
+            upload_slots.release()
+
+    with tracing.span("ingest_json_files", cloud_location=cloud_location, processes=processes,
+                      upload_concurrency=upload_concurrency) as span:
+        files = iter(json_files)
+        file_count = 0
+
+        with ProcessPoolExecutor(max_workers=processes) as builders, \
+                ThreadPoolExecutor(max_workers=upload_concurrency) as uploaders:
+            building: Dict[Future, str] = dict()
+
+            def build_next():
+                nonlocal file_count
+                path = next(files, None)
+                if path is not None:
+                    building[builders.submit(_build_json_file, path, tuple(locations))] = path
+                    file_count += 1
+
+            # Enough files in flight to keep every process busy without parsing far ahead of the uploads.
+            for _ in range(2 * processes):
+                build_next()
+
+            while len(building) > 0:
+                done, _ = wait(building, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    path = building.pop(future)
+                    build_next()
+
+                    try:
+                        neurons = future.result()
+                    except Exception as ex:
+                        logger.error(f"could not build skeletons from {path}: {ex}")
+                        continue
+
+                    for neuron in neurons:
+                        for variant in locations:
+                            if recorded[variant].get(neuron.skeleton_id) == neuron.hashes[variant]:
+                                metrics.skeletons_unchanged_total.inc()
+                                unchanged[variant].append(neuron.skeleton_id)
+                                continue
+                            upload_slots.acquire()
+                            uploaders.submit(upload, neuron, variant)
+
+        span.set_attribute("files", file_count)
+
+        for variant, location in locations.items():
+            _commit_properties(location, uploaded[variant])
+
+    return {locations[variant]: sorted([neuron[0] for neuron in neurons] + unchanged[variant])
+            for variant, neurons in uploaded.items()}
+
+
+def _build_json_file(path: str, variants: Sequence[str]) -> List[_BuiltNeuron]:
+    """Runs in a pool process; returns the encoded skeletons rather than their arrays to keep the result small."""
+    built = list()
+
+    for neuron in read_neurons(path):
+        skeleton_id = skeleton_id_from_neuron(neuron.header)
+
+        if skeleton_id is None:
+            logger.warning(f"skipping {neuron.header.get('idString')} in {path}, which does not have a supported "
+                           f"skeleton id")
+            continue
+
+        properties = extract_neuron_properties(neuron.header)
+
+        encoded = dict()
+        hashes = dict()
+
+        for variant in variants:
+            has_axon, has_dendrite = _variant_parts[variant]
+            skeleton = merge_components(neuron.axon if has_axon else None, neuron.dendrite if has_dendrite else None)
+            encoded[variant] = encode_skeleton(skeleton)
+            hashes[variant] = skeleton_content_hash(skeleton, properties)
+
+        built.append(_BuiltNeuron(path, skeleton_id, properties, encoded, hashes))
+
+    return built
+
+
+def _recorded_hashes(cloud_location: str) -> Dict[int, str]:
+    segment_info = SegmentInfoStore(cloud_location).load()
+
+    return dict(segment_info.hashes) if segment_info is not None else dict()
+
+
+def _commit_properties(cloud_location: str, neurons: List[Tuple[int, NmcpPropertyValues, str]]):
+    if len(neurons) == 0:
+        return
+
+    # Ordered by id so that the properties do not depend on which upload finished first.
+    neurons = sorted(neurons, key=lambda neuron: neuron[0])
+
+    def apply(segment_info: SegmentInfo):
+        for skeleton_id, properties, content_hash in neurons:
+            segment_info.append(skeleton_id, properties, content_hash)
+
+    with metrics.time_stage("properties"):
+        SegmentInfoStore(cloud_location).update(apply)
+
+    logger.info(f"added {len(neurons)} skeletons to the segment properties of {cloud_location}")
@@ -0,0 +1,195 @@
+import json
+import re
+from typing import IO, Iterator, List, NamedTuple, Optional, Union
+
+from .nmcp_skeleton import SkeletonComponents
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+# Characters that can continue a number, up to the end of the buffer.
+_number_tail = re.compile(r"[0-9.eE+\-]*\Z")
+
+# The node arrays of a neuron, which are streamed rather than decoded whole.
+_node_keys = ("axon", "dendrite")
+
+
+class StreamedNeuron(NamedTuple):
+    # Every field of the neuron other than the node arrays.
+    header: dict
+    axon: Optional[SkeletonComponents]
+    dendrite: Optional[SkeletonComponents]
+
+    @property
+    def node_count(self) -> int:
+        return sum(len(part.vertices) for part in (self.axon, self.dendrite) if part is not None)
+
+
+def read_neurons(source: Union[str, IO[str]], batch_size: int = 10000,
+                 read_size: int = 1 << 20) -> Iterator[StreamedNeuron]:
+    """
+    Incrementally read a JSON export (`{"neurons": [...]}`), yielding every neuron in the file.  The `axon` and
+    `dendrite` node arrays are decoded `batch_size` nodes at a time and built into skeleton components as they are
+    read, so the decoded nodes of a whole reconstruction never exist at once.  `source` is a path or a text file.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            yield from _JsonStream(f, read_size).neurons(batch_size)
+    else:
+        yield from _JsonStream(source, read_size).neurons(batch_size)
+
+
+class _JsonStream:
+    """
+    A pull parser over the layout of the JSON export.  Containers are walked here and every other value, including
+    each node, is decoded with the `json` scanner from a buffer that is refilled as it is consumed.
+    """
+
+    def __init__(self, file: IO[str], read_size: int):
+        self._file = file
+        self._read_size = read_size
+        # The decoder's scanner decodes one value at a position, without the whitespace handling of `raw_decode`.
+        self._scan = json.JSONDecoder().scan_once
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def neurons(self, batch_size: int) -> Iterator[StreamedNeuron]:
+        self._expect("{")
+
+        for key in self._keys():
+            if key == "neurons" and self._peek() == "[":
+                for _ in self._elements():
+                    yield self._neuron(batch_size)
+            else:
+                self._value()
+
+    def _neuron(self, batch_size: int) -> StreamedNeuron:
+        self._expect("{")
+
+        header = dict()
+        parts = dict()
+
+        for key in self._keys():
+            if key in _node_keys:
+                # A missing part may be null rather than empty.
+                if self._peek() == "[":
+                    parts[key] = SkeletonComponents.from_batches(self._batches(batch_size))
+                else:
+                    self._value()
+            else:
+                header[key] = self._value()
+
+        return StreamedNeuron(header, parts.get("axon"), parts.get("dendrite"))
+
+    def _batches(self, batch_size: int) -> Iterator[List[dict]]:
+        batch = list()
+
+        for _ in self._elements():
+            batch.append(self._value())
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = list()
+
+        if len(batch) > 0:
+            yield batch
+
+    def _keys(self) -> Iterator[str]:
+        """The keys of the object whose `{` was just consumed.  The caller consumes each value."""
+        if self._peek() == "}":
+            self._position += 1
+            return
+
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise self._error("expected an object key")
+
+            self._expect(":")
+
+            yield key
+
+            separator = self._next()
+            if separator == "}":
+                return
+            if separator != ",":
+                raise self._error("expected ',' or '}'")
+
+    def _elements(self) -> Iterator[None]:
+        """Yields once per element of the array at the current position.  The caller consumes each element."""
+        self._expect("[")
+
+        if self._peek() == "]":
+            self._position += 1
+            return
+
+        while True:
+            yield
+
+            separator = self._next()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise self._error("expected ',' or ']'")
+
+    def _value(self):
+        while True:
+            self._peek()
+
+            try:
+                value, end = self._scan(self._buffer, self._position)
+            except (StopIteration, json.JSONDecodeError):
+                # Most likely a value split across reads.
+                if self._fill():
+                    continue
+                raise self._error("expected a value") from None
+
+            # A number followed only by characters that can continue it (e.g., "12." or "1e+") may have been cut
+            # short by the end of the buffer, and continue in the next read.
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and \
+                    _number_tail.match(self._buffer, end) and self._fill():
+                continue
+
+            self._position = end
+
+            return value
+
+    def _peek(self) -> str:
+        """The next non-whitespace character without consuming it, or an empty string at the end of the input."""
+        while True:
+            if self._position < len(self._buffer):
+                character = self._buffer[self._position]
+                if character not in " \t\n\r":
+                    return character
+                self._position = _whitespace.match(self._buffer, self._position).end()
+                continue
+
+            if not self._fill():
+                return ""
+
+    def _next(self) -> str:
+        character = self._peek()
+        self._position += 1
+        return character
+
+    def _expect(self, character: str):
+        if self._next() != character:
+            raise self._error(f"expected '{character}'")
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        data = self._file.read(self._read_size)
+
+        if len(data) == 0:
+            self._eof = True
+            return False
+
+        self._buffer = self._buffer[self._position:] + data
+        self._position = 0
+
+        return True
+
+    def _error(self, message: str) -> ValueError:
+        return ValueError(f"{message} near {self._buffer[self._position - 1:self._position + 40]!r}")
@@ -1,137 +1,240 @@
-import json
 import logging
-import pickle
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
 
-from cloudvolume import CloudVolume
-from cloudfiles import CloudFiles
+import numpy as np
 
-from .nmcp_skeleton import (create_skeleton, vertex_attributes, create_skeleton_components,
-                            SkeletonComponents)
+from nmcp.instrumentation import metrics, job_records, tracing
+
+from .json_reader import read_neurons, StreamedNeuron
+from .nmcp_skeleton import (merge_components, vertex_attributes, create_skeleton_components, SkeletonComponents,
+                            encoded_skeleton_size, skeleton_content_hash, encode_skeleton)
 from .segment_info import SegmentInfo, NmcpPropertyValues
+from .segment_info_store import SegmentInfoStore
+from .segment_info_writer import DeferredSegmentInfoWriter
+
+if TYPE_CHECKING:
+    from cloudvolume import CloudVolume
 
 logger = logging.getLogger(__name__)
 
+# What CloudVolume sets on uploaded skeletons by default.
+_skeleton_cache_control = "max-age=3600, s-max-age=3600"
+
 
 def create_from_json_files(json_files: [], cloud_location: str):
     """
-    Convenience function for a list of JSON neuron files.  Primarily used for development and testing.
+    Convenience function for a list of JSON neuron files.  Primarily used for development and testing.  Every neuron in
+    each file is added, and node arrays are read incrementally rather than loading the whole file.
     """
     for json_file in json_files:
-        with open(json_file) as f:
-            data = json.load(f)
-            create_from_dict(data["neurons"][0], cloud_location)
+        for neuron in read_neurons(json_file):
+            create_from_streamed_neuron(neuron, cloud_location)
 
 
 def create_from_dict(neuron: dict, cloud_location: str):
-    skeleton_id = None
+    skeleton_id = skeleton_id_from_neuron(neuron)
 
+    if skeleton_id is not None:
+        axon, dendrite = create_skeleton_components(neuron)
+        properties = extract_neuron_properties(neuron)
+        create_from_data(axon, dendrite, properties, cloud_location, skeleton_id)
+
+
+def create_from_streamed_neuron(neuron: StreamedNeuron, cloud_location: str):
+    skeleton_id = skeleton_id_from_neuron(neuron.header)
+
+    if skeleton_id is not None:
+        properties = extract_neuron_properties(neuron.header)
+        create_from_data(neuron.axon, neuron.dendrite, properties, cloud_location, skeleton_id)
+
+
+def skeleton_id_from_neuron(neuron: dict) -> Optional[int]:
+    """The skeleton id encoded in a neuron's `idString` (e.g., 123 for N123-...), or None."""
     if "idString" in neuron:
         try:
-            skeleton_id = int(neuron["idString"][1:4])
+            return int(neuron["idString"][1:4])
         except:
             pass  # Ok to fail for some unsupported skeleton id interpretation.
 
-    if skeleton_id is not None:
-        axon, dendrite = create_skeleton_components(neuron)
-        properties = extract_neuron_properties(neuron)
-        create_from_data(axon, dendrite, properties, cloud_location, skeleton_id)
+    return None
 
 
 def create_from_data(axon: SkeletonComponents, dendrite: SkeletonComponents, properties: NmcpPropertyValues,
-                     cloud_location: str, skeleton_id: int):
+                     cloud_location: str, skeleton_id: int, segment_info_writer: DeferredSegmentInfoWriter = None,
+                     version: Optional[int] = None) -> bool:
     """
-    Add one or more neurons to the precomputed dataset.
+    Add one or more neurons to the precomputed dataset.  When a `segment_info_writer` is provided, the segment
+    properties change is handed to it rather than written immediately.
+
+    A content hash of the skeleton and its properties, and the source `version` when known, are recorded with the
+    segment properties.  A skeleton whose hash matches the recorded one is already published as is and is not uploaded;
+    the segment properties are only written if the version changed.
+
+    Returns False if the skeleton or its segment properties could not be written, in which case the error is logged.
     """
     try:
-        cv = _create_dataset_info(cloud_location)
+        # TODO: Could be left in an odd state if the skeleton is created but segment_info append fails.
+        with metrics.time_stage("build"):
+            skeleton = merge_components(axon, dendrite)
+            content_hash = skeleton_content_hash(skeleton, properties)
     except Exception as ex:
-        logger.error("could not create dataset", None, exc_info=False)
-        return
+        logger.error("could not create skeleton", None, exc_info=False)
+        return False
 
-    # remove_skeleton(cloud_location, skeleton_id)
+    unchanged = False
 
     try:
-        cf = CloudFiles(cloud_location)
+        recorded = segment_info_writer or SegmentInfoStore(cloud_location)
+        if recorded.content_hash(skeleton_id) == content_hash:
+            logger.info(f"skeleton {skeleton_id} is unchanged in {cloud_location}")
+            metrics.skeletons_unchanged_total.inc()
+            if version is None or recorded.source_version(skeleton_id) == version:
+                return True
+            unchanged = True
     except Exception as ex:
-        logger.error("could not create cloud files", None, exc_info=False)
-        return
+        # Publishing again is always safe.
+        logger.warning(f"could not read the content hash of skeleton {skeleton_id}: {ex}")
 
-    try:
-        existing = cf.get("segment_properties/info.pickle")
-    except Exception as ex:
-        logger.error("could not ask for get segment info", None, exc_info=False)
-        return
+    if not unchanged:
+        try:
+            _create_dataset_info(cloud_location)
+        except Exception as ex:
+            logger.error("could not create dataset", None, exc_info=False)
+            return False
+
+        try:
+            with metrics.time_stage("upload"), tracing.span("upload_skeletons", skeleton_id=skeleton_id,
+                                                            cloud_location=cloud_location,
+                                                            bytes=encoded_skeleton_size(skeleton)):
+                uploaded = upload_skeletons(cloud_location, [(skeleton_id, skeleton)])
+            metrics.bytes_uploaded_total.inc(uploaded)
+            job_records.add_bytes_uploaded(uploaded)
+        except Exception as ex:
+            logger.error("could not upload skeleton", None, exc_info=False)
+            return False
 
     try:
-        if existing is not None:
-            segment_info = pickle.loads(existing)
+        if segment_info_writer is not None:
+            segment_info_writer.append(skeleton_id, properties, content_hash, version)
         else:
-            segment_info = SegmentInfo()
+            with metrics.time_stage("properties"):
+                SegmentInfoStore(cloud_location).update(
+                    lambda segment_info: segment_info.append(skeleton_id, properties, content_hash, version))
     except Exception as ex:
-        logger.error("could not get segment info", None, exc_info=False)
-        return
+        logger.error(f"could create segment properties {skeleton_id}", None, exc_info=True)
+        logger.exception(ex, exc_info=True)
+        return False
 
-    try:
-        # TODO: Could be left in an odd state if the skeleton is created but segment_info append fails.
-        skeleton = create_skeleton(skeleton_id, axon, dendrite)
-    except Exception as ex:
-        logger.error("could not create skeleton", None, exc_info=False)
-        return
+    return True
 
-    try:
-        segment_info.append(skeleton_id, properties)
-    except Exception as ex:
-        logger.error("could not append segment info", None, exc_info=False)
-        return
 
-    try:
-        cv.skeleton.upload(skeleton)
-    except Exception as ex:
-        logger.error("could not upload skeleton", None, exc_info=False)
-        return
+def upload_skeletons(cloud_location: str, skeletons: Iterable[Tuple[int, SkeletonComponents]]) -> int:
+    """
+    Write skeletons to an existing dataset in one batched request, encoded directly from their arrays rather than
+    through a CloudVolume `Skeleton`.  The files are those `cv.skeleton.upload` writes for the dataset: uncompressed,
+    with the same cache control.  Returns the number of bytes written.
+    """
+    from cloudfiles import CloudFiles
 
-    try:
-        _create_segment_properties(cloud_location, segment_info)
-    except Exception as ex:
-        logger.error(f"could create segment properties {skeleton_id}", None, exc_info=True)
-        logger.exception(ex, exc_info=True)
+    files = [(f"skeleton/{skeleton_id}", encode_skeleton(skeleton)) for skeleton_id, skeleton in skeletons]
 
+    if len(files) > 0:
+        CloudFiles(cloud_location).puts(files, content_type="application/octet-stream",
+                                        cache_control=_skeleton_cache_control)
 
-def remove_skeleton(cloud_location: str, skeleton_id: int) -> bool:
-    cf = CloudFiles(cloud_location)
+    return sum(len(data) for _, data in files)
 
-    existing = cf.get("segment_properties/info.pickle")
 
-    if existing is None:
-        return False
+def remove_skeleton(cloud_location: str, skeleton_id: int) -> bool:
+    segment_info = SegmentInfoStore(cloud_location).update(lambda s: s.remove(skeleton_id), create=False)
 
-    segment_info = pickle.loads(existing)
+    if segment_info is None:
+        return False
 
-    segment_info.remove(skeleton_id)
+    from cloudfiles import CloudFiles
 
-    _create_segment_properties(cloud_location, segment_info)
+    cf = CloudFiles(cloud_location)
 
     cf.delete(f"skeleton/{skeleton_id}")
 
     return True
 
 
-def list_skeletons(cloud_location: str) -> List[int]:
-    cf = CloudFiles(cloud_location)
+def remove_skeletons(cloud_locations: Sequence[str], skeleton_ids: Iterable[int],
+                     batch_size: int = 1000) -> Dict[str, List[int]]:
+    """
+    Remove many skeletons from each dataset in `cloud_locations` (e.g., the full, axon, and dendrite datasets of an
+    output location).  Each dataset gets a single segment properties update followed by batched deletes of the skeleton
+    files, and the datasets are processed in parallel.
+
+    Files are deleted for every requested id, whether or not it was still listed, so that repeating an interrupted
+    removal also removes the files it did not get to.  Returns the ids that were listed in each dataset.
+    """
+    skeleton_ids = list(dict.fromkeys(skeleton_ids))
+
+    if len(cloud_locations) == 0 or len(skeleton_ids) == 0:
+        return {location: [] for location in cloud_locations}
 
-    existing = cf.get("segment_properties/info.pickle")
+    with ThreadPoolExecutor(max_workers=len(cloud_locations)) as executor:
+        removed = executor.map(lambda location: _remove_skeletons(location, skeleton_ids, batch_size), cloud_locations)
 
-    if existing is None:
-        return []
+        return dict(zip(cloud_locations, removed))
 
-    segment_info = pickle.loads(existing)
 
-    return segment_info.ids
+def _remove_skeletons(cloud_location: str, skeleton_ids: List[int], batch_size: int) -> List[int]:
+    removed = list()
+
+    def remove(segment_info: SegmentInfo):
+        # Replaced rather than extended because the update is applied again after a conflict.
+        removed[:] = segment_info.remove_many(skeleton_ids)
+
+    with tracing.span("remove_skeletons", cloud_location=cloud_location, skeletons=len(skeleton_ids)):
+        SegmentInfoStore(cloud_location).update(remove, create=False)
+
+        from cloudfiles import CloudFiles
+
+        cf = CloudFiles(cloud_location)
 
+        for start in range(0, len(skeleton_ids), batch_size):
+            batch = skeleton_ids[start:start + batch_size]
+            cf.delete([f"skeleton/{skeleton_id}" for skeleton_id in batch])
+            logger.debug(f"deleted {start + len(batch)} of {len(skeleton_ids)} skeleton files from {cloud_location}")
 
-def _create_dataset_info(cloud_location: str) -> CloudVolume:
+    return list(removed)
+
+
+def list_skeletons(cloud_location: str, start: Optional[int] = None, stop: Optional[int] = None, offset: int = 0,
+                   limit: Optional[int] = None) -> List[int]:
+    """
+    Skeleton ids in ascending order.  `start` and `stop` restrict the result to ids in `[start, stop)`, and `offset`
+    and `limit` page through the ids in that range.
+    """
+    ids = SegmentInfoStore(cloud_location).load_ids()
+
+    first = int(np.searchsorted(ids, start, side="left")) if start is not None else 0
+    last = int(np.searchsorted(ids, stop, side="left")) if stop is not None else len(ids)
+
+    first = min(first + offset, last)
+
+    if limit is not None:
+        last = min(last, first + limit)
+
+    return ids[first:last].tolist()
+
+
+def has_skeleton(cloud_location: str, skeleton_id: int) -> bool:
+    ids = SegmentInfoStore(cloud_location).load_ids()
+
+    index = int(np.searchsorted(ids, skeleton_id, side="left"))
+
+    return index < len(ids) and int(ids[index]) == skeleton_id
+
+
+def _create_dataset_info(cloud_location: str) -> "CloudVolume":
     """ Once per dataset """
+    from cloudvolume import CloudVolume
+
     info = CloudVolume.create_new_info(
         num_channels=1,
         layer_type="segmentation",
@@ -180,15 +283,3 @@ def extract_neuron_properties(data: dict) -> NmcpPropertyValues:
         strain = "unknown"
 
     return NmcpPropertyValues(label, strain, soma_allen_id)
-
-
-def _create_segment_properties(cloud_location: str, segment_property_info: SegmentInfo):
-    """ One per dataset"""
-    cf = CloudFiles(cloud_location)
-
-    # The required precomputed segment properties info file.
-    cf.put_json("segment_properties/info", segment_property_info.as_dict())
-
-    # Stash the internal representation of the segment properties info for additional context that would need to be
-    # rebuilt if deserializing `info`.
-    cf.put("segment_properties/info.pickle", pickle.dumps(segment_property_info))
@@ -1,11 +1,18 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
 from dataclasses import dataclass, field
 from enum import IntEnum
-from typing import Optional, Self, List
+from typing import Iterable, Optional, Self, List, Tuple, Union, TYPE_CHECKING
 
 import numpy as np
-import pandas as pd
 
-from cloudvolume import Skeleton
+from nmcp.instrumentation import tracing
+
+if TYPE_CHECKING:
+    from cloudvolume import Skeleton
 
 vertex_attributes = [
     {
@@ -30,6 +37,18 @@ _NP_EMPTY = np.empty(0, dtype=np.float32)
 _NP_EMPTY_VERTEX = np.empty((0, 3), dtype=np.float32)
 _NP_EMPTY_EDGE = np.empty((0, 2), dtype=np.float32)
 
+# The array fields of `SkeletonComponents`, in order.
+_arrays = ("vertices", "edges", "radii", "ccf_ids", "compartments")
+
+# The `SkeletonComponents` array holding each vertex attribute.
+_attribute_arrays = {"radius": "radii", "allenId": "ccf_ids", "compartment": "compartments"}
+
+# Vertex and edge counts at the start of an encoded skeleton.
+_skeleton_header = struct.Struct("<II")
+
+# Rows of a spilled array converted at once when hashing, and values when encoding.
+_hash_block = 1 << 20
+
 
 @dataclass
 class SkeletonComponents:
@@ -38,12 +57,40 @@ class SkeletonComponents:
     radii: np.ndarray = field(default_factory=lambda: _NP_EMPTY)
     ccf_ids: np.ndarray = field(default_factory=lambda: _NP_EMPTY)
     compartments: np.ndarray = field(default_factory=lambda: _NP_EMPTY)
+    # Directory of the files backing the arrays once they have been spilled to disk.  See `spill`.
+    spill_directory: Optional[str] = field(default=None, compare=False, repr=False)
+
+    @property
+    def in_memory_bytes(self) -> int:
+        """Size of the arrays held in memory rather than mapped from spilled files."""
+        return sum(getattr(self, name).nbytes for name in _arrays if not isinstance(getattr(self, name), np.memmap))
+
+    def spill(self, directory: str) -> Self:
+        """
+        Move the arrays to files in a new directory under `directory` and memory-map them in their place.  Later
+        appends, and concatenation with other components, are then written to disk rather than held in memory.  The
+        files are not removed; `directory` is expected to be removed once the skeleton has been written.
+        """
+        if self.spill_directory is not None:
+            return self
+
+        with tracing.span("SkeletonComponents.spill", nodes=len(self.vertices)):
+            self.spill_directory = tempfile.mkdtemp(prefix="skeleton-", dir=directory)
+
+            for name in _arrays:
+                array = np.ascontiguousarray(getattr(self, name))
+                path = os.path.join(self.spill_directory, f"{name}.bin")
+                array.tofile(path)
+                setattr(self, name, _map_array(path, array.dtype, array.shape))
+
+        return self
 
     @classmethod
     def create(cls, nodes: List[dict]):
-        skeleton = cls()
-        skeleton.append(nodes)
-        return skeleton
+        with tracing.span("SkeletonComponents.create", nodes=len(nodes) if nodes is not None else 0):
+            skeleton = cls()
+            skeleton.append(nodes)
+            return skeleton
 
     def append(self, nodes: List[dict]):
         """
@@ -54,23 +101,16 @@ class SkeletonComponents:
         if nodes is None or len(nodes) == 0:
             return
 
-        df = pd.DataFrame(nodes)
-
-        vertices = df[["x", "y", "z"]].values
-
-        edges = df[["sampleNumber", "parentNumber"]].values[1:] - 1
+        with tracing.span("SkeletonComponents.append", nodes=len(nodes), offset=len(self.vertices)):
+            self._append(nodes)
 
-        radii = df["radius"].values.astype(np.float32)
-
-        if df.allenId.isna().all():
-            df["allenId"] = 0
-        else:
-            # fill all the na values with 0
-            df["allenId"] = df["allenId"].fillna(0)
-
-        ccf_ids = df["allenId"].values.astype(np.float32)
+    def _append(self, nodes: List[dict]):
+        if self.spill_directory is not None:
+            for name, array in zip(_arrays, _node_arrays(nodes, len(self.vertices) == 0)):
+                self._extend_spilled(name, array)
+            return
 
-        compartments = df["structureIdentifier"].values.astype(np.float32)
+        vertices, edges, radii, ccf_ids, compartments = _node_arrays(nodes, len(self.vertices) == 0)
 
         self.vertices = np.concatenate([self.vertices, vertices])
         self.edges = np.concatenate([self.edges, edges])
@@ -78,11 +118,54 @@ class SkeletonComponents:
         self.ccf_ids = np.concatenate([self.ccf_ids, ccf_ids])
         self.compartments = np.concatenate([self.compartments, compartments])
 
+    def _extend_spilled(self, name: str, array: np.ndarray):
+        current = getattr(self, name)
+
+        # Appending to an empty array takes the dtype concatenation would give.
+        dtype = current.dtype if len(current) > 0 else np.result_type(current, array)
+
+        path = os.path.join(self.spill_directory, f"{name}.bin")
+
+        with open(path, "ab") as f:
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+        setattr(self, name, _map_array(path, dtype, (len(current) + len(array),) + current.shape[1:]))
+
+    @classmethod
+    def from_batches(cls, batches: Iterable[List[dict]]) -> Optional[Self]:
+        """
+        Build from consecutive batches of nodes, concatenating once at the end rather than after every batch.  Returns
+        None if there are no nodes, as `create_skeleton_components` does for an empty part.
+        """
+        parts = list()
+        node_count = 0
+
+        for nodes in batches:
+            if len(nodes) > 0:
+                with tracing.span("SkeletonComponents.append", nodes=len(nodes), offset=node_count):
+                    parts.append(_node_arrays(nodes, node_count == 0))
+                node_count += len(nodes)
+
+        if len(parts) == 0:
+            return None
+
+        # Starting from the empty defaults gives the same dtypes as `append`.
+        defaults = (_NP_EMPTY_VERTEX, _NP_EMPTY_EDGE, _NP_EMPTY, _NP_EMPTY, _NP_EMPTY)
+
+        return cls(*(np.concatenate([empty, *arrays]) for empty, arrays in zip(defaults, zip(*parts))))
+
     def concat(self, other: Self) -> Self:
         # Assumed to be an axon with dendrite in that order.
         if not isinstance(other, SkeletonComponents):
             raise TypeError("can only concatenate SkeletonComponents")
 
+        with tracing.span("SkeletonComponents.concat", nodes=len(self.vertices), other_nodes=len(other.vertices)):
+            return self._concat(other)
+
+    def _concat(self, other: Self) -> Self:
+        if self.spill_directory is not None or other.spill_directory is not None:
+            return self._concat_spilled(other)
+
         # Get the current number of vertices to adjust edge indices
         existing_vertex_count = len(self.vertices)
 
@@ -102,6 +185,76 @@ class SkeletonComponents:
             compartments=np.concatenate([self.compartments, other.compartments[1:]])
         )
 
+    def _concat_spilled(self, other: Self) -> Self:
+        # The same as `_concat`, but written to files next to those of the spilled part.
+        spilled = self.spill_directory or other.spill_directory
+
+        result = SkeletonComponents(spill_directory=tempfile.mkdtemp(prefix="skeleton-",
+                                                                     dir=os.path.dirname(spilled)))
+
+        for name in _arrays:
+            parts = [getattr(self, name), getattr(other, name) if name == "edges" else getattr(other, name)[1:]]
+
+            path = os.path.join(result.spill_directory, f"{name}.bin")
+            shape = (sum(len(part) for part in parts),) + parts[0].shape[1:]
+            array = _map_array(path, np.result_type(*parts), shape, "w+")
+
+            offset = 0
+            for part in parts:
+                array[offset:offset + len(part)] = part
+                offset += len(part)
+
+            setattr(result, name, array)
+
+        existing_vertex_count = len(self.vertices)
+
+        adjusted_edges = result.edges[len(self.edges):]
+        adjusted_edges += existing_vertex_count - 1
+
+        if existing_vertex_count > 0 and len(other.edges) > 0:
+            adjusted_edges[adjusted_edges[:, 1] == existing_vertex_count - 1, 1] = 0
+
+        return result
+
+
+def _map_array(path: str, dtype, shape: tuple, mode: str = "r+") -> np.ndarray:
+    if shape[0] == 0:
+        # An empty file cannot be mapped.
+        if mode == "w+":
+            open(path, "wb").close()
+        return np.empty(shape, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+def _node_arrays(nodes: List[dict], first: bool) -> tuple:
+    """Vertices, edges, radii, CCF ids, and compartments of consecutive nodes."""
+    import pandas as pd
+
+    df = pd.DataFrame(nodes)
+
+    vertices = df[["x", "y", "z"]].values
+
+    edges = df[["sampleNumber", "parentNumber"]].values - 1
+
+    # The first node of a part is the root, which has no parent.  Later batches continue the part.
+    if first:
+        edges = edges[1:]
+
+    radii = df["radius"].values.astype(np.float32)
+
+    if df.allenId.isna().all():
+        df["allenId"] = 0
+    else:
+        # fill all the na values with 0
+        df["allenId"] = df["allenId"].fillna(0)
+
+    ccf_ids = df["allenId"].values.astype(np.float32)
+
+    compartments = df["structureIdentifier"].values.astype(np.float32)
+
+    return vertices, edges, radii, ccf_ids, compartments
+
 
 def create_skeleton_components(data: dict) -> tuple[SkeletonComponents | None, SkeletonComponents | None]:
     axon = None
@@ -116,15 +269,29 @@ def create_skeleton_components(data: dict) -> tuple[SkeletonComponents | None, S
     return axon, dendrite
 
 
-def create_skeleton(skeleton_id: int, axon: SkeletonComponents, dendrite: SkeletonComponents) -> Skeleton:
+def create_skeleton(skeleton_id: int, axon: SkeletonComponents, dendrite: SkeletonComponents) -> "Skeleton":
+    with tracing.span("create_skeleton", skeleton_id=skeleton_id) as span:
+        skeleton = _create_skeleton(skeleton_id, axon, dendrite)
+        span.set_attribute("nodes", len(skeleton.vertices))
+        return skeleton
+
+
+def merge_components(axon: Optional[SkeletonComponents], dendrite: Optional[SkeletonComponents]) -> SkeletonComponents:
+    """The components of the skeleton written for a reconstruction part or parts.  At least one must be present."""
     if axon is None:
         assert dendrite is not None
-        output = dendrite
+        return dendrite
     elif dendrite is None:
         assert axon is not None
-        output = axon
+        return axon
     else:
-        output = axon.concat(dendrite)
+        return axon.concat(dendrite)
+
+
+def _create_skeleton(skeleton_id: int, axon: SkeletonComponents, dendrite: SkeletonComponents) -> "Skeleton":
+    output = merge_components(axon, dendrite)
+
+    from cloudvolume import Skeleton
 
     sk = Skeleton(segid=skeleton_id)
 
@@ -138,3 +305,84 @@ def create_skeleton(skeleton_id: int, axon: SkeletonComponents, dendrite: Skelet
     sk.compartment = output.compartments
 
     return sk
+
+
+def _skeleton_buffers(skeleton: Union["Skeleton", SkeletonComponents]) -> List[Tuple[np.ndarray, str]]:
+    """The arrays of a skeleton in encoded order, with the dtype each is encoded as."""
+    if isinstance(skeleton, SkeletonComponents):
+        attributes = [getattr(skeleton, _attribute_arrays[a["id"]]) for a in vertex_attributes]
+    else:
+        attributes = [getattr(skeleton, a["id"]) for a in vertex_attributes]
+
+    buffers = [(skeleton.vertices, "<f4"), (skeleton.edges, "<u4")]
+    buffers += [(array, "<" + np.dtype(a["data_type"]).str[1:]) for array, a in zip(attributes, vertex_attributes)]
+
+    return buffers
+
+
+def encode_skeleton(skeleton: Union["Skeleton", SkeletonComponents]) -> bytearray:
+    """
+    The Neuroglancer precomputed encoding of a skeleton, byte for byte what `Skeleton.to_precomputed` produces: vertex
+    and edge counts, float32 positions, uint32 edges, then each vertex attribute in `vertex_attributes` order.  Each
+    buffer is cast into place in a single preallocated buffer a block at a time, so that encoding takes little more
+    memory than the encoding itself, even for float64 or spilled arrays.
+    """
+    vertex_count = len(skeleton.vertices)
+
+    buffers = _skeleton_buffers(skeleton)
+
+    for index, (array, _) in enumerate(buffers[2:]):
+        if len(array) != vertex_count:
+            raise ValueError(f"{vertex_attributes[index]['id']} has {len(array)} values for {vertex_count} vertices")
+
+    encoded = bytearray(_skeleton_header.size + sum(array.size * np.dtype(dtype).itemsize for array, dtype in buffers))
+
+    _skeleton_header.pack_into(encoded, 0, vertex_count, len(skeleton.edges))
+
+    offset = _skeleton_header.size
+
+    for array, dtype in buffers:
+        if array.size == 0:
+            continue
+
+        # Flattened first, as the buffers are written in row-major order.
+        values = array.reshape(-1)
+        target = np.frombuffer(encoded, dtype=dtype, count=values.size, offset=offset)
+
+        for start in range(0, values.size, _hash_block):
+            target[start:start + _hash_block] = values[start:start + _hash_block]
+
+        offset += target.nbytes
+
+    return encoded
+
+
+def skeleton_content_hash(skeleton: Union["Skeleton", SkeletonComponents], *values) -> str:
+    """
+    Hash of what is written for a skeleton: its vertex, edge, and vertex attribute buffers as they are encoded, and any
+    other JSON-serializable `values` stored with it, such as its segment properties.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    digest.update(json.dumps([vertex_attributes, values]).encode("utf-8"))
+
+    for array, dtype in _skeleton_buffers(skeleton):
+        # The shape separates buffers that would otherwise concatenate to the same bytes.
+        digest.update(json.dumps(array.shape).encode("utf-8"))
+        # Converted in blocks, so that a spilled skeleton is not copied into memory whole.
+        for start in range(0, max(len(array), 1), _hash_block):
+            digest.update(np.ascontiguousarray(array[start:start + _hash_block], dtype=dtype).data)
+
+    return digest.hexdigest()
+
+
+def encoded_skeleton_size(skeleton: Union["Skeleton", SkeletonComponents]) -> int:
+    """
+    Size in bytes of the Neuroglancer precomputed encoding of a skeleton: vertex and edge counts, float32 positions,
+    uint32 edges, and a float32 value per component of each vertex attribute.
+    """
+    vertex_count = len(skeleton.vertices)
+
+    attribute_components = sum(a["num_components"] for a in vertex_attributes)
+
+    return 8 + vertex_count * 12 + len(skeleton.edges) * 8 + vertex_count * attribute_components * 4
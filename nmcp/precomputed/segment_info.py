@@ -1,4 +1,4 @@
-from typing import NamedTuple
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
 from .segment_tag_property import SomaSegmentTagProperty
 from .segment_property import SegmentProperty
@@ -22,8 +22,28 @@ class SegmentInfo:
         self.labels = SegmentProperty("label", "label", "filename")
         self.strains = SegmentProperty("strain", "string", "mouse line used")
         self.tags = SomaSegmentTagProperty("tags")
+        # Content hash of what was last written for each segment and the source version it was generated from, when
+        # known.  Neither is part of the `info` file.
+        self.hashes: Dict[int, str] = dict()
+        self.versions: Dict[int, int] = dict()
+
+    def __setstate__(self, state: dict):
+        # State stored before content hashes or source versions were recorded.
+        state.setdefault("hashes", dict())
+        state.setdefault("versions", dict())
+        self.__dict__.update(state)
+
+    def content_hash(self, segment_id: int) -> Optional[str]:
+        return self.hashes.get(segment_id)
+
+    def source_version(self, segment_id: int) -> Optional[int]:
+        return self.versions.get(segment_id)
+
+    def append(self, segment_id: int, values: NmcpPropertyValues, content_hash: Optional[str] = None,
+               version: Optional[int] = None):
+        _set_or_clear(self.hashes, segment_id, content_hash)
+        _set_or_clear(self.versions, segment_id, version)
 
-    def append(self, segment_id: int, values: NmcpPropertyValues):
         if segment_id not in self.ids:
             self.ids.append(segment_id)
             self.labels.append(values.label)
@@ -40,10 +60,37 @@ class SegmentInfo:
         if segment_id in self.ids:
             index = self.ids.index(segment_id)
             del self.ids[index]
+            self.hashes.pop(segment_id, None)
+            self.versions.pop(segment_id, None)
             self.labels.remove(index)
             self.strains.remove(index)
             self.tags.remove_soma(index)
 
+    def remove_many(self, segment_ids: Iterable[int]) -> List[int]:
+        """
+        Remove several segments in a single pass rather than one list search and deletion per segment.  Returns the
+        ids that were present.
+        """
+        removing = set(segment_ids)
+
+        keep = [index for index, segment_id in enumerate(self.ids) if segment_id not in removing]
+
+        if len(keep) == len(self.ids):
+            return []
+
+        removed = [segment_id for segment_id in self.ids if segment_id in removing]
+
+        for segment_id in removed:
+            self.hashes.pop(segment_id, None)
+            self.versions.pop(segment_id, None)
+
+        self.ids = [self.ids[index] for index in keep]
+        self.labels.keep(keep)
+        self.strains.keep(keep)
+        self.tags.keep(keep)
+
+        return removed
+
     def as_dict(self) -> dict:
         """
         Generates a JSON-serializable dictionary representation suitable for the `segment_properties/info` file.
@@ -59,3 +106,10 @@ class SegmentInfo:
                 ]
             }
         }
+
+
+def _set_or_clear(values: dict, segment_id: int, value):
+    if value is not None:
+        values[segment_id] = value
+    else:
+        values.pop(segment_id, None)
@@ -0,0 +1,543 @@
+import json
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from nmcp.instrumentation import tracing
+
+from .segment_info import SegmentInfo
+
+logger = logging.getLogger(__name__)
+
+_state_path = "segment_properties/info.pickle"
+_info_path = "segment_properties/info"
+# Sorted little-endian uint64 segment ids, so that listing and membership checks do not need the full state.  A JSON
+# header line records the version token of the state the ids were taken from.
+_ids_path = "segment_properties/ids"
+
+# Deserialized state per dataset location, shared by every store in the process and revalidated against the stored
+# object's version token before use.
+_cache: Dict[str, Tuple[object, SegmentInfo]] = dict()
+_ids_cache: Dict[str, Tuple[object, np.ndarray]] = dict()
+_cache_locks: Dict[str, threading.RLock] = dict()
+_cache_locks_lock = threading.Lock()
+
+# Locations already warned about, since a store (and its backend) is created for every update.
+_unguarded_warned: Set[str] = set()
+
+
+class SegmentInfoConflictError(Exception):
+    """Raised when the stored segment properties state changed between reading and writing it."""
+    pass
+
+
+class SegmentInfoStore:
+    """
+    Read and update the segment properties state (`segment_properties/info.pickle`), the Neuroglancer `info` file
+    derived from it, and the compact ids index (`segment_properties/ids`).
+
+    Updates are compare-and-swap: the state is written only if it is unchanged since it was read (object generation on
+    GCS, ETag on S3, and a lock file for `file://` locations).  On a conflict the update function is applied again to
+    the newly stored state, so concurrent writers merge rather than overwrite each other.  The `info` file and the ids
+    index are only written while the state is still the one they were derived from.
+    """
+
+    def __init__(self, cloud_location: str, max_attempts: int = 10):
+        self.cloud_location = cloud_location
+        self.max_attempts = max_attempts
+        self._backend = _create_backend(cloud_location)
+
+    def load(self) -> Optional[SegmentInfo]:
+        """
+        The current state, or None if there is none.  The returned object may be shared with other callers in this
+        process and should be treated as read-only; use `update` to make changes.
+        """
+        with _location_lock(self.cloud_location):
+            segment_info, _ = self._read()
+
+        return segment_info
+
+    def load_ids(self) -> np.ndarray:
+        """
+        The sorted segment ids, read from the ids index rather than downloading and deserializing the full state.  An
+        index that does not match the current state (the dataset predates the index, or another writer has not
+        replaced it yet) is ignored in favor of the state.  The returned array is read-only.
+        """
+        with _location_lock(self.cloud_location):
+            token = self._backend.head()
+
+            cached = _ids_cache.get(self.cloud_location)
+
+            if token is not None and cached is not None and cached[0] == token:
+                return cached[1]
+
+            from cloudfiles import CloudFiles
+
+            data = CloudFiles(self.cloud_location).get(_ids_path)
+
+            if data is not None:
+                index_token, ids = _decode_ids(data)
+                if token is None:
+                    # Nothing to validate against on protocols without version tokens.
+                    return ids
+                if json.dumps(index_token) == json.dumps(token):
+                    _ids_cache[self.cloud_location] = (token, ids)
+                    return ids
+
+            segment_info, token = self._read()
+
+            ids = _sorted_ids(segment_info.ids if segment_info is not None else [])
+
+            if token is not None:
+                _ids_cache[self.cloud_location] = (token, ids)
+
+            return ids
+
+    def content_hash(self, segment_id: int) -> Optional[str]:
+        """The content hash recorded when a segment was last written, or None if it is not known."""
+        segment_info = self.load()
+
+        return segment_info.content_hash(segment_id) if segment_info is not None else None
+
+    def source_version(self, segment_id: int) -> Optional[int]:
+        """The source version a segment was last generated from, or None if it is not known."""
+        segment_info = self.load()
+
+        return segment_info.source_version(segment_id) if segment_info is not None else None
+
+    def update(self, mutate: Callable[[SegmentInfo], None], create: bool = True) -> Optional[SegmentInfo]:
+        """
+        Apply `mutate` to the current state and store the result.  Returns the stored state, or None if there is no
+        existing state and `create` is False.
+        """
+        with tracing.span("segment_properties.update", cloud_location=self.cloud_location) as span:
+            segment_info = self._update(mutate, create, span)
+            if segment_info is not None:
+                span.set_attribute("segments", len(segment_info.ids))
+            return segment_info
+
+    def _update(self, mutate: Callable[[SegmentInfo], None], create: bool, span) -> Optional[SegmentInfo]:
+        with _location_lock(self.cloud_location):
+            for attempt in range(self.max_attempts):
+                span.set_attribute("attempts", attempt + 1)
+
+                segment_info, token = self._read()
+
+                if segment_info is None:
+                    if not create:
+                        return None
+                    segment_info = SegmentInfo()
+
+                try:
+                    mutate(segment_info)
+
+                    # The internal representation of the segment properties carries context that would otherwise
+                    # need to be rebuilt when deserializing `info`.
+                    token = self._backend.write(pickle.dumps(segment_info), token)
+                except SegmentInfoConflictError:
+                    _cache.pop(self.cloud_location, None)
+                    delay = min(0.05 * 2 ** attempt, 2.0) * random.uniform(0.5, 1.5)
+                    logger.debug(f"segment properties changed during update, retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                except BaseException:
+                    # The cached object may have been partially modified.
+                    _cache.pop(self.cloud_location, None)
+                    raise
+
+                ids = _sorted_ids(segment_info.ids)
+
+                if token is not None:
+                    _cache[self.cloud_location] = (token, segment_info)
+                    _ids_cache[self.cloud_location] = (token, ids)
+
+                # The required precomputed segment properties info file.  A writer whose state has already been
+                # replaced leaves both files to the writer that replaced it, so they never go back to an older state.
+                from cloudfiles.lib import jsonify
+
+                if self._backend.write_derived(_info_path, jsonify(segment_info.as_dict()), "application/json", token):
+                    self._backend.write_derived(_ids_path, _encode_ids(ids, token), "application/octet-stream", token)
+                else:
+                    logger.debug(f"segment properties of {self.cloud_location} were replaced before writing info")
+
+                return segment_info
+
+        raise SegmentInfoConflictError(f"could not update segment properties for {self.cloud_location} after "
+                                       f"{self.max_attempts} attempts")
+
+    def _read(self) -> Tuple[Optional[SegmentInfo], object]:
+        """
+        Use the cached state if a metadata request shows the stored object is unchanged, otherwise download and
+        deserialize it.
+        """
+        cached = _cache.get(self.cloud_location)
+
+        if cached is not None:
+            token = self._backend.head()
+            if token is not None and token == cached[0]:
+                return cached[1], token
+
+        data, token = self._backend.read()
+
+        if data is None:
+            _cache.pop(self.cloud_location, None)
+            return None, token
+
+        segment_info = pickle.loads(data)
+
+        if token is not None:
+            _cache[self.cloud_location] = (token, segment_info)
+
+        return segment_info, token
+
+
+def clear_segment_info_cache():
+    _cache.clear()
+    _ids_cache.clear()
+
+
+def _sorted_ids(ids: Iterable[int]) -> np.ndarray:
+    ids = np.unique(np.fromiter(ids, dtype="<u8"))
+    ids.flags.writeable = False
+    return ids
+
+
+def _encode_ids(ids: np.ndarray, token: object) -> bytes:
+    header = json.dumps({"token": token, "count": len(ids)}).encode()
+
+    # Padded so that the ids start 8-byte aligned.
+    header += b" " * (-(len(header) + 1) % 8) + b"\n"
+
+    return header + ids.tobytes()
+
+
+def _decode_ids(data: bytes) -> Tuple[object, np.ndarray]:
+    end = data.index(b"\n") + 1
+
+    return json.loads(data[:end])["token"], np.frombuffer(data, dtype="<u8", offset=end)
+
+
+def _location_lock(cloud_location: str) -> threading.RLock:
+    with _cache_locks_lock:
+        return _cache_locks.setdefault(cloud_location, threading.RLock())
+
+
+class _UnguardedBackend:
+    """Plain reads and writes for protocols without conditional write support."""
+
+    def __init__(self, cloud_location: str):
+        from cloudfiles import CloudFiles
+
+        self._cf = CloudFiles(cloud_location)
+
+        with _cache_locks_lock:
+            warn = cloud_location not in _unguarded_warned
+            _unguarded_warned.add(cloud_location)
+
+        if warn:
+            logger.warning(f"segment properties updates for {cloud_location} are not protected from concurrent writers")
+
+    def head(self) -> object:
+        return None
+
+    def read(self) -> Tuple[Optional[bytes], object]:
+        return self._cf.get(_state_path), None
+
+    def write(self, data: bytes, token: object) -> object:
+        self._cf.put(_state_path, data)
+        return None
+
+    def write_derived(self, path: str, data: bytes, content_type: str, token: object) -> bool:
+        self._cf.put(path, data, content_type=content_type)
+        return True
+
+
+class _FileBackend:
+    """
+    Local file system state.  Conditional writes are emulated with an exclusive lock on a lock file, which the operating
+    system releases if the writer exits without doing so; the token is the inode, modification time, and size of the
+    state file, which an atomic replace always changes.
+    """
+
+    def __init__(self, directory: str, lock_timeout: float = 30.0):
+        self._directory = directory
+        self._path = os.path.join(directory, _state_path)
+        self._lock_path = f"{self._path}.lock"
+        self._lock_timeout = lock_timeout
+
+    def head(self) -> object:
+        try:
+            return _file_token(os.stat(self._path))
+        except FileNotFoundError:
+            return None
+
+    def read(self) -> Tuple[Optional[bytes], object]:
+        try:
+            with open(self._path, "rb") as f:
+                token = _file_token(os.fstat(f.fileno()))
+                return f.read(), token
+        except FileNotFoundError:
+            return None, None
+
+    def write(self, data: bytes, token: object) -> object:
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+
+        lock = self._acquire()
+
+        try:
+            if self.head() != token:
+                raise SegmentInfoConflictError(self._path)
+
+            _replace_file(self._path, data)
+
+            return _file_token(os.stat(self._path))
+        finally:
+            _release(lock)
+
+    def write_derived(self, path: str, data: bytes, content_type: str, token: object) -> bool:
+        lock = self._acquire()
+
+        try:
+            if self.head() != token:
+                return False
+
+            _replace_file(os.path.join(self._directory, path), data)
+
+            return True
+        finally:
+            _release(lock)
+
+    def _acquire(self) -> int:
+        """An open descriptor of the lock file holding the lock.  The lock file itself is never removed."""
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+
+        lock = os.open(self._lock_path, os.O_CREAT | os.O_RDWR)
+
+        start = time.monotonic()
+
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(lock, msvcrt.LK_NBLCK, 1)
+                return lock
+            except OSError:
+                pass
+
+            if time.monotonic() - start > self._lock_timeout:
+                os.close(lock)
+                raise SegmentInfoConflictError(f"timed out waiting for {self._lock_path}")
+
+            time.sleep(0.01)
+
+
+def _release(lock: int):
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        else:
+            os.lseek(lock, 0, os.SEEK_SET)
+            msvcrt.locking(lock, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(lock)
+
+
+def _replace_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+class _GcsBackend:
+    """Google Cloud Storage state, guarded by object generation preconditions."""
+
+    def __init__(self, bucket: str, prefix: str):
+        from cloudfiles.secrets import google_credentials
+        from google.cloud import storage
+
+        project, credentials = google_credentials(bucket)
+
+        client = storage.Client(project=project, credentials=credentials)
+
+        self._prefix = prefix
+        self._blob_name = _join_key(prefix, _state_path)
+        self._bucket = client.bucket(bucket)
+
+    def head(self) -> object:
+        blob = self._bucket.get_blob(self._blob_name)
+
+        return blob.generation if blob is not None else 0
+
+    def read(self) -> Tuple[Optional[bytes], object]:
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+
+        blob = self._bucket.get_blob(self._blob_name)
+
+        if blob is None:
+            return None, 0
+
+        try:
+            return blob.download_as_bytes(if_generation_match=blob.generation), blob.generation
+        except (NotFound, PreconditionFailed):
+            # Replaced between the metadata and content requests; the retry reads the new generation.
+            return self.read()
+
+    def write(self, data: bytes, token: object) -> object:
+        from google.api_core.exceptions import PreconditionFailed
+
+        blob = self._bucket.blob(self._blob_name)
+
+        try:
+            # A generation of 0 requires that the object does not exist yet.
+            blob.upload_from_string(data, content_type="application/octet-stream", if_generation_match=token)
+        except PreconditionFailed as ex:
+            raise SegmentInfoConflictError(self._blob_name) from ex
+
+        return blob.generation
+
+    def write_derived(self, path: str, data: bytes, content_type: str, token: object) -> bool:
+        from google.api_core.exceptions import PreconditionFailed
+
+        name = _join_key(self._prefix, path)
+
+        while True:
+            # The file's generation is read before checking the state, so that a writer that replaces the state and
+            # then the file in between makes this write fail.
+            blob = self._bucket.get_blob(name)
+
+            if self.head() != token:
+                return False
+
+            try:
+                self._bucket.blob(name).upload_from_string(data, content_type=content_type,
+                                                           if_generation_match=blob.generation if blob else 0)
+                return True
+            except PreconditionFailed:
+                continue
+
+
+class _S3Backend:
+    """Amazon S3 state, guarded by If-Match/If-None-Match conditional writes."""
+
+    def __init__(self, bucket: str, prefix: str):
+        import boto3
+        from cloudfiles.secrets import aws_credentials
+
+        credentials = aws_credentials(bucket)
+
+        self._client = boto3.client(
+            "s3",
+            aws_access_key_id=credentials.get("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=credentials.get("AWS_SECRET_ACCESS_KEY"),
+            aws_session_token=credentials.get("AWS_SESSION_TOKEN"),
+            region_name=credentials.get("AWS_DEFAULT_REGION")
+        )
+        self._bucket = bucket
+        self._prefix = prefix
+        self._key = _join_key(prefix, _state_path)
+
+    def head(self) -> object:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self._client.head_object(Bucket=self._bucket, Key=self._key)["ETag"]
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def read(self) -> Tuple[Optional[bytes], object]:
+        try:
+            response = self._client.get_object(Bucket=self._bucket, Key=self._key)
+        except self._client.exceptions.NoSuchKey:
+            return None, None
+
+        return response["Body"].read(), response["ETag"]
+
+    def write(self, data: bytes, token: object) -> object:
+        from botocore.exceptions import ClientError
+
+        condition = {"IfMatch": token} if token is not None else {"IfNoneMatch": "*"}
+
+        try:
+            response = self._client.put_object(Bucket=self._bucket, Key=self._key, Body=data, **condition)
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise SegmentInfoConflictError(self._key) from ex
+            raise
+
+        return response["ETag"]
+
+    def write_derived(self, path: str, data: bytes, content_type: str, token: object) -> bool:
+        from botocore.exceptions import ClientError
+
+        key = _join_key(self._prefix, path)
+
+        while True:
+            # As for GCS, the file's ETag is read before checking the state.
+            try:
+                etag = self._client.head_object(Bucket=self._bucket, Key=key)["ETag"]
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                    raise
+                etag = None
+
+            if self.head() != token:
+                return False
+
+            condition = {"IfMatch": etag} if etag is not None else {"IfNoneMatch": "*"}
+
+            try:
+                self._client.put_object(Bucket=self._bucket, Key=key, Body=data, ContentType=content_type,
+                                        **condition)
+                return True
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    raise
+
+
+def _create_backend(cloud_location: str):
+    from cloudfiles.paths import extract
+
+    path = extract(cloud_location)
+
+    if path.protocol == "file":
+        return _FileBackend(path.path)
+
+    if path.protocol == "gs":
+        return _GcsBackend(path.bucket, path.path)
+
+    if path.protocol == "s3":
+        return _S3Backend(path.bucket, path.path)
+
+    return _UnguardedBackend(cloud_location)
+
+
+def _file_token(stat: os.stat_result) -> tuple:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _join_key(prefix: str, key: str) -> str:
+    prefix = prefix.strip("/")
+
+    return f"{prefix}/{key}" if prefix else key
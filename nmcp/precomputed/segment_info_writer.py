@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from nmcp.instrumentation import metrics
+
+from .segment_info import SegmentInfo, NmcpPropertyValues
+from .segment_info_store import SegmentInfoStore
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredSegmentInfoWriter:
+    """
+    Write-behind segment properties for a single dataset.  Changes are held in memory and written through
+    `SegmentInfoStore` once `max_pending` changes are waiting or the oldest waiting change is `max_age` seconds old,
+    whichever comes first.  `flush` should also be called when there is no more work and at shutdown.
+
+    Pending changes are kept as updates rather than as a copy of the state so that a flush merges them into whatever is
+    stored at that time, including changes made by other writers.
+    """
+
+    def __init__(self, cloud_location: str, max_pending: int = 25, max_age: float = 60.0,
+                 store: Optional[SegmentInfoStore] = None):
+        self.cloud_location = cloud_location
+        self.max_pending = max_pending
+        self.max_age = max_age
+
+        self._store = store or SegmentInfoStore(cloud_location)
+        self._lock = threading.RLock()
+        self._pending: List[Callable[[SegmentInfo], None]] = list()
+        self._oldest: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        # Content hash and source version each pending change will record, None for those it clears.
+        self._pending_sources: Dict[int, Tuple[Optional[str], Optional[int]]] = dict()
+
+    @property
+    def dirty(self) -> bool:
+        with self._lock:
+            return len(self._pending) > 0
+
+    def append(self, segment_id: int, values: NmcpPropertyValues, content_hash: Optional[str] = None,
+               version: Optional[int] = None):
+        with self._lock:
+            self._pending_sources[segment_id] = (content_hash, version)
+            self.record(lambda segment_info: segment_info.append(segment_id, values, content_hash, version))
+
+    def remove(self, segment_id: int):
+        with self._lock:
+            self._pending_sources[segment_id] = (None, None)
+            self.record(lambda segment_info: segment_info.remove(segment_id))
+
+    def content_hash(self, segment_id: int) -> Optional[str]:
+        """The content hash of a segment, including changes that have not been written yet."""
+        with self._lock:
+            if segment_id in self._pending_sources:
+                return self._pending_sources[segment_id][0]
+
+        return self._store.content_hash(segment_id)
+
+    def source_version(self, segment_id: int) -> Optional[int]:
+        """The source version of a segment, including changes that have not been written yet."""
+        with self._lock:
+            if segment_id in self._pending_sources:
+                return self._pending_sources[segment_id][1]
+
+        return self._store.source_version(segment_id)
+
+    def record(self, mutate: Callable[[SegmentInfo], None]):
+        with self._lock:
+            self._pending.append(mutate)
+
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._schedule_timer()
+
+            self.maybe_flush()
+
+    def maybe_flush(self) -> bool:
+        with self._lock:
+            if len(self._pending) == 0:
+                return True
+
+            if len(self._pending) >= self.max_pending or time.monotonic() - self._oldest >= self.max_age:
+                return self.flush()
+
+        return False
+
+    def flush(self) -> bool:
+        """Write all pending changes.  Returns False if they could not be written and remain pending."""
+        with self._lock:
+            self._cancel_timer()
+
+            if len(self._pending) == 0:
+                return True
+
+            pending = self._pending
+
+            def apply(segment_info: SegmentInfo):
+                for mutate in pending:
+                    mutate(segment_info)
+
+            try:
+                with metrics.time_stage("properties"):
+                    self._store.update(apply)
+            except Exception as ex:
+                logger.error(f"could not write {len(pending)} segment property changes to {self.cloud_location}: {ex}")
+                self._schedule_timer()
+                return False
+
+            logger.debug(f"wrote {len(pending)} segment property changes to {self.cloud_location}")
+
+            self._pending = list()
+            self._pending_sources = dict()
+            self._oldest = None
+
+        return True
+
+    def _schedule_timer(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_age, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if not self.maybe_flush():
+                self._schedule_timer()
@@ -1,3 +1,6 @@
+from typing import List
+
+
 class SegmentProperty:
     def __init__(self, prop_id: str, prop_type: str, description: str = None, values=None):
         self.id = prop_id
@@ -12,6 +15,10 @@ class SegmentProperty:
         if index < len(self.values):
             del self.values[index]
 
+    def keep(self, indices: List[int]) -> None:
+        """Retain only the values at `indices`, in that order."""
+        self.values = [self.values[index] for index in indices]
+
     def update(self, index, value):
         if index < len(self.values):
             self.values[index] = value
@@ -1,6 +1,6 @@
-import numpy
+from typing import List
 
-from allensdk.core.mouse_connectivity_cache import MouseConnectivityCache
+import numpy
 
 from .segment_property import SegmentProperty
 
@@ -36,6 +36,12 @@ class SegmentTagProperty(SegmentProperty):
         if index < len(self.descriptions):
             del self.descriptions[index]
 
+    def keep(self, indices: List[int]) -> None:
+        super(SegmentTagProperty, self).keep(indices)
+
+        if len(self.descriptions) > 0:
+            self.descriptions = [self.descriptions[index] for index in indices]
+
     def as_dict(self) -> dict:
         property_desc = super(SegmentTagProperty, self).as_dict()
 
@@ -77,6 +83,8 @@ def _use_soma_lookup(soma_id: int | None) -> (str, str):
 
     if soma_id is not None:
         if _structure_id_lookup is None:
+            # allensdk takes seconds to import; only load it when a structure is first looked up.
+            from allensdk.core.mouse_connectivity_cache import MouseConnectivityCache
             _structure_id_lookup = MouseConnectivityCache(resolution=10).get_structure_tree()
         structure = _structure_id_lookup.get_structures_by_id([soma_id])[0]
         if structure is not None:
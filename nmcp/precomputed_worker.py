@@ -1,8 +1,22 @@
 import argparse
 import logging
+import os
+import signal
+import tempfile
 import threading
-
-from nmcp import RemoteDataClient, create_from_data, extract_neuron_properties, SkeletonComponents, PrecomputedEntry
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from nmcp import (RemoteDataClient, create_from_data, extract_neuron_properties, SkeletonComponents, PrecomputedEntry,
+                  PrecomputedStatusQueue, ShardAssignment, DeferredSegmentInfoWriter, ReconstructionPageCache,
+                  latest_entries, WorkSchedule)
+from nmcp.precomputed.nmcp_skeleton import encoded_skeleton_size
+from nmcp.instrumentation import metrics, job_records, tracing, JobProfiler, ProfilingOptions, JobRecord, \
+    JobRecordWriter, add_profiling_arguments, profiling_options_from_arguments
 
 logging.basicConfig(level=logging.WARNING)
 logging.getLogger("nmcp").setLevel(logging.DEBUG)
@@ -16,9 +30,87 @@ heartbeat_interval: int = 3600  # seconds
 heartbeat_count_limit: int = int(heartbeat_interval / process_interval)
 heartbeat_current_count: int = 0
 
+_variants = ("full", "axon", "dendrite")
+
+
+class PendingVersions:
+    """
+    The latest pending entry of each reconstruction, refreshed from the service at most once per `interval` seconds,
+    so that a job can be cancelled when a newer version of its reconstruction is queued while it runs.
+    """
+
+    def __init__(self, client: RemoteDataClient, interval: float = 30.0):
+        self._client = client
+        self.interval = interval
+        self._latest: Dict[str, str] = dict()
+        self._updated = time.monotonic()
+        # Jobs in every lane check for newer versions.
+        self._lock = threading.Lock()
+
+    def update(self, pending: List[PrecomputedEntry]):
+        latest, _ = latest_entries(pending)
+
+        with self._lock:
+            self._latest = {entry.reconstructionId: entry.id for entry in latest}
+            self._updated = time.monotonic()
+
+    def is_superseded(self, entry: PrecomputedEntry) -> bool:
+        with self._lock:
+            if time.monotonic() - self._updated >= self.interval:
+                try:
+                    latest, _ = latest_entries(self._client.find_pending())
+                    self._latest = {e.reconstructionId: e.id for e in latest}
+                except Exception as ex:
+                    logger.warning(f"could not refresh pending entries: {ex}")
+                self._updated = time.monotonic()
+
+            latest = self._latest.get(entry.reconstructionId)
+
+        return latest is not None and latest != entry.id
+
+
+def is_published(writers: Dict[str, DeferredSegmentInfoWriter], entry: PrecomputedEntry) -> bool:
+    """Whether every variant was already generated from the entry's source version."""
+    return entry.version is not None and all(writer.source_version(entry.skeletonSegmentId) == entry.version
+                                             for writer in writers.values())
 
-def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
-    header_data = client.get_reconstruction_header(pending.reconstructionId)
+
+def spill_over_budget(parts: List[Optional[SkeletonComponents]], memory_budget: Optional[int],
+                      spill_directory: Optional[str]):
+    """
+    Spill the parts of a reconstruction to `spill_directory` once their arrays, together with the merged copy made for
+    the full skeleton and its encoding, would take more than `memory_budget` bytes.  The encoding is held in memory
+    while it is uploaded even when the arrays are spilled.
+    """
+    if memory_budget is None or spill_directory is None:
+        return
+
+    parts = [part for part in parts if part is not None]
+
+    required = 2 * sum(part.in_memory_bytes for part in parts) + sum(encoded_skeleton_size(part) for part in parts)
+
+    if required <= memory_budget:
+        return
+
+    for part in parts:
+        if part.spill_directory is None:
+            logger.info(f"spilling {len(part.vertices)} nodes over the {memory_budget >> 20} MiB memory budget")
+            part.spill(spill_directory)
+            metrics.skeletons_spilled_total.inc()
+
+
+def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry,
+                        superseded: Optional[Callable[[PrecomputedEntry], bool]] = None,
+                        memory_budget: Optional[int] = None, spill_directory: Optional[str] = None):
+    """
+    Fetch the header and the axon and dendrite pages of a reconstruction.  Returns None if it could not be loaded, or
+    if `superseded` reports a newer version of the reconstruction between pages.
+
+    Once the reconstruction is larger than `memory_budget` bytes it is spilled to files in `spill_directory`, which the
+    caller removes after the reconstruction has been saved.
+    """
+    with metrics.time_stage("fetch"):
+        header_data = client.get_reconstruction_header(pending.reconstructionId)
 
     reconstruction_id = pending.reconstructionId
     skeleton_id = pending.skeletonSegmentId
@@ -40,13 +132,19 @@ def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
         axon_total_points = 0
 
         while True:
+            if superseded is not None and superseded(pending):
+                logger.info(f"{reconstruction_id} has a newer version, cancelling")
+                return None
+
             logger.debug(f"fetching axon chunk at offset {axon_offset} with size {chunk_size}")
-            axon_result = client.get_axon_chunks(
-                reconstruction_id,
-                chunk_size=chunk_size,
-                offset=axon_offset,
-                limit=chunk_size
-            )
+            with metrics.time_stage("fetch"):
+                axon_result = client.get_axon_chunks(
+                    reconstruction_id,
+                    chunk_size=chunk_size,
+                    offset=axon_offset,
+                    limit=chunk_size,
+                    version=pending.version
+                )
 
             if not axon_result or not axon_result["data"]:
                 logger.debug("no more axon data available")
@@ -55,16 +153,21 @@ def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
             chunk_points = axon_result["data"]
             chunk_count = len(chunk_points)
 
-            if axon_components is None:
-                # First chunk - create new SkeletonComponents
-                logger.debug(f"creating axon components with {chunk_count} points")
-                axon_components = SkeletonComponents.create(chunk_points)
-            else:
-                # Subsequent chunks - append to existing
-                logger.debug(f"appending {chunk_count} points to axon components")
-                axon_components.append(chunk_points)
+            with metrics.time_stage("build"):
+                if axon_components is None:
+                    # First chunk - create new SkeletonComponents
+                    logger.debug(f"creating axon components with {chunk_count} points")
+                    axon_components = SkeletonComponents.create(chunk_points)
+                else:
+                    # Subsequent chunks - append to existing
+                    logger.debug(f"appending {chunk_count} points to axon components")
+                    axon_components.append(chunk_points)
+
+                spill_over_budget([axon_components], memory_budget, spill_directory)
 
             axon_total_points += chunk_count
+            metrics.nodes_total.inc(chunk_count, part="axon")
+            job_records.add_page("axon", chunk_count)
 
             # Check if we got less than requested (end of data)
             if chunk_count < chunk_size:
@@ -84,13 +187,19 @@ def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
         dendrite_total_points = 0
 
         while True:
+            if superseded is not None and superseded(pending):
+                logger.info(f"{reconstruction_id} has a newer version, cancelling")
+                return None
+
             logger.debug(f"fetching dendrite chunk at offset {dendrite_offset} with size {chunk_size}")
-            dendrite_result = client.get_dendrite_chunks(
-                reconstruction_id,
-                chunk_size=chunk_size,
-                offset=dendrite_offset,
-                limit=chunk_size
-            )
+            with metrics.time_stage("fetch"):
+                dendrite_result = client.get_dendrite_chunks(
+                    reconstruction_id,
+                    chunk_size=chunk_size,
+                    offset=dendrite_offset,
+                    limit=chunk_size,
+                    version=pending.version
+                )
 
             if not dendrite_result or not dendrite_result["data"]:
                 logger.debug("no more dendrite data available")
@@ -99,16 +208,21 @@ def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
             chunk_points = dendrite_result["data"]
             chunk_count = len(chunk_points)
 
-            if dendrite_components is None:
-                # First chunk - create new SkeletonComponents
-                logger.debug(f"creating dendrite components with {chunk_count} points")
-                dendrite_components = SkeletonComponents.create(chunk_points)
-            else:
-                # Subsequent chunks - append to existing
-                logger.debug(f"appending {chunk_count} points to dendrite components")
-                dendrite_components.append(chunk_points)
+            with metrics.time_stage("build"):
+                if dendrite_components is None:
+                    # First chunk - create new SkeletonComponents
+                    logger.debug(f"creating dendrite components with {chunk_count} points")
+                    dendrite_components = SkeletonComponents.create(chunk_points)
+                else:
+                    # Subsequent chunks - append to existing
+                    logger.debug(f"appending {chunk_count} points to dendrite components")
+                    dendrite_components.append(chunk_points)
+
+                spill_over_budget([axon_components, dendrite_components], memory_budget, spill_directory)
 
             dendrite_total_points += chunk_count
+            metrics.nodes_total.inc(chunk_count, part="dendrite")
+            job_records.add_page("dendrite", chunk_count)
 
             # Check if we got less than requested (end of data)
             if chunk_count < chunk_size:
@@ -127,46 +241,251 @@ def load_reconstruction(client: RemoteDataClient, pending: PrecomputedEntry):
         return None
 
 
-def save_reconstruction(output, skeleton_id, properties, axon_components, dendrite_components):
+@dataclass
+class WorkerContext:
+    client: RemoteDataClient
+    status: PrecomputedStatusQueue
+    shard: ShardAssignment
+    output: str
+    writers: Dict[str, DeferredSegmentInfoWriter]
+    profiler: JobProfiler = field(default_factory=lambda: JobProfiler(ProfilingOptions()))
+    job_log: Optional[JobRecordWriter] = None
+    pending_versions: Optional[PendingVersions] = None
+    schedule: WorkSchedule = field(default_factory=WorkSchedule)
+    # Bytes of node arrays a job holds in memory before spilling them to files under `spill_directory`, or the system
+    # temporary directory.
+    memory_budget: Optional[int] = None
+    spill_directory: Optional[str] = None
+    # Entries that have been uploaded but whose segment properties have not been written yet, with the source version
+    # they were generated from.
+    completed: List[Tuple[str, int]] = field(default_factory=list)
+    # When this worker first saw each pending entry, for the oldest pending age.
+    first_seen: Dict[str, float] = field(default_factory=dict)
+    # Estimated node count by reconstruction id and version, kept while the entry is pending.
+    sizes: Dict[Tuple[str, Optional[int]], int] = field(default_factory=dict)
+    # Guards `completed` and the pending metrics, which jobs in every lane update.
+    lock: threading.RLock = field(default_factory=threading.RLock)
+
+
+def create_segment_info_writers(output: str, max_pending: int, max_age: float) -> Dict[str, DeferredSegmentInfoWriter]:
+    return {variant: DeferredSegmentInfoWriter(f"{output}/{variant}", max_pending, max_age) for variant in _variants}
+
+
+def save_reconstruction(output, skeleton_id, properties, axon_components, dendrite_components, writers=None,
+                        version=None) -> bool:
+    """Write the full, axon, and dendrite skeletons.  Returns False if any of them could not be written."""
+    writers = writers or {}
+
     # Create the full reconstruction (both axon and dendrite)
     logger.info(f"creating full reconstruction for skeleton {skeleton_id}")
-    create_from_data(axon_components, dendrite_components, properties, f"{output}/full", skeleton_id)
+    full = create_from_data(axon_components, dendrite_components, properties, f"{output}/full", skeleton_id,
+                            writers.get("full"), version)
 
     # Create axon-only reconstruction
     logger.info(f"creating axon-only reconstruction for skeleton {skeleton_id}")
-    create_from_data(axon_components, None, properties, f"{output}/axon", skeleton_id)
+    axon = create_from_data(axon_components, None, properties, f"{output}/axon", skeleton_id, writers.get("axon"),
+                            version)
 
     # Create dendrite-only reconstruction
     logger.info(f"creating dendrite-only reconstruction for skeleton {skeleton_id}")
-    create_from_data(None, dendrite_components, properties, f"{output}/dendrite", skeleton_id)
+    dendrite = create_from_data(None, dendrite_components, properties, f"{output}/dendrite", skeleton_id,
+                                writers.get("dendrite"), version)
+
+    return full and axon and dendrite
+
+
+def commit_completed(context: WorkerContext, force: bool = False):
+    """
+    Write segment properties if due (or always when `force` is set) and report entries as generated only once their
+    segment properties have been written.  An entry that is not yet reported is processed again after a crash.
+    """
+    with context.lock:
+        for writer in context.writers.values():
+            if force:
+                writer.flush()
+            else:
+                writer.maybe_flush()
+
+        if any(writer.dirty for writer in context.writers.values()):
+            return
+
+        for entry_id, version in context.completed:
+            context.status.mark_generated(entry_id, version)
+
+        context.completed.clear()
+
+
+def _node_count(components: SkeletonComponents) -> int:
+    return len(components.vertices) if components is not None else 0
+
+
+def update_pending_metrics(context: WorkerContext, pending: List[PrecomputedEntry]):
+    now = time.time()
+
+    # Entries no longer pending are dropped so their age does not linger.
+    context.first_seen = {p.id: context.first_seen.get(p.id, now) for p in pending}
+
+    metrics.pending_entries.set(len(pending))
+    metrics.oldest_pending_seen_seconds.set(now - min(context.first_seen.values(), default=now))
+
+
+def estimate_sizes(context: WorkerContext, entries: List[PrecomputedEntry]) -> Dict[str, Optional[int]]:
+    """
+    The node count of each entry's reconstruction by entry id, or None where it could not be probed.  Probes run
+    concurrently and their results are kept for later cycles while the entry remains pending.
+    """
+    keys = {(entry.reconstructionId, entry.version) for entry in entries}
+
+    context.sizes = {key: size for key, size in context.sizes.items() if key in keys}
+
+    probing = [entry for entry in entries if (entry.reconstructionId, entry.version) not in context.sizes]
+
+    if len(probing) > 0:
+        clients = threading.local()
+
+        def probe(entry: PrecomputedEntry) -> Optional[int]:
+            client = getattr(clients, "client", None)
+            if client is None:
+                client = clients.client = context.client.clone()
+            return client.get_reconstruction_size(entry.reconstructionId)
+
+        concurrency = context.schedule.fast_concurrency + context.schedule.large_concurrency
+
+        with metrics.time_stage("probe"), ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            for entry, size in zip(probing, executor.map(probe, probing)):
+                if size is not None:
+                    context.sizes[(entry.reconstructionId, entry.version)] = size
+
+    return {entry.id: context.sizes.get((entry.reconstructionId, entry.version)) for entry in entries}
+
+
+def process_entry(context: WorkerContext, client: RemoteDataClient, pend: PrecomputedEntry,
+                  superseded: List[PrecomputedEntry], versions: PendingVersions, published: bool = False):
+    """
+    Generate one entry, which also stands for the older entries of its reconstruction it `superseded`.  A `published`
+    entry is only reported.
+    """
+    entries = [pend] + superseded
 
+    record = JobRecord(pend.reconstructionId, pend.skeletonSegmentId, pend.id)
 
-def process_pending(client: RemoteDataClient, output: str):
+    try:
+        with job_records.track_job(record, context.job_log), \
+                tracing.span("reconstruction", reconstruction_id=pend.reconstructionId,
+                             skeleton_id=pend.skeletonSegmentId), \
+                context.profiler.profile(pend.reconstructionId) as job:
+            if published:
+                logger.info(f"{pend.reconstructionId} version {pend.version} is already generated")
+                record.result = "unchanged"
+            else:
+                # Spilled node arrays are removed with the job's directory once the skeletons are written.
+                spilling = tempfile.TemporaryDirectory(prefix="nmcp-job-", dir=context.spill_directory,
+                                                       ignore_cleanup_errors=True) \
+                    if context.memory_budget is not None else nullcontext()
+
+                with spilling as spill_directory:
+                    reconstruction = load_reconstruction(client, pend, versions.is_superseded, context.memory_budget,
+                                                         spill_directory)
+
+                    if versions.is_superseded(pend):
+                        # Left pending; it is reported with the entry that supersedes it.
+                        record.result = "superseded"
+                        return
+
+                    if reconstruction is None:
+                        for entry in entries:
+                            context.status.mark_failed(entry.id)
+                        return
+
+                    axon_components, dendrite_components, properties = reconstruction
+
+                    record.axon_nodes = _node_count(axon_components)
+                    record.dendrite_nodes = _node_count(dendrite_components)
+                    job.node_count = record.axon_nodes + record.dendrite_nodes
+
+                    if not save_reconstruction(context.output, pend.skeletonSegmentId, properties, axon_components,
+                                               dendrite_components, context.writers, pend.version):
+                        for entry in entries:
+                            context.status.mark_failed(entry.id)
+                        return
+
+                    record.result = "generated"
+
+        with context.lock:
+            context.completed.extend((entry.id, pend.generated_version) for entry in entries)
+    except Exception as ex:
+        logger.error("error", None, ex, True)
+        for entry in entries:
+            context.status.mark_failed(entry.id)
+    finally:
+        metrics.jobs_total.inc(result=record.result)
+        metrics.job_seconds.observe(record.wall_seconds)
+
+
+def process_available(context: WorkerContext) -> int:
+    """
+    Process every entry currently pending for this shard once.  Entries are taken smallest first in the lanes of the
+    context's `WorkSchedule`.  Returns the number of entries attempted.
+    """
     global heartbeat_current_count, heartbeat_count_limit
 
+    pending = []
+
     try:
-        pending = client.find_pending()
+        pending = context.shard.filter(context.client.find_pending())
+
+        update_pending_metrics(context, pending)
+
+        if context.pending_versions is None:
+            context.pending_versions = PendingVersions(context.client.clone())
+
+        versions = context.pending_versions
+        versions.update(pending)
+
+        # Only the latest version of each reconstruction is generated.  The older entries it supersedes share its
+        # result.
+        pending, superseded = latest_entries(pending)
 
         if len(pending) > 0:
             logger.info(f"{len(pending)} pending precomputed entries")
 
+            fetching = list()
+
+            # Entries already generated from their version are reported without being probed or fetched.
             for pend in pending:
-                try:
-                    reconstruction = load_reconstruction(client, pend)
+                if is_published(context.writers, pend):
+                    process_entry(context, context.client, pend, superseded.get(pend.id, []), versions, True)
+                else:
+                    fetching.append(pend)
 
-                    if reconstruction is None:
-                        client.mark_failed(pend.id)
-                        continue
+            commit_completed(context)
 
-                    axon_components, dendrite_components, properties = reconstruction
+            lanes = [deque(lane) for lane in context.schedule.lanes(fetching, estimate_sizes(context, fetching))]
 
-                    save_reconstruction(output, pend.skeletonSegmentId, properties, axon_components,
-                                        dendrite_components)
+            def run_lane(lane: deque):
+                client = context.client.clone()
 
-                    client.mark_generated(pend.id)
-                except Exception as ex:
-                    logger.error("error", None, ex, True)
-                    client.mark_failed(pend.id)
+                while True:
+                    with context.lock:
+                        if len(lane) == 0:
+                            return
+                        pend = lane.popleft()
+
+                    process_entry(context, client, pend, superseded.get(pend.id, []), versions)
+
+                    with context.lock:
+                        update_pending_metrics(context, [entry for queue in lanes for entry in queue])
+
+                    commit_completed(context)
+
+            threads = [(lanes[0], max(context.schedule.fast_concurrency, 1)),
+                       (lanes[1], context.schedule.large_concurrency)]
+
+            with ThreadPoolExecutor(max_workers=sum(count for _, count in threads)) as executor:
+                running = [executor.submit(run_lane, lane) for lane, count in threads for _ in range(count)]
+
+                for future in running:
+                    future.result()
 
             heartbeat_current_count = 0
         else:
@@ -177,16 +496,90 @@ def process_pending(client: RemoteDataClient, output: str):
     except Exception as ex:
         logger.error("process error", None, ex, True)
 
-    t1 = threading.Timer(process_interval, process_pending, (client, output))
+    # Anything held back by the size/age limits goes out once the queue has been drained.
+    commit_completed(context, force=True)
+    context.status.flush()
+
+    return len(pending)
+
+
+def process_pending(context: WorkerContext):
+    process_available(context)
+
+    t1 = threading.Timer(process_interval, process_pending, (context,))
     t1.start()
 
 
-def main(url: str, auth_key: str, output: str):
+def install_shutdown_handler(context: WorkerContext):
+    def shutdown(signum, frame):
+        logger.info(f"received signal {signum}, writing pending segment properties and status updates")
+        commit_completed(context, force=True)
+        context.status.flush()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+
+def create_worker_context(url: str, auth_key: str, output: str, status_journal: str = None, status_batch: int = 50,
+                          status_delay: float = 5.0, shard_index: int = 0, shard_count: int = 1,
+                          properties_batch: int = 25, properties_delay: float = 60.0,
+                          profiling: ProfilingOptions = None, job_log: str = None, page_cache: str = None,
+                          page_cache_size: int = 4 << 30, schedule: WorkSchedule = None, memory_budget: int = None,
+                          spill_directory: str = None) -> WorkerContext:
+    # Pages of a reconstruction that failed after they were downloaded are read from disk when it is retried.
+    cache = ReconstructionPageCache(page_cache, page_cache_size) if page_cache else None
+
+    client = RemoteDataClient(url, auth_key, cache)
+
+    # Status updates are sent from timer and lane threads while the main thread uses its own client.
+    status = PrecomputedStatusQueue(client.clone(), status_journal, status_batch, status_delay)
+
+    shard = ShardAssignment(shard_index, shard_count)
+
+    if shard.count > 1:
+        logger.info(f"processing shard {shard.index} of {shard.count}")
+
+    writers = create_segment_info_writers(output, properties_batch, properties_delay)
+
+    profiling = profiling or ProfilingOptions()
+    schedule = schedule or WorkSchedule()
+
+    # Allocations are traced for the whole process, so a job's memory report would include those of jobs beside it,
+    # and Python 3.12+ refuses to start a second CPU profiler while one is active.
+    if profiling.enabled and schedule.fast_concurrency + schedule.large_concurrency > 1:
+        logger.info("profiling, processing one reconstruction at a time")
+        schedule = replace(schedule, fast_concurrency=1, large_concurrency=0)
+
+    return WorkerContext(client, status, shard, output, writers, JobProfiler(profiling),
+                         JobRecordWriter(job_log) if job_log else None, PendingVersions(client.clone()),
+                         schedule, memory_budget, spill_directory)
+
+
+def main(url: str, auth_key: str, output: str, status_journal: str = None, status_batch: int = 50,
+         status_delay: float = 5.0, shard_index: int = 0, shard_count: int = 1, properties_batch: int = 25,
+         properties_delay: float = 60.0, metrics_port: int = None, metrics_file: str = None,
+         profiling: ProfilingOptions = None, job_log: str = None, trace: str = None, page_cache: str = None,
+         page_cache_size: int = 4 << 30, schedule: WorkSchedule = None, memory_budget: int = None,
+         spill_directory: str = None):
     logger.info(f"starting data client for url: {url}")
     logger.info(f"output base url: {output}")
-    client = RemoteDataClient(url, auth_key)
 
-    process_pending(client, output)
+    tracing.configure_tracing(trace)
+
+    if metrics_port is not None:
+        metrics.start_metrics_server(metrics_port)
+
+    if metrics_file is not None:
+        metrics.start_metrics_file_writer(metrics_file)
+
+    context = create_worker_context(url, auth_key, output, status_journal, status_batch, status_delay, shard_index,
+                                    shard_count, properties_batch, properties_delay, profiling, job_log, page_cache,
+                                    page_cache_size, schedule, memory_budget, spill_directory)
+
+    install_shutdown_handler(context)
+
+    process_pending(context)
 
 
 if __name__ == '__main__':
@@ -195,7 +588,42 @@ if __name__ == '__main__':
     parser.add_argument("-u", "--url", help="URL of the GraphQL service")
     parser.add_argument("-a", "--authkey", help="authorization header for GraphQL service")
     parser.add_argument("-o", "--output", help="the output cloud volume location")
+    parser.add_argument("--status-journal", help="local file used to persist status updates until acknowledged")
+    parser.add_argument("--status-batch", help="maximum status updates per request", type=int, default=50)
+    parser.add_argument("--status-delay", help="maximum seconds a status update is held before sending", type=float,
+                        default=5.0)
+    parser.add_argument("--shard-index", help="index of this worker replica", type=int,
+                        default=int(os.environ.get("NMCP_SHARD_INDEX", 0)))
+    parser.add_argument("--shard-count", help="total number of worker replicas sharing the pending queue", type=int,
+                        default=int(os.environ.get("NMCP_SHARD_COUNT", 1)))
+
+    parser.add_argument("--properties-batch", help="neurons processed between segment properties writes", type=int,
+                        default=25)
+    parser.add_argument("--properties-delay", help="maximum seconds segment properties changes are held", type=float,
+                        default=60.0)
+    parser.add_argument("--metrics-port", help="serve Prometheus metrics at /metrics on this port", type=int)
+    parser.add_argument("--metrics-file", help="periodically write Prometheus metrics to this file")
+    add_profiling_arguments(parser)
+    parser.add_argument("--job-log", help="append a JSON performance record per reconstruction to this file")
+    parser.add_argument("--trace", help="tracing output: console, file:<path>, or otel",
+                        default=os.environ.get("NMCP_TRACE"))
+    parser.add_argument("--page-cache", help="directory of fetched reconstruction pages, reused when retrying; pages of "
+                        "reconstructions without a known source version are not cached")
+    parser.add_argument("--page-cache-size", help="maximum size of the page cache in MiB", type=int, default=4096)
+    parser.add_argument("--large-nodes", help="estimated node count at which a reconstruction uses the large lane",
+                        type=int, default=250000)
+    parser.add_argument("--fast-concurrency", help="reconstructions processed at once in the fast lane", type=int,
+                        default=1)
+    parser.add_argument("--large-concurrency", help="reconstructions processed at once in the large lane, 0 for a "
+                                                    "single lane", type=int, default=1)
+    parser.add_argument("--memory-budget", help="MiB of node arrays a job holds in memory before spilling them to disk",
+                        type=int)
+    parser.add_argument("--spill-directory", help="local directory for spilled node arrays")
 
     args = parser.parse_args()
 
-    main(args.url, args.authkey, args.output)
+    main(args.url, args.authkey, args.output, args.status_journal, args.status_batch, args.status_delay,
+         args.shard_index, args.shard_count, args.properties_batch, args.properties_delay, args.metrics_port,
+         args.metrics_file, profiling_options_from_arguments(args), args.job_log, args.trace, args.page_cache,
+         args.page_cache_size << 20, WorkSchedule(args.large_nodes, args.fast_concurrency, args.large_concurrency),
+         args.memory_budget << 20 if args.memory_budget is not None else None, args.spill_directory)
@@ -1,20 +1,48 @@
 import argparse
 import logging
+from typing import List
 
-from nmcp import remove_skeleton
+from nmcp import remove_skeletons
 
 logging.basicConfig(level=logging.WARNING)
 
+# The datasets the precomputed worker writes under its output location.
+_variants = ("full", "axon", "dendrite")
+
+
+def _read_ids(path: str) -> List[int]:
+    """One id per line; blank lines and lines starting with `#` are ignored."""
+    with open(path) as f:
+        return [int(line) for line in (line.strip() for line in f) if line and not line.startswith("#")]
+
 
 def main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("-o", "--output", help="the output cloud volume location")
-    parser.add_argument("-s", "--skeleton", help="the is of the skeleton to remove", type=int)
+    parser.add_argument("-s", "--skeleton", help="the ids of the skeletons to remove", type=int, nargs="+",
+                        default=[])
+    parser.add_argument("-f", "--file", help="a file of skeleton ids to remove, one per line")
+    parser.add_argument("--variants", action="store_true",
+                        help=f"remove from the {', '.join(_variants)} datasets under the output location")
+    parser.add_argument("--batch-size", type=int, default=1000, help="skeleton files deleted per request batch")
 
     args = parser.parse_args()
 
-    remove_skeleton(args.skeleton, args.output)
+    skeleton_ids = list(args.skeleton)
+
+    if args.file is not None:
+        skeleton_ids.extend(_read_ids(args.file))
+
+    if len(skeleton_ids) == 0:
+        parser.error("no skeleton ids to remove")
+
+    locations = [f"{args.output}/{variant}" for variant in _variants] if args.variants else [args.output]
+
+    removed = remove_skeletons(locations, skeleton_ids, args.batch_size)
+
+    for location, ids in removed.items():
+        print(f"removed {len(ids)} of {len(set(skeleton_ids))} skeletons from {location}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+from typing import TYPE_CHECKING
+
+from nmcp._lazy import lazy_exports
+
+# Imported on first use; see `nmcp/__init__.py`.
+_exports = {
+    "SyntheticNeuron": ".synthetic",
+    "SyntheticTree": ".synthetic",
+    "synthetic_neuron": ".synthetic",
+    "synthetic_tree": ".synthetic",
+    "StubStructureTree": ".structures",
+    "stub_structure_tree": ".structures",
+    "FakeNmcpService": ".fake_service",
+    "FakeServiceOptions": ".fake_service",
+    "FakeServiceStatistics": ".fake_service"
+}
+
+__all__ = list(_exports)
+
+if TYPE_CHECKING:
+    from .synthetic import SyntheticNeuron, SyntheticTree, synthetic_neuron, synthetic_tree
+    from .structures import StubStructureTree, stub_structure_tree
+    from .fake_service import FakeNmcpService, FakeServiceOptions, FakeServiceStatistics
+
+__getattr__, __dir__ = lazy_exports(__name__, _exports)
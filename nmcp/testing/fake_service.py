@@ -0,0 +1,430 @@
+"""
+A local stand-in for the NMCP GraphQL service with the operations used by the precomputed worker: `pendingPrecomputed`,
+paged `reconstructionDataChunked`, and `updatePrecomputed`.
+
+    python -m nmcp.testing.fake_service --port 9671 --synthetic 20 --nodes 50000 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+
+from graphql import build_schema, graphql_sync
+
+from .synthetic import SyntheticNeuron, SyntheticTree, synthetic_neuron
+
+logger = logging.getLogger(__name__)
+
+_schema = build_schema(
+    """
+    scalar Date
+
+    type PrecomputedEntry {
+        id: String!
+        skeletonSegmentId: Int
+        version: Int
+        generatedAt: Date
+        reconstructionId: String
+    }
+
+    type Soma {
+        x: Float
+        y: Float
+        z: Float
+        allenId: Int
+    }
+
+    type Sample {
+        genotype: String
+        strain: String
+    }
+
+    type ReconstructionHeader {
+        id: String
+        idString: String
+        DOI: String
+        soma: Soma
+        sample: Sample
+    }
+
+    type Node {
+        x: Float
+        y: Float
+        z: Float
+        radius: Float
+        sampleNumber: Int
+        parentNumber: Int
+        allenId: Int
+        structureIdentifier: Int
+    }
+
+    type ChunkInfo {
+        totalCount: Int
+        offset: Int
+        limit: Int
+        hasMore: Boolean
+    }
+
+    input ReconstructionDataChunkedInput {
+        parts: [String]
+        axonOffset: Int
+        axonLimit: Int
+        dendriteOffset: Int
+        dendriteLimit: Int
+    }
+
+    type ReconstructionDataChunked {
+        header: ReconstructionHeader
+        axon: [Node]
+        axonChunkInfo: ChunkInfo
+        dendrite: [Node]
+        dendriteChunkInfo: ChunkInfo
+    }
+
+    type Query {
+        pendingPrecomputed: [PrecomputedEntry!]!
+        reconstructionDataChunked(id: String!, input: ReconstructionDataChunkedInput): ReconstructionDataChunked
+    }
+
+    type Mutation {
+        updatePrecomputed(id: String!, version: Int!, generatedAt: Date!): PrecomputedEntry
+    }
+    """
+)
+
+_Part = Union[SyntheticTree, List[dict]]
+
+
+@dataclass
+class FakeServiceOptions:
+    """
+    `latency` seconds are added to every request, plus a uniformly distributed extra of up to `jitter` seconds.  A
+    fraction `error_rate` of requests fail with `error_status`.  `page_limit` caps the nodes returned per part per
+    request regardless of the limit asked for, as a service configured with a smaller maximum page would.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    page_limit: Optional[int] = None
+    seed: int = 0
+
+
+@dataclass
+class _Reconstruction:
+    header: dict
+    axon: _Part
+    dendrite: _Part
+
+
+@dataclass
+class FakeServiceStatistics:
+    requests: int = 0
+    errors: int = 0
+    nodes_served: int = 0
+    operations: Dict[str, int] = field(default_factory=dict)
+
+
+class FakeNmcpService:
+    """
+    In-memory reconstructions and precomputed entries behind a GraphQL endpoint.  An entry is pending until it is
+    updated with a `generatedAt`, either as generated (version >= 0) or failed (version -1).
+    """
+
+    def __init__(self, options: FakeServiceOptions = None):
+        self.options = options or FakeServiceOptions()
+        self.statistics = FakeServiceStatistics()
+
+        self._reconstructions: Dict[str, _Reconstruction] = dict()
+        self._entries: Dict[str, dict] = dict()
+        self._lock = threading.Lock()
+        self._random = random.Random(self.options.seed)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("the service has not been started")
+
+        host, port = self._server.server_address[:2]
+
+        return f"http://{host}:{port}/graphql"
+
+    def add_neuron(self, neuron: Union[SyntheticNeuron, dict], skeleton_segment_id: int,
+                   reconstruction_id: str = None, version: Optional[int] = None) -> str:
+        """
+        Serve a reconstruction, either synthetic or in the layout of an entry of `neurons` in the JSON export, and add
+        a pending precomputed entry for it with source `version`.  Adding an existing reconstruction id again replaces
+        the data served for it, as an update of the reconstruction would.  Returns the entry id.
+        """
+        reconstruction_id = reconstruction_id or str(uuid.uuid4())
+
+        if isinstance(neuron, SyntheticNeuron):
+            header = neuron.as_header()
+            axon, dendrite = neuron.axon, neuron.dendrite
+        else:
+            header = {key: neuron.get(key) for key in ("idString", "DOI", "soma", "sample")}
+            axon, dendrite = neuron.get("axon") or [], neuron.get("dendrite") or []
+
+        header["id"] = reconstruction_id
+
+        entry_id = str(uuid.uuid4())
+
+        with self._lock:
+            self._reconstructions[reconstruction_id] = _Reconstruction(header, axon, dendrite)
+            self._entries[entry_id] = {"id": entry_id, "skeletonSegmentId": skeleton_segment_id, "version": version,
+                                       "generatedAt": None, "reconstructionId": reconstruction_id}
+
+        return entry_id
+
+    def add_json_file(self, path: str, first_skeleton_segment_id: int = 1) -> List[str]:
+        with open(path) as f:
+            neurons = json.load(f)["neurons"]
+
+        return [self.add_neuron(neuron, first_skeleton_segment_id + index) for index, neuron in enumerate(neurons)]
+
+    def add_synthetic(self, count: int, node_count: int, seed: int = 0,
+                      first_skeleton_segment_id: int = 1) -> List[str]:
+        """Add `count` synthetic neurons of `node_count` nodes each."""
+        return [self.add_neuron(synthetic_neuron(node_count, seed=seed + index, id_string=f"N{index + 1:03d}-SY"),
+                                first_skeleton_segment_id + index)
+                for index in range(count)]
+
+    def entry(self, entry_id: str) -> dict:
+        with self._lock:
+            return dict(self._entries[entry_id])
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for e in self._entries.values() if e["generatedAt"] is None)
+
+    def execute(self, query: str, variables: dict = None, operation_name: str = None) -> dict:
+        """Run a GraphQL request against the in-memory state, without latency or injected errors."""
+        root = _Root(self)
+
+        result = graphql_sync(_schema, query, root_value=root, variable_values=variables,
+                              operation_name=operation_name)
+
+        # Node lists are left out of execution and added here; graphql-core completes every field of every node
+        # otherwise, which costs far more than building the page.
+        if result.data is not None:
+            for (response_key, part), (nodes, fields) in root.node_lists.items():
+                if result.data.get(response_key) is not None:
+                    result.data[response_key][part] = [{f: n[f] for f in fields} for n in nodes]
+
+        response = {"data": result.data}
+
+        if result.errors:
+            response["errors"] = [e.formatted for e in result.errors]
+
+        return response
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeNmcpService":
+        """Serve from a background thread.  Port 0 picks a free port; see `url`."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+                status, response = service._handle(body)
+
+                data = response.encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        logger.info(f"fake NMCP service at {self.url}")
+
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeNmcpService":
+        return self.start() if self._server is None else self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _handle(self, body: bytes):
+        with self._lock:
+            self.statistics.requests += 1
+            delay = self.options.latency + self._random.uniform(0, self.options.jitter)
+            fail = self._random.random() < self.options.error_rate
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            with self._lock:
+                self.statistics.errors += 1
+            return self.options.error_status, json.dumps({"errors": [{"message": "injected failure"}]})
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, json.dumps({"errors": [{"message": "request body is not JSON"}]})
+
+        response = self.execute(request.get("query", ""), request.get("variables"), request.get("operationName"))
+
+        return 200, json.dumps(response)
+
+    def _count(self, operation: str, nodes: int = 0):
+        with self._lock:
+            self.statistics.operations[operation] = self.statistics.operations.get(operation, 0) + 1
+            self.statistics.nodes_served += nodes
+
+    def _pending(self) -> List[dict]:
+        with self._lock:
+            return [dict(e) for e in self._entries.values() if e["generatedAt"] is None]
+
+    def _update(self, entry_id: str, version: int, generated_at) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return None
+            entry["version"] = version
+            entry["generatedAt"] = generated_at
+            return dict(entry)
+
+    def _chunk(self, reconstruction_id: str, arguments: Optional[dict]) -> Optional[tuple]:
+        """The response for one reconstruction with node lists returned separately, by part."""
+        with self._lock:
+            reconstruction = self._reconstructions.get(reconstruction_id)
+
+        if reconstruction is None:
+            return None
+
+        arguments = arguments or {}
+        parts = arguments.get("parts") or ["header", "axon", "dendrite"]
+
+        result = {"header": reconstruction.header if "header" in parts else None}
+        node_lists = dict()
+
+        for name in ("axon", "dendrite"):
+            if name in parts:
+                node_lists[name], info = self._page(getattr(reconstruction, name), arguments.get(f"{name}Offset"),
+                                                    arguments.get(f"{name}Limit"))
+            else:
+                info = None
+            result[name] = None
+            result[f"{name}ChunkInfo"] = info
+
+        return result, node_lists
+
+    def _page(self, part: _Part, offset: Optional[int], limit: Optional[int]):
+        total = len(part)
+        offset = offset or 0
+
+        if limit is None:
+            limit = total
+        if self.options.page_limit is not None:
+            limit = min(limit, self.options.page_limit)
+
+        stop = min(offset + limit, total)
+
+        if isinstance(part, SyntheticTree):
+            nodes = part.nodes(offset, stop) if offset < stop else []
+        else:
+            nodes = part[offset:stop]
+
+        self._count("pages", len(nodes))
+
+        return nodes, {"totalCount": total, "offset": offset, "limit": limit, "hasMore": stop < total}
+
+
+class _Root:
+    """Root value whose methods resolve the top-level query and mutation fields."""
+
+    def __init__(self, service: FakeNmcpService):
+        self._service = service
+        # (response key, part) -> (nodes, selected node fields), for `FakeNmcpService.execute` to add.
+        self.node_lists: Dict[tuple, tuple] = dict()
+
+    def pendingPrecomputed(self, info):
+        self._service._count("pendingPrecomputed")
+        return self._service._pending()
+
+    def reconstructionDataChunked(self, info, id, input=None):
+        self._service._count("reconstructionDataChunked")
+
+        chunk = self._service._chunk(id, input)
+
+        if chunk is None:
+            return None
+
+        result, node_lists = chunk
+
+        for selection in info.field_nodes[0].selection_set.selections:
+            part = selection.name.value
+            if part in node_lists:
+                fields = [f.name.value for f in selection.selection_set.selections]
+                self.node_lists[(info.path.key, part)] = (node_lists[part], fields)
+                result[part] = []
+
+        return result
+
+    def updatePrecomputed(self, info, id, version, generatedAt):
+        self._service._count("updatePrecomputed")
+        return self._service._update(id, version, generatedAt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9671)
+    parser.add_argument("--fixture", action="append", default=[], help="JSON export file to serve (repeatable)")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic neurons to serve")
+    parser.add_argument("--nodes", type=int, default=50000, help="nodes per synthetic neuron")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--page-limit", type=int, help="maximum nodes returned per part per request")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = FakeNmcpService(FakeServiceOptions(args.latency, args.jitter, args.error_rate,
+                                                 page_limit=args.page_limit, seed=args.seed))
+
+    next_id = 1
+    for path in args.fixture:
+        next_id += len(service.add_json_file(path, next_id))
+
+    service.add_synthetic(args.synthetic, args.nodes, args.seed, next_id)
+
+    service.start(args.host, args.port)
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from typing import List
+
+import nmcp.precomputed.segment_tag_property as segment_tag_property
+
+
+class StubStructureTree:
+    """
+    Offline replacement for the Allen structure tree used to name soma locations.  Every id resolves to a structure
+    with a generated acronym and name.
+    """
+
+    def get_structures_by_id(self, structure_ids: List[int]) -> List[dict]:
+        return [{"id": s, "acronym": f"S{s}", "name": f"structure {s}"} for s in structure_ids]
+
+
+@contextmanager
+def stub_structure_tree():
+    """Resolve soma structures with `StubStructureTree` for the enclosed block rather than downloading the tree."""
+    previous = segment_tag_property._structure_id_lookup
+
+    segment_tag_property._structure_id_lookup = StubStructureTree()
+
+    try:
+        yield segment_tag_property._structure_id_lookup
+    finally:
+        segment_tag_property._structure_id_lookup = previous
@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+# Compartment values of `structureIdentifier`.
+SOMA = 1
+AXON = 2
+DENDRITE = 3
+
+_SOMA_POSITION = (6600.0, 4000.0, 5700.0)
+
+
+@dataclass
+class SyntheticTree:
+    """
+    One part (axon or dendrite) of a synthetic reconstruction as columns.  Row 0 is the soma.  Sample numbers are row
+    index + 1 and every parent precedes its child, as in the service data.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    radius: np.ndarray
+    parent: np.ndarray
+    structure: np.ndarray
+    allen_id: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def nodes(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Rows `start` to `stop` as the node dictionaries used by the JSON files and the GraphQL service."""
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        columns = zip(range(start + 1, stop + 1), self.structure[start:stop].tolist(), self.x[start:stop].tolist(),
+                      self.y[start:stop].tolist(), self.z[start:stop].tolist(), self.radius[start:stop].tolist(),
+                      self.parent[start:stop].tolist(), self.allen_id[start:stop].tolist())
+
+        return [{"sampleNumber": sample, "structureIdentifier": structure, "x": x, "y": y, "z": z, "radius": radius,
+                 "parentNumber": parent, "allenId": allen_id}
+                for sample, structure, x, y, z, radius, parent, allen_id in columns]
+
+    def pages(self, page_size: int) -> Iterator[List[dict]]:
+        """Nodes in chunks of `page_size`, converted one page at a time."""
+        for start in range(0, len(self), page_size):
+            yield self.nodes(start, start + page_size)
+
+
+@dataclass
+class SyntheticNeuron:
+    id_string: str
+    soma_allen_id: int
+    axon: SyntheticTree
+    dendrite: SyntheticTree
+
+    @property
+    def node_count(self) -> int:
+        return len(self.axon) + len(self.dendrite)
+
+    def as_header(self) -> dict:
+        """Everything but the nodes."""
+        x, y, z = _SOMA_POSITION
+
+        return {
+            "idString": self.id_string,
+            "DOI": None,
+            "sample": {"strain": "synthetic"},
+            "label": None,
+            "soma": {"x": x, "y": y, "z": z, "allenId": self.soma_allen_id}
+        }
+
+    def as_dict(self) -> dict:
+        """The neuron in the layout of an entry of `neurons` in the JSON export."""
+        return {**self.as_header(), "axon": self.axon.nodes(), "dendrite": self.dendrite.nodes()}
+
+
+def synthetic_tree(node_count: int, structure: int, seed: int = 0, mean_segment_length: float = 40.0,
+                   step: float = 2.5, allen_ids: Optional[np.ndarray] = None) -> SyntheticTree:
+    """
+    A random branching tree of `node_count` nodes rooted at the soma.  Branches are smoothed random walks with
+    geometrically distributed lengths, each starting from a randomly chosen existing node, which gives the long
+    unbranched runs and scattered branch points of traced neurites.
+    """
+    if node_count < 1:
+        raise ValueError("a tree has at least the soma node")
+
+    rng = np.random.default_rng(seed)
+
+    if allen_ids is None:
+        allen_ids = np.array([315, 313, 549, 1097, 512, 698, 477, 803], dtype=np.int64)
+
+    parent = np.empty(node_count, dtype=np.int64)
+    parent[0] = -1
+
+    # Per-node unit steps, smoothed so each branch follows a slowly turning direction.
+    directions = rng.normal(size=(node_count, 3))
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    position = np.empty((node_count, 3), dtype=np.float64)
+    position[0] = _SOMA_POSITION
+
+    region = np.empty(node_count, dtype=np.int64)
+    region[0] = allen_ids[0]
+
+    start = 1
+
+    while start < node_count:
+        length = min(int(rng.geometric(1.0 / mean_segment_length)), node_count - start)
+        stop = start + length
+
+        # Sample numbers are 1-based; a branch grows from any earlier node.
+        origin = int(rng.integers(0, start))
+
+        parent[start] = origin + 1
+        parent[start + 1:stop] = np.arange(start + 1, stop)
+
+        heading = rng.normal(size=3)
+        heading = heading / np.linalg.norm(heading)
+        steps = 0.8 * heading + 0.2 * directions[start:stop]
+
+        position[start:stop] = position[origin] + np.cumsum(steps * step, axis=0)
+
+        region[start:stop] = allen_ids[int(rng.integers(0, len(allen_ids)))]
+
+        start = stop
+
+    radius = np.round(rng.uniform(0.5, 2.5, size=node_count), 2)
+    radius[0] = 5.0
+
+    compartment = np.full(node_count, structure, dtype=np.int64)
+    compartment[0] = SOMA
+
+    return SyntheticTree(x=position[:, 0], y=position[:, 1], z=position[:, 2], radius=radius, parent=parent,
+                         structure=compartment, allen_id=region)
+
+
+def synthetic_neuron(node_count: int, seed: int = 0, axon_fraction: float = 0.85,
+                     id_string: str = "N001-000000-SY") -> SyntheticNeuron:
+    """
+    A synthetic reconstruction with about `node_count` nodes split between axon and dendrite.  The same seed always
+    produces the same neuron.
+    """
+    axon_count = max(1, int(node_count * axon_fraction))
+    dendrite_count = max(1, node_count - axon_count)
+
+    axon = synthetic_tree(axon_count, AXON, seed=seed)
+    dendrite = synthetic_tree(dendrite_count, DENDRITE, seed=seed + 1, mean_segment_length=15.0)
+
+    return SyntheticNeuron(id_string=id_string, soma_allen_id=int(axon.allen_id[0]), axon=axon, dendrite=dendrite)
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+
+from nmcp import create_from_json_files, ingest_json_files, list_skeletons
+from nmcp.testing import synthetic_neuron, stub_structure_tree
+
+
+def _write_neuron_files(directory: str) -> list:
+    paths = list()
+
+    for index, id_string in enumerate(["N011-000000-SY", "N012-000000-SY", "N013-000000-SY"]):
+        path = os.path.join(directory, f"{id_string}.json")
+        with open(path, "w") as f:
+            json.dump({"neurons": [synthetic_neuron(400, seed=index, id_string=id_string).as_dict()]}, f)
+        paths.append(path)
+
+    return paths
+
+
+def _read(location: str, key: str) -> bytes:
+    with open(os.path.join(location[len("file://"):], key), "rb") as f:
+        return f.read()
+
+
+def test_ingest_json_files_matches_serial():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = _write_neuron_files(temp_dir)
+
+        serial = f"file://{temp_dir}/serial"
+        bulk = f"file://{temp_dir}/bulk"
+
+        with stub_structure_tree():
+            create_from_json_files(paths, serial)
+            ingested = ingest_json_files(paths, bulk, processes=2, upload_concurrency=2)
+
+        assert ingested == {bulk: [11, 12, 13]}
+        assert list_skeletons(bulk) == [11, 12, 13]
+
+        for skeleton_id in (11, 12, 13):
+            assert _read(bulk, f"skeleton/{skeleton_id}") == _read(serial, f"skeleton/{skeleton_id}")
+
+        assert json.loads(_read(bulk, "segment_properties/info")) == json.loads(_read(serial, "segment_properties/info"))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_ingest_json_files_variants_and_failures():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = _write_neuron_files(temp_dir)
+
+        unreadable = os.path.join(temp_dir, "broken.json")
+        with open(unreadable, "w") as f:
+            f.write("{")
+
+        unsupported = os.path.join(temp_dir, "unsupported.json")
+        with open(unsupported, "w") as f:
+            json.dump({"neurons": [synthetic_neuron(50, id_string="unsupported").as_dict()]}, f)
+
+        output = f"file://{temp_dir}/output"
+
+        with stub_structure_tree():
+            ingested = ingest_json_files(paths + [unreadable, unsupported], output, variants=True, processes=2)
+
+        assert ingested == {f"{output}/{variant}": [11, 12, 13] for variant in ("full", "axon", "dendrite")}
+
+        for variant in ("full", "axon", "dendrite"):
+            assert list_skeletons(f"{output}/{variant}") == [11, 12, 13]
+
+        # The variants hold different parts of the same neurons.
+        full, axon, dendrite = (_read(f"{output}/{variant}", "skeleton/11") for variant in ("full", "axon", "dendrite"))
+        assert len(axon) < len(full) and len(dendrite) < len(full)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_ingest_json_files_unchanged():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = _write_neuron_files(temp_dir)
+
+        output = f"file://{temp_dir}/output"
+
+        with stub_structure_tree():
+            ingest_json_files(paths, output, processes=1)
+
+            for name in os.listdir(os.path.join(temp_dir, "output", "skeleton")):
+                os.utime(os.path.join(temp_dir, "output", "skeleton", name), ns=(0, 0))
+
+            # The second neuron changes; the others are published as they are.
+            with open(paths[1], "w") as f:
+                json.dump({"neurons": [synthetic_neuron(500, seed=7, id_string="N012-000000-SY").as_dict()]}, f)
+
+            ingested = ingest_json_files(paths, output, processes=1)
+
+        assert ingested == {output: [11, 12, 13]}
+
+        written = {skeleton_id: os.stat(os.path.join(temp_dir, "output", "skeleton", str(skeleton_id))).st_mtime_ns != 0
+                   for skeleton_id in (11, 12, 13)}
+
+        assert written == {11: False, 12: True, 13: False}
+    finally:
+        shutil.rmtree(temp_dir)
@@ -3,7 +3,11 @@ import os
 import shutil
 import tempfile
 
-from nmcp import extract_neuron_properties, create_from_data, SkeletonComponents
+from nmcp import extract_neuron_properties, create_from_data, SkeletonComponents, SegmentInfoStore, upload_skeletons
+from nmcp.precomputed.nmcp_precomputed import _create_dataset_info
+from nmcp.precomputed.nmcp_skeleton import create_skeleton, merge_components
+from nmcp.instrumentation import metrics
+from nmcp.testing import synthetic_neuron, stub_structure_tree
 
 from test_utl import verify_precomputed_file
 
@@ -66,6 +70,85 @@ def test_incremental_chunked():
         shutil.rmtree(temp_dir)
 
 
+def test_create_unchanged():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        neuron = synthetic_neuron(2000, seed=3).as_dict()
+
+        properties = extract_neuron_properties(neuron)
+
+        axon = SkeletonComponents.create(neuron["axon"])
+        dendrite = SkeletonComponents.create(neuron["dendrite"])
+
+        location = f"file://{temp_dir}"
+        skeleton_path = os.path.join(temp_dir, "skeleton", "15")
+        state_path = os.path.join(temp_dir, "segment_properties", "info.pickle")
+
+        def published() -> bool:
+            # Whether either file was written since the last call.
+            written = os.stat(skeleton_path).st_mtime_ns != 0 or os.stat(state_path).st_mtime_ns != 0
+            os.utime(skeleton_path, ns=(0, 0))
+            os.utime(state_path, ns=(0, 0))
+            return written
+
+        with stub_structure_tree():
+            create_from_data(axon, dendrite, properties, location, 15)
+            assert published()
+
+            content_hash = SegmentInfoStore(location).content_hash(15)
+            assert content_hash is not None
+
+            unchanged = metrics.skeletons_unchanged_total.value()
+
+            create_from_data(axon, dendrite, properties, location, 15)
+            assert not published()
+            assert metrics.skeletons_unchanged_total.value() == unchanged + 1
+
+            # A change to the properties or to the skeleton is published.
+            create_from_data(axon, dendrite, properties._replace(strain="C57BL/6J"), location, 15)
+            assert published()
+
+            create_from_data(axon, None, properties._replace(strain="C57BL/6J"), location, 15)
+            assert published()
+            assert SegmentInfoStore(location).content_hash(15) not in (None, content_hash)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_upload_skeletons_matches_cloudvolume():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        skeletons = list()
+
+        for skeleton_id in (4, 5):
+            neuron = synthetic_neuron(2000, seed=skeleton_id)
+            skeletons.append((skeleton_id, SkeletonComponents.create(neuron.axon.nodes()),
+                              SkeletonComponents.create(neuron.dendrite.nodes())))
+
+        cv = _create_dataset_info(f"file://{temp_dir}/cloudvolume")
+        cv.skeleton.upload([create_skeleton(*skeleton) for skeleton in skeletons])
+
+        cv = _create_dataset_info(f"file://{temp_dir}/native")
+        written = upload_skeletons(f"file://{temp_dir}/native",
+                                   [(skeleton_id, merge_components(axon, dendrite))
+                                    for skeleton_id, axon, dendrite in skeletons])
+
+        assert written == sum(os.path.getsize(os.path.join(temp_dir, "native", "skeleton", str(skeleton_id)))
+                              for skeleton_id, _, _ in skeletons)
+
+        for skeleton_id, axon, dendrite in skeletons:
+            with open(os.path.join(temp_dir, "cloudvolume", "skeleton", str(skeleton_id)), "rb") as f:
+                expected = f.read()
+            with open(os.path.join(temp_dir, "native", "skeleton", str(skeleton_id)), "rb") as f:
+                assert f.read() == expected
+
+            assert len(cv.skeleton.get(skeleton_id).vertices) == len(merge_components(axon, dendrite).vertices)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
 if __name__ == "__main__":
     test_create_incremental()
     test_incremental_chunked()
+    test_create_unchanged()
+    test_upload_skeletons_matches_cloudvolume()
@@ -1,9 +1,12 @@
 import json
 import os
+import tempfile
 
 import numpy
 
-from precomputed.nmcp_skeleton import create_skeleton_components, SkeletonComponents
+from precomputed.nmcp_skeleton import create_skeleton_components, SkeletonComponents, create_skeleton, \
+    skeleton_content_hash, merge_components, encode_skeleton, encoded_skeleton_size
+from nmcp.testing import synthetic_neuron
 
 
 def verify_contents(components: SkeletonComponents, size, compartment: int | None = None):
@@ -35,5 +38,64 @@ def test_create_skeleton_components():
     verify_contents(output, 6)
 
 
+def test_spilled_skeleton_components():
+    neuron = synthetic_neuron(3000, seed=5)
+    axon_nodes = neuron.axon.nodes()
+    dendrite_nodes = neuron.dendrite.nodes()
+
+    axon = SkeletonComponents.create(axon_nodes[:1000])
+    dendrite = SkeletonComponents.create(dendrite_nodes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        spilled = SkeletonComponents.create(axon_nodes[:1000]).spill(directory)
+
+        assert isinstance(spilled.vertices, numpy.memmap)
+        assert spilled.in_memory_bytes == 0
+
+        # Appends after spilling are written to the files.
+        axon.append(axon_nodes[1000:])
+        spilled.append(axon_nodes[1000:])
+
+        assert isinstance(spilled.vertices, numpy.memmap)
+
+        merged = axon.concat(dendrite)
+        spilled_merged = spilled.concat(SkeletonComponents.create(dendrite_nodes))
+
+        assert spilled_merged.spill_directory is not None
+
+        for expected, actual in ((axon, spilled), (merged, spilled_merged)):
+            for name in ("vertices", "edges", "radii", "ccf_ids", "compartments"):
+                assert getattr(actual, name).dtype == getattr(expected, name).dtype
+                assert numpy.array_equal(getattr(actual, name), getattr(expected, name))
+
+        assert skeleton_content_hash(create_skeleton(1, spilled, dendrite)) == \
+               skeleton_content_hash(create_skeleton(1, axon, dendrite))
+
+
+def test_encode_skeleton_matches_cloudvolume():
+    neuron = synthetic_neuron(4000, seed=7)
+
+    axon = SkeletonComponents.create(neuron.axon.nodes())
+    dendrite = SkeletonComponents.create(neuron.dendrite.nodes())
+
+    with tempfile.TemporaryDirectory() as directory:
+        spilled = SkeletonComponents.create(neuron.axon.nodes()).spill(directory)
+
+        # A single node has no edges, as for a soma-only dendrite.
+        single = SkeletonComponents.create(neuron.dendrite.nodes()[:1])
+
+        cases = ((axon, dendrite), (axon, None), (None, dendrite), (spilled, dendrite), (None, single), (single, None),
+                 (single, single))
+
+        for parts in cases:
+            expected = create_skeleton(9, *parts).to_precomputed()
+            merged = merge_components(*parts)
+
+            assert encode_skeleton(merged) == expected
+            assert encoded_skeleton_size(merged) == len(expected)
+            # Components hash as the Skeleton built from them does, so recorded hashes remain valid.
+            assert skeleton_content_hash(merged) == skeleton_content_hash(create_skeleton(9, *parts))
+
+
 if __name__ == '__main__':
     test_create_skeleton_components()
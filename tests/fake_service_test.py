@@ -0,0 +1,244 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from nmcp import RemoteDataClient, list_skeletons
+from nmcp import precomputed_worker
+from nmcp.testing import FakeNmcpService, FakeServiceOptions, synthetic_neuron, stub_structure_tree
+
+
+def _fixture(name: str) -> str:
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "fixtures", name))
+
+
+def test_fake_service_paging():
+    service = FakeNmcpService(FakeServiceOptions(page_limit=1000))
+
+    neuron = synthetic_neuron(4000, seed=2)
+    entry_id = service.add_neuron(neuron, 42, "reconstruction-1")
+
+    with service:
+        client = RemoteDataClient(service.url, "")
+
+        pending = client.find_pending()
+
+        assert len(pending) == 1
+        assert pending[0].id == entry_id
+        assert pending[0].skeletonSegmentId == 42
+        assert pending[0].reconstructionId == "reconstruction-1"
+
+        header = client.get_reconstruction_header("reconstruction-1")
+
+        assert header["idString"] == neuron.id_string
+        assert header["soma"]["allenId"] == neuron.soma_allen_id
+
+        # The service returns at most 1000 nodes per request; the client keeps paging while there are more.
+        axon = client.get_axon_chunks("reconstruction-1", chunk_size=2500, limit=2500)
+
+        assert len(axon["data"]) == 2500
+        assert axon["data"][2499]["sampleNumber"] == 2500
+
+        dendrite = client.get_dendrite_chunks("reconstruction-1")
+
+        assert len(dendrite["data"]) == len(neuron.dendrite)
+
+        assert client.mark_many([(entry_id, 1, 1000.0)]) == [entry_id]
+
+        assert service.pending_count() == 0
+        assert service.entry(entry_id)["version"] == 1
+        assert client.find_pending() == []
+
+    assert service.statistics.operations["updatePrecomputed"] == 1
+
+
+def test_fake_service_errors():
+    service = FakeNmcpService(FakeServiceOptions(error_rate=1.0))
+
+    service.add_neuron(synthetic_neuron(100), 1, "reconstruction-1")
+
+    with service:
+        client = RemoteDataClient(service.url, "")
+        client._client.transport.retry_backoff_factor = 0
+
+        assert client.get_reconstruction_header("reconstruction-1") is None
+
+    assert service.statistics.errors == service.statistics.requests
+    assert service.statistics.requests > 1
+
+
+def test_worker_against_fake_service():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService(FakeServiceOptions(page_limit=300))
+
+        service.add_json_file(_fixture("mini.json"), 11)
+        service.add_neuron(synthetic_neuron(2000, seed=3), 12)
+
+        output = f"file://{temp_dir}"
+
+        with service, stub_structure_tree():
+            context = precomputed_worker.create_worker_context(service.url, "", output)
+
+            assert precomputed_worker.process_available(context) == 2
+
+            assert service.pending_count() == 0
+
+        for variant in ("full", "axon", "dendrite"):
+            assert sorted(list_skeletons(f"{output}/{variant}")) == [11, 12]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_worker_source_versions():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService()
+
+        older = service.add_neuron(synthetic_neuron(1000, seed=1), 21, "reconstruction-1", version=1)
+        latest = service.add_neuron(synthetic_neuron(1200, seed=2), 21, "reconstruction-1", version=2)
+
+        output = f"file://{temp_dir}"
+
+        with service, stub_structure_tree():
+            context = precomputed_worker.create_worker_context(service.url, "", output, properties_batch=1)
+
+            # Only the latest version is generated, and the entry it supersedes is reported with it.
+            assert precomputed_worker.process_available(context) == 1
+            # The reconstruction's nodes, and one of each part for the size probe.
+            assert service.statistics.nodes_served == 1202
+            assert (service.entry(older)["version"], service.entry(latest)["version"]) == (2, 2)
+
+            for writer in context.writers.values():
+                assert writer.source_version(21) == 2
+
+            # The same version queued again is not fetched.
+            again = service.add_neuron(synthetic_neuron(1200, seed=2), 21, "reconstruction-1", version=2)
+            requests = service.statistics.requests
+
+            precomputed_worker.process_available(context)
+
+            assert service.entry(again)["version"] == 2
+            # Only the pending query and the status update.
+            assert service.statistics.requests == requests + 2
+
+            # A newer version queued while a job is fetching cancels the job; the newer one is generated instead.
+            current = service.add_neuron(synthetic_neuron(1000, seed=3), 21, "reconstruction-1", version=3)
+            context.pending_versions.interval = 0
+
+            fetch = RemoteDataClient.get_axon_chunks
+            newer = list()
+
+            def get_axon_chunks(client, *args, **kwargs):
+                if len(newer) == 0:
+                    newer.append(service.add_neuron(synthetic_neuron(1500, seed=4), 21, "reconstruction-1", version=4))
+                return fetch(client, *args, **kwargs)
+
+            # Jobs run on clones of the context's client.
+            with patch.object(RemoteDataClient, "get_axon_chunks", get_axon_chunks):
+                precomputed_worker.process_available(context)
+
+            assert service.entry(current)["generatedAt"] is None
+
+            precomputed_worker.process_available(context)
+
+            assert service.pending_count() == 0
+            assert (service.entry(current)["version"], service.entry(newer[0])["version"]) == (4, 4)
+            assert context.writers["full"].source_version(21) == 4
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_worker_shortest_first():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService(FakeServiceOptions(page_limit=1000))
+
+        for index, nodes in enumerate([3000, 400, 1800, 900]):
+            service.add_neuron(synthetic_neuron(nodes, seed=index), 30 + index, f"reconstruction-{index}")
+
+        with service, stub_structure_tree():
+            assert RemoteDataClient(service.url, "").get_reconstruction_size("reconstruction-0") == 3000
+            assert RemoteDataClient(service.url, "").get_reconstruction_size("missing") is None
+
+            fetch = RemoteDataClient.get_axon_chunks
+            fetched = list()
+
+            def get_axon_chunks(client, reconstruction_id, *args, **kwargs):
+                if reconstruction_id not in fetched:
+                    fetched.append(reconstruction_id)
+                return fetch(client, reconstruction_id, *args, **kwargs)
+
+            # A single lane takes the smallest reconstructions first.
+            schedule = precomputed_worker.WorkSchedule(large_nodes=2000, large_concurrency=0)
+            context = precomputed_worker.create_worker_context(service.url, "", f"file://{temp_dir}/single",
+                                                               properties_batch=1, schedule=schedule)
+
+            with patch.object(RemoteDataClient, "get_axon_chunks", get_axon_chunks):
+                assert precomputed_worker.process_available(context) == 4
+
+            assert fetched == ["reconstruction-1", "reconstruction-3", "reconstruction-2", "reconstruction-0"]
+            assert service.pending_count() == 0
+
+            for index, nodes in enumerate([3000, 400, 1800, 900]):
+                service.add_neuron(synthetic_neuron(nodes, seed=index), 30 + index, f"reconstruction-{index}", version=2)
+
+            # The large reconstruction is processed in its own lane alongside the others.
+            schedule = precomputed_worker.WorkSchedule(large_nodes=2000, fast_concurrency=2, large_concurrency=1)
+            context = precomputed_worker.create_worker_context(service.url, "", f"file://{temp_dir}/lanes",
+                                                               properties_batch=1, schedule=schedule)
+
+            assert precomputed_worker.process_available(context) == 4
+            assert service.pending_count() == 0
+
+            # Profilers observe the whole process, so profiled jobs run one at a time.
+            profiling = precomputed_worker.ProfilingOptions(output_dir=os.path.join(temp_dir, "profiles"))
+            context = precomputed_worker.create_worker_context(service.url, "", f"file://{temp_dir}/profiled",
+                                                               profiling=profiling, schedule=schedule)
+
+            assert context.schedule == precomputed_worker.WorkSchedule(large_nodes=2000, fast_concurrency=1,
+                                                                       large_concurrency=0)
+
+        for variant in ("full", "axon", "dendrite"):
+            assert list_skeletons(f"file://{temp_dir}/lanes/{variant}") == [30, 31, 32, 33]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_worker_memory_budget():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService(FakeServiceOptions(page_limit=1000))
+
+        service.add_neuron(synthetic_neuron(6000, seed=6), 40, "reconstruction-1")
+
+        with service, stub_structure_tree():
+            spill_directory = os.path.join(temp_dir, "spill")
+            os.makedirs(spill_directory)
+
+            # Far less than the reconstruction takes in memory.
+            context = precomputed_worker.create_worker_context(service.url, "", f"file://{temp_dir}/spilled",
+                                                               properties_batch=1, memory_budget=64 << 10,
+                                                               spill_directory=spill_directory)
+
+            spilled = precomputed_worker.metrics.skeletons_spilled_total.value()
+
+            assert precomputed_worker.process_available(context) == 1
+            assert precomputed_worker.metrics.skeletons_spilled_total.value() > spilled
+            assert service.pending_count() == 0
+            # The spilled arrays are removed with the job.
+            assert os.listdir(spill_directory) == []
+
+            # The skeletons are those generated in memory.
+            service.add_neuron(synthetic_neuron(6000, seed=6), 40, "reconstruction-1")
+
+            context = precomputed_worker.create_worker_context(service.url, "", f"file://{temp_dir}/memory",
+                                                               properties_batch=1)
+
+            assert precomputed_worker.process_available(context) == 1
+
+        for variant in ("full", "axon", "dendrite"):
+            spilled = open(os.path.join(temp_dir, "spilled", variant, "skeleton", "40"), "rb").read()
+            assert spilled == open(os.path.join(temp_dir, "memory", variant, "skeleton", "40"), "rb").read()
+    finally:
+        shutil.rmtree(temp_dir)
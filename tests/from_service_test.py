@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from nmcp import RemoteDataClient, PrecomputedStatusQueue, list_skeletons
+from nmcp.precomputed import nmcp_precomputed
+from nmcp.from_service import BackfillItem, BackfillCheckpoint, backfill, read_backfill_items
+from nmcp.testing import FakeNmcpService, FakeServiceOptions, synthetic_neuron, stub_structure_tree
+
+
+def _checkpoint_records(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_backfill_pending_with_resume():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService(FakeServiceOptions(page_limit=500))
+
+        for index in range(4):
+            service.add_neuron(synthetic_neuron(1500, seed=index), 20 + index, f"reconstruction-{index}")
+
+        output = f"file://{temp_dir}/output"
+        checkpoint_path = os.path.join(temp_dir, "checkpoint.jsonl")
+
+        with service, stub_structure_tree():
+            client = RemoteDataClient(service.url, "")
+            items = [BackfillItem(p.reconstructionId, p.skeletonSegmentId, p.id) for p in client.find_pending()]
+
+            # The first run is interrupted after two reconstructions: only those are checkpointed.
+            checkpoint = BackfillCheckpoint(checkpoint_path)
+            counts = backfill(service.url, "", output, items[:2], checkpoint, concurrency=2, properties_batch=1,
+                              variants=True)
+            checkpoint.close()
+
+            assert counts == {"generated": 2, "failed": 0, "skipped": 0}
+
+            checkpoint = BackfillCheckpoint(checkpoint_path)
+            status = PrecomputedStatusQueue(client)
+            counts = backfill(service.url, "", output, items, checkpoint, status, concurrency=2, variants=True)
+            checkpoint.close()
+
+            assert counts == {"generated": 2, "failed": 0, "skipped": 2}
+            # Only the reconstructions processed by the resumed run are reported.
+            assert service.pending_count() == 2
+
+        for variant in ("full", "axon", "dendrite"):
+            assert list_skeletons(f"{output}/{variant}") == [20, 21, 22, 23]
+
+        records = _checkpoint_records(checkpoint_path)
+        assert sorted(r["reconstruction_id"] for r in records) == [f"reconstruction-{i}" for i in range(4)]
+        assert all(r["result"] == "generated" for r in records)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_backfill_explicit_ids():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService()
+
+        service.add_neuron(synthetic_neuron(800, id_string="N031-000000-SY"), 99, "reconstruction-a")
+        service.add_neuron(synthetic_neuron(800, seed=1), 32, "reconstruction-b")
+
+        ids_path = os.path.join(temp_dir, "ids.txt")
+        with open(ids_path, "w") as f:
+            f.write("# reconstruction [skeleton]\nreconstruction-a\nreconstruction-b 32\nmissing\n")
+
+        items = read_backfill_items(ids_path)
+
+        assert items == [BackfillItem("reconstruction-a"), BackfillItem("reconstruction-b", 32),
+                         BackfillItem("missing")]
+
+        output = f"file://{temp_dir}/output"
+        checkpoint_path = os.path.join(temp_dir, "checkpoint.jsonl")
+
+        with service, stub_structure_tree():
+            checkpoint = BackfillCheckpoint(checkpoint_path)
+            counts = backfill(service.url, "", output, items, checkpoint, variants=True)
+            checkpoint.close()
+
+        assert counts == {"generated": 2, "failed": 1, "skipped": 0}
+
+        # Without a skeleton id, the id comes from the reconstruction's idString.
+        assert list_skeletons(f"{output}/full") == [31, 32]
+
+        checkpoint = BackfillCheckpoint(checkpoint_path)
+        assert checkpoint.results == {"reconstruction-a": "generated", "reconstruction-b": "generated",
+                                      "missing": "failed"}
+        assert not checkpoint.is_generated("missing")
+        checkpoint.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_backfill_checkpoint_ignores_partial_line():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "checkpoint.jsonl")
+
+        with open(path, "w") as f:
+            f.write('{"reconstruction_id": "a", "result": "generated"}\n{"reconstruction_id": "b", "res')
+
+        checkpoint = BackfillCheckpoint(path)
+        checkpoint.record([("c", "failed")])
+        checkpoint.close()
+
+        assert checkpoint.results == {"a": "generated", "c": "failed"}
+        assert BackfillCheckpoint(path).results == {"a": "generated", "c": "failed"}
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_backfill_upload_failure_is_checkpointed():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService()
+
+        for index in range(2):
+            service.add_neuron(synthetic_neuron(600, seed=index), 50 + index, f"reconstruction-{index}")
+
+        output = f"file://{temp_dir}/output"
+        checkpoint_path = os.path.join(temp_dir, "checkpoint.jsonl")
+
+        upload = nmcp_precomputed.upload_skeletons
+
+        def failing_upload(cloud_location, skeletons):
+            skeletons = list(skeletons)
+            if any(skeleton_id == 51 for skeleton_id, _ in skeletons):
+                raise IOError("upload failed")
+            return upload(cloud_location, skeletons)
+
+        with service, stub_structure_tree():
+            items = [BackfillItem(f"reconstruction-{index}", 50 + index) for index in range(2)]
+
+            checkpoint = BackfillCheckpoint(checkpoint_path)
+            with patch.object(nmcp_precomputed, "upload_skeletons", failing_upload):
+                counts = backfill(service.url, "", output, items, checkpoint, variants=True)
+            checkpoint.close()
+
+            assert counts == {"generated": 1, "failed": 1, "skipped": 0}
+
+            checkpoint = BackfillCheckpoint(checkpoint_path)
+            assert checkpoint.results == {"reconstruction-0": "generated", "reconstruction-1": "failed"}
+
+            # The resumed backfill attempts the failed reconstruction again.
+            counts = backfill(service.url, "", output, items, checkpoint, variants=True)
+            checkpoint.close()
+
+            assert counts == {"generated": 1, "failed": 0, "skipped": 1}
+
+        assert list_skeletons(f"{output}/full") == [50, 51]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_backfill_single_dataset():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = FakeNmcpService()
+
+        service.add_neuron(synthetic_neuron(800, seed=2), 60, "reconstruction-0")
+
+        output = f"file://{temp_dir}/output"
+
+        with service, stub_structure_tree():
+            counts = backfill(service.url, "", output, [BackfillItem("reconstruction-0", 60)])
+
+        assert counts == {"generated": 1, "failed": 0, "skipped": 0}
+
+        # The full skeleton is written at the output location itself, as before variants were generated.
+        assert list_skeletons(output) == [60]
+        assert not os.path.exists(os.path.join(temp_dir, "output", "full"))
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Seconds allowed for importing what `list_skeletons.py` uses, well above the expected ~0.1 s so that slow CI hosts do
+# not fail while a regression to eager imports (several seconds) still does.
+_budget = float(os.environ.get("NMCP_IMPORT_BUDGET", 1.0))
+
+_heavy_modules = ("allensdk", "cloudvolume", "cloudfiles", "gql", "pandas", "requests", "graphql")
+
+_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _import_in_subprocess(statement: str) -> dict:
+    script = (f"import sys, time, json\n"
+              f"start = time.perf_counter()\n"
+              f"{statement}\n"
+              f"elapsed = time.perf_counter() - start\n"
+              f"print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))\n")
+
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=_root, check=True)
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _loaded(modules, name):
+    return any(m == name or m.startswith(f"{name}.") for m in modules)
+
+
+def test_import_nmcp_is_lazy():
+    result = _import_in_subprocess("import nmcp")
+
+    assert [m for m in _heavy_modules if _loaded(result["modules"], m)] == []
+
+
+@pytest.mark.parametrize("statement", ["from nmcp import list_skeletons", "from nmcp import remove_skeleton"])
+def test_list_and_remove_import_budget(statement):
+    result = _import_in_subprocess(statement)
+
+    assert [m for m in _heavy_modules if _loaded(result["modules"], m)] == []
+    assert result["seconds"] < _budget
+
+
+def test_client_import_does_not_load_precomputed():
+    result = _import_in_subprocess("from nmcp import RemoteDataClient")
+
+    assert _loaded(result["modules"], "gql")
+    assert not _loaded(result["modules"], "cloudvolume")
+    assert not _loaded(result["modules"], "allensdk")
+
+
+def test_lazy_attributes():
+    import nmcp
+
+    assert "list_skeletons" in dir(nmcp)
+
+    with pytest.raises(AttributeError):
+        getattr(nmcp, "not_exported")
@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+import tempfile
+
+from nmcp.instrumentation import JobRecord, JobRecordWriter, track_job, time_stage, job_records
+
+
+def test_job_record_written_once_per_job():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "jobs.jsonl")
+        writer = JobRecordWriter(path)
+
+        with track_job(JobRecord("recon-1", 7, "entry-1"), writer) as record:
+            with time_stage("fetch"):
+                job_records.add_page("axon", 25000)
+                job_records.add_page("axon", 100)
+                job_records.add_page("dendrite", 50)
+                job_records.add_bytes_fetched(1000)
+            with time_stage("upload"):
+                job_records.add_bytes_uploaded(400)
+            record.axon_nodes = 25100
+            record.dendrite_nodes = 50
+            record.result = "generated"
+
+        # Outside of a tracked job nothing is attributed.
+        job_records.add_bytes_fetched(5)
+
+        with track_job(JobRecord("recon-2"), writer):
+            pass
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+
+        assert len(records) == 2
+
+        first = records[0]
+        assert first["reconstruction_id"] == "recon-1"
+        assert first["skeleton_id"] == 7
+        assert first["result"] == "generated"
+        assert first["page_count"] == 3
+        assert first["pages"] == {"axon": [25000, 100], "dendrite": [50]}
+        assert first["bytes_fetched"] == 1000
+        assert first["bytes_uploaded"] == 400
+        assert set(first["stage_seconds"]) == {"fetch", "upload"}
+        assert first["wall_seconds"] >= first["stage_seconds"]["fetch"]
+        assert first["process_peak_rss_bytes"] > 0
+
+        assert records[1]["result"] == "failed"
+        assert records[1]["bytes_fetched"] == 0
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,97 @@
+import io
+import json
+
+import numpy
+import pytest
+
+from nmcp import read_neurons, SkeletonComponents
+from nmcp.precomputed.nmcp_skeleton import create_skeleton_components
+from nmcp.testing import synthetic_neuron
+
+_fields = ("vertices", "edges", "radii", "ccf_ids", "compartments")
+
+
+def _assert_same(expected: SkeletonComponents, actual: SkeletonComponents):
+    for name in _fields:
+        assert getattr(actual, name).dtype == getattr(expected, name).dtype
+        assert numpy.array_equal(getattr(actual, name), getattr(expected, name))
+
+
+def _export(neurons: list) -> str:
+    # Fields before and after the neurons, and whitespace between tokens, as a formatted export would have.
+    return json.dumps({"version": 2, "neurons": neurons, "comment": {"nested": [1, 2.5, None]}}, indent=1)
+
+
+def test_read_neurons_matches_json_load():
+    neurons = [synthetic_neuron(1200, seed=seed, id_string=f"N{seed + 1:03d}-000000-SY").as_dict() for seed in range(3)]
+    neurons[1]["dendrite"] = []
+    neurons[2]["axon"] = None
+
+    text = _export(neurons)
+
+    # Reads smaller than a node and batches that do not divide the node count exercise the buffer and batch edges.
+    streamed = list(read_neurons(io.StringIO(text), batch_size=97, read_size=13))
+
+    assert len(streamed) == 3
+
+    for neuron, result in zip(neurons, streamed):
+        axon, dendrite = create_skeleton_components(neuron)
+
+        assert result.header == {k: v for k, v in neuron.items() if k not in ("axon", "dendrite")}
+
+        for expected, actual in ((axon, result.axon), (dendrite, result.dendrite)):
+            if expected is None:
+                assert actual is None
+            else:
+                _assert_same(expected, actual)
+
+    assert streamed[0].node_count == len(neurons[0]["axon"]) + len(neurons[0]["dendrite"])
+
+
+def test_read_neurons_split_numbers():
+    neuron = synthetic_neuron(20, seed=3).as_dict()
+    neuron["depth"] = 12.5
+    neuron["scale"] = [1e+3, -1.25e-2, 3, 12.0]
+
+    # Without whitespace, a read that ends after "12.", "1e" or "1e+" leaves only part of a number in the buffer.
+    text = json.dumps({"version": 12.5, "neurons": [neuron], "comment": [12.5, 3, 1e+30]}, separators=(",", ":"))
+
+    for read_size in (1, 2, 3):
+        [result] = list(read_neurons(io.StringIO(text), read_size=read_size))
+
+        assert result.header == {k: v for k, v in neuron.items() if k not in ("axon", "dendrite")}
+        _assert_same(SkeletonComponents.create(neuron["axon"]), result.axon)
+
+
+def test_read_neurons_from_path(tmp_path):
+    neuron = synthetic_neuron(300).as_dict()
+
+    path = tmp_path / "neuron.json"
+    path.write_text(json.dumps({"neurons": [neuron]}, separators=(",", ":")))
+
+    [result] = list(read_neurons(str(path), batch_size=50))
+
+    _assert_same(SkeletonComponents.create(neuron["axon"]), result.axon)
+    assert result.header["idString"] == neuron["idString"]
+
+
+def test_batches_match_single_append():
+    nodes = synthetic_neuron(1000).as_dict()["axon"]
+
+    whole = SkeletonComponents.create(nodes)
+
+    # Only the root of the part, in the first batch, has no parent edge.
+    appended = SkeletonComponents()
+    for start in range(0, len(nodes), 300):
+        appended.append(nodes[start:start + 300])
+
+    _assert_same(whole, appended)
+    _assert_same(whole, SkeletonComponents.from_batches(nodes[start:start + 300] for start in range(0, len(nodes), 300)))
+
+    assert SkeletonComponents.from_batches([]) is None
+
+
+@pytest.mark.parametrize("text", ['{"neurons": [{"axon": [{"x": 1}', '{"neurons": [1 2]}', '["neurons"]'])
+def test_read_neurons_malformed(text):
+    with pytest.raises(ValueError):
+        list(read_neurons(io.StringIO(text)))
@@ -0,0 +1,45 @@
+import urllib.request
+
+from nmcp.instrumentation import MetricsRegistry, start_metrics_server
+
+
+def test_metrics_render():
+    registry = MetricsRegistry()
+
+    counter = registry.counter("test_nodes_total", "nodes")
+    counter.inc(5, part="axon")
+    counter.inc(2, part="axon")
+
+    histogram = registry.histogram("test_stage_seconds", "stages", buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="fetch")
+    histogram.observe(0.5, stage="fetch")
+
+    gauge = registry.gauge("test_pending", "pending")
+    gauge.set(3)
+
+    assert counter.value(part="axon") == 7
+    assert histogram.count(stage="fetch") == 2
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE test_nodes_total counter" in lines
+    assert 'test_nodes_total{part="axon"} 7' in lines
+    assert 'test_stage_seconds_bucket{stage="fetch",le="0.1"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="fetch",le="1"} 2' in lines
+    assert 'test_stage_seconds_bucket{stage="fetch",le="+Inf"} 2' in lines
+    assert 'test_stage_seconds_count{stage="fetch"} 2' in lines
+    assert "test_pending 3" in lines
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.counter("test_jobs_total", "jobs").inc(result="generated")
+
+    server = start_metrics_server(0, "127.0.0.1", registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode()
+
+        assert 'test_jobs_total{result="generated"} 1' in body
+    finally:
+        server.shutdown()
@@ -0,0 +1,113 @@
+import os
+
+from nmcp import RemoteDataClient, ReconstructionPageCache
+from nmcp.testing import FakeNmcpService, FakeServiceOptions, synthetic_neuron
+
+
+def _node(sample: int, allen_id=None) -> dict:
+    return {"x": sample + 0.1, "y": 2.5, "z": -3.25, "radius": 1.0, "sampleNumber": sample,
+            "parentNumber": sample - 1 if sample > 1 else -1, "allenId": allen_id, "structureIdentifier": 2}
+
+
+def test_page_cache_round_trip(tmp_path):
+    cache = ReconstructionPageCache(str(tmp_path))
+
+    nodes = [_node(1), _node(2, 315), _node(3, 0)]
+
+    assert cache.get("reconstruction/1", "axon", 0, 3, version=1) is None
+    assert cache.put("reconstruction/1", "axon", 0, 3, nodes, True, version=1)
+
+    assert cache.get("reconstruction/1", "axon", 0, 3, version=1) == (nodes, True)
+    # Another offset, limit, or part is another page.
+    assert cache.get("reconstruction/1", "axon", 3, 3, version=1) is None
+    assert cache.get("reconstruction/1", "dendrite", 0, 3, version=1) is None
+
+    # Pages of another source version are distinct.
+    assert cache.get("reconstruction/1", "axon", 0, 3, version=2) is None
+    assert cache.put("reconstruction/1", "axon", 0, 3, nodes[:1], False, version=2)
+    assert cache.get("reconstruction/1", "axon", 0, 3, version=2) == (nodes[:1], False)
+
+    # Pages of an unknown version, or whose nodes have other fields, are not cached.
+    assert not cache.put("reconstruction/1", "axon", 0, 3, nodes, True)
+    assert cache.get("reconstruction/1", "axon", 0, 3) is None
+    assert not cache.put("reconstruction/1", "axon", 3, 3, [{"x": 1.0}], False, version=1)
+
+    # A cache opened on the same directory finds the pages.
+    assert ReconstructionPageCache(str(tmp_path)).get("reconstruction/1", "axon", 0, 3, version=1) == (nodes, True)
+
+    cache.discard("reconstruction/1")
+
+    assert cache.get("reconstruction/1", "axon", 0, 3, version=1) is None
+    assert cache.size_bytes == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_page_cache_evicts_least_recently_used(tmp_path):
+    nodes = [_node(sample) for sample in range(1, 101)]
+
+    cache = ReconstructionPageCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("a", "axon", 0, 100, nodes, False, version=1)
+    page_bytes = cache.size_bytes
+
+    cache = ReconstructionPageCache(str(tmp_path), max_bytes=2 * page_bytes)
+    cache.put("b", "axon", 0, 100, nodes, False, version=1)
+
+    # Using "a" makes "b" the least recently used page.
+    assert cache.get("a", "axon", 0, 100, version=1) is not None
+
+    cache.put("c", "axon", 0, 100, nodes, False, version=1)
+
+    assert cache.size_bytes == 2 * page_bytes
+    assert cache.get("b", "axon", 0, 100, version=1) is None
+    assert cache.get("a", "axon", 0, 100, version=1) is not None
+    assert cache.get("c", "axon", 0, 100, version=1) is not None
+
+
+def test_page_cache_shared_directory(tmp_path):
+    nodes = [_node(1), _node(2)]
+
+    first = ReconstructionPageCache(str(tmp_path))
+    second = ReconstructionPageCache(str(tmp_path))
+
+    # A page written by another process after the cache was opened is found and counted.
+    first.put("a", "axon", 0, 2, nodes, False, version=1)
+
+    assert second.get("a", "axon", 0, 2, version=1) == (nodes, False)
+    assert second.size_bytes == first.size_bytes
+
+    # Discarding a reconstruction also removes the pages another process wrote.
+    first.put("a", "dendrite", 0, 2, nodes, False, version=1)
+    second.discard("a")
+
+    assert first.get("a", "dendrite", 0, 2, version=1) is None
+    assert second.size_bytes == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_client_reads_cached_pages(tmp_path):
+    service = FakeNmcpService(FakeServiceOptions(page_limit=1000))
+
+    neuron = synthetic_neuron(3000, seed=4)
+    service.add_neuron(neuron, 7, "reconstruction-1", version=3)
+
+    with service:
+        client = RemoteDataClient(service.url, "", ReconstructionPageCache(str(tmp_path)))
+
+        axon = client.get_axon_chunks("reconstruction-1", chunk_size=2500, version=3)
+        dendrite = client.get_dendrite_chunks("reconstruction-1", chunk_size=2500, version=3)
+
+        requests = service.statistics.requests
+
+        # A retry, by this or another client, is served from the cache.
+        retry = RemoteDataClient(service.url, "", ReconstructionPageCache(str(tmp_path)))
+
+        assert retry.get_axon_chunks("reconstruction-1", chunk_size=2500, version=3) == axon
+        assert retry.get_dendrite_chunks("reconstruction-1", chunk_size=2500, version=3) == dendrite
+        assert service.statistics.requests == requests
+
+        # Without a version, the pages could be those of an earlier source and are fetched.
+        assert retry.get_axon_chunks("reconstruction-1", chunk_size=2500) == axon
+        assert service.statistics.requests > requests
+
+    assert axon["data"] == neuron.axon.nodes()
+    assert dendrite["data"] == neuron.dendrite.nodes()
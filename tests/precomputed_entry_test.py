@@ -0,0 +1,21 @@
+from nmcp import PrecomputedEntry, latest_entries
+
+
+def test_latest_entries():
+    entries = [
+        PrecomputedEntry("a1", 1, 1, "a", None),
+        PrecomputedEntry("b", 2, None, "b", None),
+        PrecomputedEntry("a3", 1, 3, "a", None),
+        PrecomputedEntry("a2", 1, 2, "a", None),
+        PrecomputedEntry("c1", 3, None, "c", None),
+        PrecomputedEntry("c2", 3, None, "c", None),
+        PrecomputedEntry("d", 4, 0, "d", None)
+    ]
+
+    latest, superseded = latest_entries(entries)
+
+    # In queue order; without versions, the entry queued last is the latest.
+    assert [e.id for e in latest] == ["b", "a3", "c2", "d"]
+    assert {key: [e.id for e in value] for key, value in superseded.items()} == {"a3": ["a1", "a2"], "c2": ["c1"]}
+
+    assert [e.generated_version for e in latest] == [1, 3, 1, 0]
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+
+from nmcp.instrumentation import JobProfiler, ProfilingOptions
+
+
+def _work(size: int):
+    return [list(range(10)) for _ in range(size)]
+
+
+def test_job_profiler_sampling_and_threshold():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        profiler = JobProfiler(ProfilingOptions(output_dir=temp_dir, cpu=True, memory=True, every=2, min_nodes=100))
+
+        for index, node_count in enumerate([500, 500, 50, 50, 1000]):
+            with profiler.profile(f"recon/{index}") as job:
+                _work(100)
+                job.node_count = node_count
+
+        files = sorted(os.listdir(temp_dir))
+
+        # Jobs 0, 2, and 4 are sampled; job 2 is below the node threshold.
+        assert files == ["recon_0-500-nodes-allocations.txt", "recon_0-500-nodes.prof",
+                         "recon_4-1000-nodes-allocations.txt", "recon_4-1000-nodes.prof"]
+
+        with open(os.path.join(temp_dir, files[0])) as f:
+            report = f.read()
+
+        assert "reconstruction: recon/0" in report
+        assert "peak traced memory" in report
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_job_profiler_disabled():
+    profiler = JobProfiler(ProfilingOptions())
+
+    with profiler.profile("recon") as job:
+        job.node_count = 10
+
+    assert not profiler.options.enabled
+
+
+def test_job_profiler_overlapping_jobs():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        profiler = JobProfiler(ProfilingOptions(output_dir=temp_dir, cpu=True, memory=True))
+
+        # On Python 3.12+ the inner job cannot start a second CPU profiler; it still completes and is reported.
+        with profiler.profile("outer") as outer:
+            with profiler.profile("inner") as inner:
+                _work(100)
+                inner.node_count = 100
+            outer.node_count = 200
+
+        files = sorted(os.listdir(temp_dir))
+
+        assert "inner-100-nodes-allocations.txt" in files
+        assert "outer-200-nodes.prof" in files
+    finally:
+        shutil.rmtree(temp_dir)
@@ -245,4 +245,31 @@ class TestRemoteDataClient:
             
             assert "soma" not in result
             assert result["axon"] == []
-            assert result["dendrite"] == []
\ No newline at end of file
+            assert result["dendrite"] == []
+
+    def test_mark_many_single_request(self, mock_client):
+        client, mock_gql_client = mock_client
+
+        mock_gql_client.execute.return_value = {
+            "u0": {"id": "a", "version": 1},
+            "u1": None,
+            "u2": {"id": "c", "version": -1}
+        }
+
+        result = client.mark_many([("a", 1, 1000.0), ("b", 1, 1001.0), ("c", -1, 1002.0)])
+
+        assert result == ["a", "c"]
+
+        mock_gql_client.execute.assert_called_once()
+        call_args = mock_gql_client.execute.call_args
+        params = call_args[1]["variable_values"]
+        assert params["id0"] == "a"
+        assert params["version2"] == -1
+        assert params["generatedAt1"] == 1001.0
+
+    def test_mark_many_empty(self, mock_client):
+        client, mock_gql_client = mock_client
+
+        assert client.mark_many([]) == []
+
+        mock_gql_client.execute.assert_not_called()
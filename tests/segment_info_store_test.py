@@ -0,0 +1,244 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from nmcp import (SegmentInfo, SegmentInfoStore, NmcpPropertyValues, list_skeletons, has_skeleton,
+                  remove_skeleton, remove_skeletons)
+from nmcp.precomputed.segment_info_store import clear_segment_info_cache
+
+
+def _properties(segment_id: int) -> NmcpPropertyValues:
+    # A soma id of None avoids the Allen structure lookup.
+    return NmcpPropertyValues(label=f"N{segment_id:03d}", strain="unknown", soma_id=None)
+
+
+def test_segment_info_store_update():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        store = SegmentInfoStore(f"file://{temp_dir}")
+
+        assert store.load() is None
+        assert store.update(lambda s: s.remove(1), create=False) is None
+
+        store.update(lambda s: s.append(1, _properties(1)))
+        store.update(lambda s: s.append(2, _properties(2)))
+
+        assert store.load().ids == [1, 2]
+
+        with open(os.path.join(temp_dir, "segment_properties", "info")) as f:
+            info = json.load(f)
+
+        assert info["inline"]["ids"] == ["1", "2"]
+        assert info["inline"]["properties"][0]["values"] == ["N001", "N002"]
+
+        assert remove_skeleton(f"file://{temp_dir}", 1)
+        assert list_skeletons(f"file://{temp_dir}") == [2]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def _add_in_process(location: str, segment_id: int):
+    SegmentInfoStore(location, max_attempts=100).update(lambda s: s.append(segment_id, _properties(segment_id)))
+
+
+def test_segment_info_store_concurrent_processes():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_add_in_process, [location] * 24, range(24)))
+
+        assert sorted(SegmentInfoStore(location).load().ids) == list(range(24))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_segment_info_store_cache_revalidation():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+        store = SegmentInfoStore(location)
+
+        store.update(lambda s: s.append(1, _properties(1)))
+
+        first = store.load()
+        assert SegmentInfoStore(location).load() is first
+
+        # Replace the state underneath the cache, as a writer in another process would.
+        replacement = SegmentInfo()
+        replacement.append(5, _properties(5))
+        pickle_file = os.path.join(temp_dir, "segment_properties", "info.pickle")
+        with open(f"{pickle_file}.new", "wb") as f:
+            f.write(pickle.dumps(replacement))
+        os.replace(f"{pickle_file}.new", pickle_file)
+
+        second = store.load()
+        assert second is not first
+        assert second.ids == [5]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_segment_info_store_concurrent_writers():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        def add(segment_id: int):
+            # Each writer has its own store, as separate worker processes would.
+            SegmentInfoStore(location, max_attempts=100).update(lambda s: s.append(segment_id, _properties(segment_id)))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(add, range(40)))
+
+        segment_info = SegmentInfoStore(location).load()
+
+        assert sorted(segment_info.ids) == list(range(40))
+        assert len(segment_info.labels.values) == 40
+
+        # The info file is that of the last state written, whichever writer finished last.
+        with open(os.path.join(temp_dir, "segment_properties", "info")) as f:
+            assert sorted(int(i) for i in json.load(f)["inline"]["ids"]) == list(range(40))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_segment_info_store_delayed_info_write():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+        store = SegmentInfoStore(location)
+
+        store.update(lambda s: s.append(1, _properties(1)))
+        token = store._backend.head()
+
+        store.update(lambda s: s.append(2, _properties(2)))
+
+        # A writer whose state has since been replaced does not write the info file derived from it.
+        assert not store._backend.write_derived("segment_properties/info", b"{}", "application/json", token)
+        assert store._backend.write_derived("segment_properties/info", b"{}", "application/json",
+                                            store._backend.head())
+
+        with open(os.path.join(temp_dir, "segment_properties", "info")) as f:
+            assert json.load(f) == {}
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_segment_info_store_lock_released_on_exit():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        # A writer that exits while holding the lock does not leave it held.
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            executor.submit(_exit_holding_lock, location).exception()
+
+        store = SegmentInfoStore(location)
+        store._backend._lock_timeout = 1.0
+        store.update(lambda s: s.append(3, _properties(3)))
+
+        assert store.load().ids == [3]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def _exit_holding_lock(location: str):
+    SegmentInfoStore(location)._backend._acquire()
+    os._exit(0)
+
+
+def test_segment_info_ids_index():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+        store = SegmentInfoStore(location)
+
+        assert list_skeletons(location) == []
+        assert not has_skeleton(location, 1)
+
+        for segment_id in (30, 10, 50, 20, 40):
+            store.update(lambda s: s.append(segment_id, _properties(segment_id)))
+
+        with open(os.path.join(temp_dir, "segment_properties", "ids"), "rb") as f:
+            header, ids = f.read().split(b"\n", 1)
+
+        assert json.loads(header)["count"] == 5
+        assert ids == b"".join(i.to_bytes(8, "little") for i in (10, 20, 30, 40, 50))
+
+        assert list_skeletons(location) == [10, 20, 30, 40, 50]
+        assert list_skeletons(location, start=20, stop=40) == [20, 30]
+        assert list_skeletons(location, start=15) == [20, 30, 40, 50]
+        assert list_skeletons(location, offset=1, limit=2) == [20, 30]
+        assert list_skeletons(location, start=20, offset=2, limit=10) == [40, 50]
+        assert list_skeletons(location, offset=10) == []
+
+        assert has_skeleton(location, 30)
+        assert not has_skeleton(location, 35)
+        assert not has_skeleton(location, 60)
+
+        remove_skeleton(location, 30)
+
+        assert list_skeletons(location) == [10, 20, 40, 50]
+        assert not has_skeleton(location, 30)
+
+        # An index that does not match the state, as when another writer replaced the state but not yet the index,
+        # is not used.
+        replacement = SegmentInfo()
+        replacement.append(5, _properties(5))
+        pickle_file = os.path.join(temp_dir, "segment_properties", "info.pickle")
+        with open(f"{pickle_file}.new", "wb") as f:
+            f.write(pickle.dumps(replacement))
+        os.replace(f"{pickle_file}.new", pickle_file)
+
+        assert list_skeletons(location) == [5]
+
+        # Datasets written before the index existed are listed from the state.
+        store.update(lambda s: s.append(60, _properties(60)))
+        os.remove(os.path.join(temp_dir, "segment_properties", "ids"))
+        clear_segment_info_cache()
+
+        assert list_skeletons(location, stop=60) == [5]
+        assert has_skeleton(location, 60)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_remove_skeletons():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        locations = [f"file://{temp_dir}/{variant}" for variant in ("full", "axon", "dendrite")]
+
+        def populate(segment_info: SegmentInfo):
+            for segment_id in range(10):
+                segment_info.append(segment_id, _properties(segment_id))
+
+        for location in locations:
+            SegmentInfoStore(location).update(populate)
+            os.makedirs(os.path.join(location[len("file://"):], "skeleton"))
+            for segment_id in range(10):
+                with open(os.path.join(location[len("file://"):], "skeleton", str(segment_id)), "wb") as f:
+                    f.write(b"skeleton")
+
+        # The axon dataset no longer lists 3, but its file is still removed.
+        SegmentInfoStore(locations[1]).update(lambda s: s.remove(3))
+
+        removed = remove_skeletons(locations, [3, 5, 7, 3, 42], batch_size=2)
+
+        assert removed == {locations[0]: [3, 5, 7], locations[1]: [5, 7], locations[2]: [3, 5, 7]}
+
+        for location in locations:
+            directory = location[len("file://"):]
+            assert list_skeletons(location) == [0, 1, 2, 4, 6, 8, 9]
+            assert sorted(int(f) for f in os.listdir(os.path.join(directory, "skeleton"))) == [0, 1, 2, 4, 6, 8, 9]
+            with open(os.path.join(directory, "segment_properties", "info")) as f:
+                assert json.load(f)["inline"]["ids"] == ["0", "1", "2", "4", "6", "8", "9"]
+
+        assert remove_skeletons(locations, []) == {location: [] for location in locations}
+        assert remove_skeletons([f"file://{temp_dir}/missing"], [1]) == {f"file://{temp_dir}/missing": []}
+    finally:
+        shutil.rmtree(temp_dir)
@@ -3,6 +3,7 @@ import pickle
 from pathlib import Path
 
 from nmcp import SegmentInfo, NmcpPropertyValues
+from nmcp.testing import stub_structure_tree
 
 _test_structure_1 = {"acronym": "mlf",
                      "graph_id": 1,
@@ -158,6 +159,25 @@ def test_segment_info_remove():
     assert tags["tag_descriptions"][1] == _test_structure_1["name"]
 
 
+def test_segment_info_remove_many():
+    with stub_structure_tree():
+        s = SegmentInfo()
+
+        for segment_id in range(1, 6):
+            s.append(segment_id, NmcpPropertyValues(f"N{segment_id}", f"strain {segment_id}", 100 + segment_id))
+
+        assert s.remove_many([4, 2, 9]) == [2, 4]
+
+        assert s.ids == [1, 3, 5]
+        assert s.labels.values == ["N1", "N3", "N5"]
+        assert s.strains.values == ["strain 1", "strain 3", "strain 5"]
+        assert s.tags.values == ["S101", "S103", "S105"]
+        assert s.tags.descriptions == ["structure 101", "structure 103", "structure 105"]
+
+        assert s.remove_many([9]) == []
+        assert s.ids == [1, 3, 5]
+
+
 def _validate_segment_info(s: SegmentInfo):
     info = s.as_dict()
 
@@ -203,3 +223,30 @@ def _validate_segment_info(s: SegmentInfo):
     assert len(tags["tag_descriptions"]) == 2
     assert tags["tag_descriptions"][0] == _test_structure_2["name"]
     assert tags["tag_descriptions"][1] == _test_structure_1["name"]
+
+
+def test_segment_info_content_hashes():
+    segment_info = SegmentInfo()
+    segment_info.append(1, _properties_1._replace(soma_id=None), "a")
+    segment_info.append(2, _properties_2._replace(soma_id=None), "b")
+    segment_info.append(3, _properties_3._replace(soma_id=None), "c")
+
+    # Appending without a hash clears the one recorded.
+    segment_info.append(1, _properties_1._replace(soma_id=None))
+    segment_info.remove(2)
+    segment_info.remove_many([3])
+
+    assert segment_info.hashes == {}
+
+    segment_info.append(4, _properties_1._replace(soma_id=None), "d", 7)
+
+    assert segment_info.source_version(4) == 7
+
+    # State stored before content hashes and source versions were recorded has none.
+    del segment_info.__dict__["hashes"]
+    del segment_info.__dict__["versions"]
+    restored = pickle.loads(pickle.dumps(segment_info))
+
+    assert restored.ids == [1, 4]
+    assert restored.content_hash(4) is None
+    assert restored.source_version(4) is None
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+
+from nmcp import DeferredSegmentInfoWriter, SegmentInfoStore, NmcpPropertyValues
+
+
+def _properties(segment_id: int) -> NmcpPropertyValues:
+    return NmcpPropertyValues(label=f"N{segment_id:03d}", strain="unknown", soma_id=None)
+
+
+def test_deferred_writer_flush_on_count():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+        store = SegmentInfoStore(location)
+
+        writer = DeferredSegmentInfoWriter(location, max_pending=3, max_age=3600)
+
+        writer.append(1, _properties(1))
+        writer.append(2, _properties(2))
+
+        assert writer.dirty
+        assert store.load() is None
+
+        writer.append(3, _properties(3))
+
+        assert not writer.dirty
+        assert store.load().ids == [1, 2, 3]
+
+        writer.remove(2)
+        writer.append(4, _properties(4))
+
+        assert writer.flush()
+        assert store.load().ids == [1, 3, 4]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_deferred_writer_merges_with_other_writers():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        first = DeferredSegmentInfoWriter(location, max_pending=10, max_age=3600)
+        second = DeferredSegmentInfoWriter(location, max_pending=10, max_age=3600)
+
+        first.append(1, _properties(1))
+        second.append(2, _properties(2))
+        first.append(3, _properties(3))
+
+        assert second.flush()
+        assert first.flush()
+
+        assert SegmentInfoStore(location).load().ids == [2, 1, 3]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_deferred_writer_flush_on_age():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        writer = DeferredSegmentInfoWriter(location, max_pending=10, max_age=0)
+
+        writer.append(1, _properties(1))
+
+        assert not writer.dirty
+        assert SegmentInfoStore(location).load().ids == [1]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_deferred_writer_content_hash():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        location = f"file://{temp_dir}"
+
+        writer = DeferredSegmentInfoWriter(location, max_pending=10, max_age=3600)
+
+        writer.append(1, _properties(1), "a")
+        writer.flush()
+
+        assert writer.content_hash(1) == "a"
+        assert SegmentInfoStore(location).content_hash(1) == "a"
+
+        # Pending changes take precedence over the stored hash.
+        writer.append(1, _properties(1), "b")
+        assert writer.content_hash(1) == "b"
+
+        writer.remove(1)
+        assert writer.content_hash(1) is None
+        assert SegmentInfoStore(location).content_hash(1) == "a"
+
+        writer.flush()
+
+        assert writer.content_hash(1) is None
+        assert SegmentInfoStore(location).content_hash(1) is None
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock
+
+from nmcp import PrecomputedStatusQueue
+
+
+def _acknowledge_all(updates):
+    return [u[0] for u in updates]
+
+
+def test_status_queue_flush_on_size():
+    client = Mock()
+    client.mark_many.side_effect = _acknowledge_all
+
+    queue = PrecomputedStatusQueue(client, max_batch=3, max_delay=60)
+
+    queue.mark_generated("a")
+    queue.mark_failed("b")
+
+    client.mark_many.assert_not_called()
+    assert len(queue) == 2
+
+    queue.mark_generated("c")
+
+    client.mark_many.assert_called_once()
+    sent = client.mark_many.call_args[0][0]
+    assert [u[0] for u in sent] == ["a", "b", "c"]
+    assert [u[1] for u in sent] == [1, -1, 1]
+    assert len(queue) == 0
+
+
+def test_status_queue_flush_on_age():
+    client = Mock()
+    client.mark_many.side_effect = _acknowledge_all
+
+    queue = PrecomputedStatusQueue(client, max_batch=100, max_delay=0)
+
+    queue.mark_generated("a")
+
+    client.mark_many.assert_called_once()
+    assert len(queue) == 0
+
+
+def test_status_queue_journal_replay():
+    temp_dir = tempfile.mkdtemp()
+    journal = os.path.join(temp_dir, "status.jsonl")
+
+    try:
+        failing = Mock()
+        failing.mark_many.side_effect = RuntimeError("service unavailable")
+
+        queue = PrecomputedStatusQueue(failing, journal, max_batch=2, max_delay=60)
+        queue.mark_generated("a")
+        queue.mark_failed("b")
+
+        assert queue.flush() is False
+        assert len(queue) == 2
+
+        # A new process picks up what was never acknowledged.
+        client = Mock()
+        client.mark_many.side_effect = lambda updates: [updates[0][0]]
+
+        replayed = PrecomputedStatusQueue(client, journal, max_batch=2, max_delay=60)
+        assert len(replayed) == 2
+
+        assert replayed.flush() is False
+        assert len(replayed) == 1
+
+        with open(journal) as f:
+            assert len(f.readlines()) == 1
+
+        client.mark_many.side_effect = _acknowledge_all
+        assert replayed.flush() is True
+
+        with open(journal) as f:
+            assert len(f.readlines()) == 0
+    finally:
+        shutil.rmtree(temp_dir)
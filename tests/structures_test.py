@@ -0,0 +1,18 @@
+import nmcp.precomputed.segment_tag_property as segment_tag_property
+
+from nmcp import SegmentInfo, NmcpPropertyValues
+from nmcp.testing import stub_structure_tree
+
+
+def test_stub_structure_tree():
+    previous = segment_tag_property._structure_id_lookup
+
+    with stub_structure_tree():
+        s = SegmentInfo()
+        s.append(1, NmcpPropertyValues("N001", "unknown", 315))
+        s.append(2, NmcpPropertyValues("N002", "unknown", None))
+
+        assert s.tags.values == ["S315", "none"]
+        assert s.tags.descriptions == ["structure 315", "none"]
+
+    assert segment_tag_property._structure_id_lookup is previous
@@ -0,0 +1,50 @@
+import numpy as np
+
+from nmcp import SkeletonComponents
+from nmcp.precomputed.nmcp_skeleton import create_skeleton
+from nmcp.testing import synthetic_neuron, synthetic_tree
+
+
+def test_synthetic_tree():
+    tree = synthetic_tree(5000, 2, seed=3)
+
+    assert len(tree) == 5000
+    assert tree.parent[0] == -1
+
+    sample = np.arange(1, 5001)
+    assert (tree.parent[1:] >= 1).all()
+    assert (tree.parent[1:] < sample[1:]).all()
+
+    # Branching, not a single path.
+    assert len(np.unique(tree.parent[1:])) < 4999
+
+    nodes = tree.nodes(10, 12)
+    assert [n["sampleNumber"] for n in nodes] == [11, 12]
+    assert set(nodes[0].keys()) == {"sampleNumber", "structureIdentifier", "x", "y", "z", "radius", "parentNumber",
+                                    "allenId"}
+
+    assert sum(len(p) for p in tree.pages(1200)) == 5000
+
+
+def test_synthetic_neuron_deterministic():
+    first = synthetic_neuron(2000, seed=5)
+    second = synthetic_neuron(2000, seed=5)
+
+    assert first.node_count == 2000
+    assert np.array_equal(first.axon.x, second.axon.x)
+    assert np.array_equal(first.dendrite.parent, second.dendrite.parent)
+
+
+def test_synthetic_neuron_skeleton():
+    neuron = synthetic_neuron(3000, seed=1)
+
+    axon = SkeletonComponents.create(neuron.axon.nodes())
+    dendrite = SkeletonComponents.create(neuron.dendrite.nodes())
+
+    skeleton = create_skeleton(1, axon, dendrite)
+
+    assert skeleton.vertices.shape == (2999, 3)
+
+    data = neuron.as_dict()
+    assert len(data["axon"]) == len(neuron.axon)
+    assert data["soma"]["allenId"] == neuron.soma_allen_id
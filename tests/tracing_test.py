@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from nmcp.instrumentation import configure_tracing, span
+
+
+def test_spans_written_with_parents():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "spans.jsonl")
+
+        configure_tracing(f"file:{path}")
+
+        with span("reconstruction", reconstruction_id="r1") as root:
+            with span("fetch", offset=0) as child:
+                child.set_attribute("nodes", 10)
+            with pytest.raises(ValueError):
+                with span("upload"):
+                    raise ValueError("failed")
+            root.set_attribute("skeleton_id", 7)
+
+        configure_tracing(None)
+
+        with open(path) as f:
+            spans = [json.loads(line) for line in f]
+
+        assert [s["name"] for s in spans] == ["fetch", "upload", "reconstruction"]
+
+        fetch, upload, reconstruction = spans
+
+        assert reconstruction["parent_span_id"] is None
+        assert fetch["parent_span_id"] == reconstruction["span_id"]
+        assert upload["parent_span_id"] == reconstruction["span_id"]
+        assert len({s["trace_id"] for s in spans}) == 1
+        assert len(reconstruction["trace_id"]) == 32
+        assert len(reconstruction["span_id"]) == 16
+
+        assert fetch["attributes"] == {"offset": 0, "nodes": 10}
+        assert upload["status"] == "ERROR"
+        assert reconstruction["attributes"] == {"reconstruction_id": "r1", "skeleton_id": 7}
+        assert reconstruction["end_time_unix_nano"] >= fetch["end_time_unix_nano"]
+    finally:
+        configure_tracing(None)
+        shutil.rmtree(temp_dir)
+
+
+def test_span_disabled():
+    configure_tracing(None)
+
+    with span("anything", key="value") as current:
+        current.set_attribute("other", 1)
@@ -0,0 +1,42 @@
+import pytest
+
+from nmcp import PrecomputedEntry, ShardAssignment
+
+
+def _entries(count: int):
+    return [PrecomputedEntry(f"e{idx}", idx, 1, f"r{idx}", None) for idx in range(count)]
+
+
+def test_shard_assignment_partitions_entries():
+    entries = _entries(200)
+
+    shards = [ShardAssignment(idx, 3) for idx in range(3)]
+
+    owned = [shard.filter(entries) for shard in shards]
+
+    assert sum(len(o) for o in owned) == len(entries)
+
+    ids = set()
+    for o in owned:
+        assert len(o) > 0
+        ids.update(e.id for e in o)
+
+    assert len(ids) == len(entries)
+
+
+def test_shard_assignment_is_stable_by_skeleton():
+    first = PrecomputedEntry("a", 42, 1, "r", None)
+    second = PrecomputedEntry("b", 42, 2, "r", None)
+
+    for count in range(1, 6):
+        owners = [idx for idx in range(count) if ShardAssignment(idx, count).owns(first)]
+        assert len(owners) == 1
+        assert ShardAssignment(owners[0], count).owns(second)
+
+
+def test_shard_assignment_validation():
+    with pytest.raises(ValueError):
+        ShardAssignment(0, 0)
+
+    with pytest.raises(ValueError):
+        ShardAssignment(2, 2)
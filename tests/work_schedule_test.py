@@ -0,0 +1,25 @@
+from nmcp import PrecomputedEntry, WorkSchedule
+
+
+def _entry(entry_id: str) -> PrecomputedEntry:
+    return PrecomputedEntry(entry_id, 1, None, f"reconstruction-{entry_id}", None)
+
+
+def test_lanes_shortest_first():
+    entries = [_entry(name) for name in "abcdef"]
+    sizes = {"a": 5000, "b": 100, "c": None, "d": 400000, "e": 100, "f": 300000}
+
+    fast, large = WorkSchedule(large_nodes=250000).lanes(entries, sizes)
+
+    # Entries of the same size keep their queue order; those of unknown size are taken last.
+    assert [e.id for e in fast] == ["b", "e", "a"]
+    assert [e.id for e in large] == ["f", "d", "c"]
+
+
+def test_single_lane():
+    entries = [_entry(name) for name in "abc"]
+
+    fast, large = WorkSchedule(large_nodes=10, large_concurrency=0).lanes(entries, {"a": 50, "b": None, "c": 5})
+
+    assert [e.id for e in fast] == ["c", "a", "b"]
+    assert large == []